@@ -1,7 +1,7 @@
 from django.contrib import admin
 from accounts.models import User, AccountVerification, Role, UserDetails, UserPreference, ListCategory, \
     RouteSaveList, UserRouteFeedback, SavedEvent, UserBiometricData, UserDetailPercentage, WallVisit, \
-    QuestionAnswer, UserSubscription, GymVisit
+    QuestionAnswer, UserSubscription, GymVisit, PendingWallVisit
 
 
 # Register your models here.
@@ -66,6 +66,11 @@ class UserBiometricDataAdmin(admin.ModelAdmin):
     list_display = ('id', 'wall', 'user', 'created_at',)
 
 
+@admin.register(PendingWallVisit)
+class PendingWallVisitAdmin(admin.ModelAdmin):
+    list_display = ('id', 'wall', 'user', 'created_at',)
+
+
 @admin.register(SavedEvent)
 class SavedEventAdmin(admin.ModelAdmin):
     list_display = ('id', 'user', 'save_event', 'is_going', 'is_saved',)
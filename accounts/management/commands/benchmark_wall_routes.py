@@ -0,0 +1,42 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from accounts.models import User
+from core import utils as core_utils
+from gyms.models import WallRoute
+
+
+class Command(BaseCommand):
+    """
+        Command class used to compare the rows fetched by the wall route listing with the unscoped
+        save list prefetch and with the login user scoped prefetch.
+    """
+    help = 'Benchmark the route save list prefetch of the wall route listing.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--wall', type=int, required=True, help='Section wall id to list the routes of.')
+        parser.add_argument('--user', type=int, required=True, help='Login user id the listing is done for.')
+
+    def run_listing(self, routes_qs, *prefetch):
+        with CaptureQueriesContext(connection) as queries:
+            start = time.perf_counter()
+            routes = list(routes_qs.prefetch_related(*prefetch))
+            rows = len(routes) + sum(len(route.route_save_list.all()) for route in routes)
+            elapsed = (time.perf_counter() - start) * 1000
+        return rows, len(queries), elapsed
+
+    def handle(self, *args, **options):
+        user = User.objects.filter(id=options['user']).first()
+        if not user:
+            raise CommandError('User %s does not exist.' % options['user'])
+        routes_qs = WallRoute.objects.select_related('grade', 'color').filter(
+            section_wall=options['wall']).order_by('id')
+        results = (
+            ('unscoped', self.run_listing(routes_qs, 'route_save_list', 'route_save_list__list_category')),
+            ('user scoped', self.run_listing(routes_qs, core_utils.get_user_route_save_list_prefetch(user))),
+        )
+        for name, (rows, queries, elapsed) in results:
+            self.stdout.write('%-12s rows fetched: %-8s queries: %-4s time: %.2f ms' % (name, rows, queries, elapsed))
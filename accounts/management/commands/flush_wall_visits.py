@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+
+from core import utils as core_utils
+
+
+class Command(BaseCommand):
+    """
+        Command class used to move the buffered wall visits into WallVisit and the wall stats.
+    """
+    help = 'Flush buffered wall visits into WallVisit and the wall visit counters.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=5000, help='Buffered visits processed per batch.')
+
+    def handle(self, *args, **options):
+        created_count = core_utils.flush_pending_wall_visits(options['batch_size'])
+        self.stdout.write(self.style.SUCCESS('%s new wall visit(s) recorded.' % created_count))
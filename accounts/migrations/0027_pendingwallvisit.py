@@ -0,0 +1,33 @@
+# Generated by Django 3.1.7 on 2021-09-21 07:40
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('gyms', '0033_sectionwallstats'),
+        ('accounts', '0026_gymvisit'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PendingWallVisit',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Created At')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='Last Updated At')),
+                ('updated_by', models.IntegerField(blank=True, null=True, verbose_name='Updated by')),
+                ('is_deleted', models.BooleanField(default=False, verbose_name='Is Deleted')),
+                ('deleted_at', models.DateTimeField(blank=True, null=True)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='user_pending_wall_visit', to=settings.AUTH_USER_MODEL)),
+                ('wall', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='pending_wall_visit', to='gyms.sectionwall')),
+            ],
+            options={
+                'verbose_name': 'PendingWallVisit',
+                'verbose_name_plural': 'PendingWallVisits',
+            },
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 3.1.7 on 2021-09-27 09:41
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0028_user_trgm_indexes'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='userroutefeedback',
+            index=models.Index(fields=['user', 'route', '-id'], name='feedback_user_route_idx'),
+        ),
+    ]
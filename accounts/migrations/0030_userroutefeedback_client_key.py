@@ -0,0 +1,22 @@
+# Generated by Django 3.1.7 on 2021-09-28 12:14
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0029_userroutefeedback_user_route_idx'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='userroutefeedback',
+            name='client_key',
+            field=models.CharField(blank=True, max_length=64, null=True, verbose_name='Client Key'),
+        ),
+        migrations.AddConstraint(
+            model_name='userroutefeedback',
+            constraint=models.UniqueConstraint(fields=('user', 'client_key'), name='unique_feedback_client_key'),
+        ),
+    ]
@@ -0,0 +1,24 @@
+# Generated by Django 3.1.7 on 2021-10-07 10:21
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0030_userroutefeedback_client_key'),
+    ]
+
+    operations = [
+        # keep the first visit of every (user, wall) pair before adding the unique constraint
+        migrations.RunSQL(
+            sql='DELETE FROM accounts_wallvisit duplicate USING accounts_wallvisit first_visit '
+                'WHERE duplicate.user_id = first_visit.user_id AND duplicate.wall_id = first_visit.wall_id '
+                'AND duplicate.id > first_visit.id;',
+            reverse_sql=migrations.RunSQL.noop,
+        ),
+        migrations.AddConstraint(
+            model_name='wallvisit',
+            constraint=models.UniqueConstraint(fields=('user', 'wall'), name='unique_wall_visit_user_wall'),
+        ),
+    ]
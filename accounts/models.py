@@ -2,6 +2,7 @@ from django.contrib.auth.base_user import BaseUserManager
 from django.contrib.auth.models import (AbstractBaseUser, UserManager)
 from django.contrib.gis.db import models
 from django.contrib.postgres.fields import ArrayField
+from django.contrib.postgres.indexes import GinIndex
 
 from core.models import BaseModel
 from multiselectfield import MultiSelectField
@@ -119,6 +120,10 @@ class User(AbstractBaseUser, BaseModel):
         verbose_name_plural = 'Users'
         ordering = ['id']
         index_together = ["email", "phone_number", "updated_at"]
+        indexes = [
+            GinIndex(name='user_full_name_trgm_idx', fields=['full_name'], opclasses=['gin_trgm_ops']),
+            GinIndex(name='user_email_trgm_idx', fields=['email'], opclasses=['gin_trgm_ops']),
+        ]
 
 
 class AccountVerification(BaseModel):
@@ -355,6 +360,22 @@ class WallVisit(BaseModel):
     class Meta:
         verbose_name = 'WallVisit'
         verbose_name_plural = 'WallVisits'
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'wall'], name='unique_wall_visit_user_wall'),
+        ]
+
+
+class PendingWallVisit(BaseModel):
+    """
+        PendingWallVisit model used as append-only buffer of wall visits, moved into WallVisit by
+        the flush_wall_visits command.
+    """
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='user_pending_wall_visit')
+    wall = models.ForeignKey('gyms.SectionWall', on_delete=models.CASCADE, related_name='pending_wall_visit')
+
+    class Meta:
+        verbose_name = 'PendingWallVisit'
+        verbose_name_plural = 'PendingWallVisits'
 
 
 class ListCategory(BaseModel):
@@ -420,10 +441,18 @@ class UserRouteFeedback(BaseModel):
     feedback = models.CharField(max_length=500, blank=True, null=True, verbose_name='Route Feedback')
     first_time_read = models.BooleanField(default=False, verbose_name='First Time Read')
     second_time_read = models.BooleanField(default=False, verbose_name='Second Time Read')
+    # client generated idempotency key of the batch (offline) sync, replays are skipped
+    client_key = models.CharField(max_length=64, blank=True, null=True, verbose_name='Client Key')
 
     class Meta:
         verbose_name = 'UserRouteFeedback'
         verbose_name_plural = 'UserRouteFeedbacks'
+        indexes = [
+            models.Index(fields=['user', 'route', '-id'], name='feedback_user_route_idx'),
+        ]
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'client_key'], name='unique_feedback_client_key'),
+        ]
 
 
 class SavedEvent(BaseModel):
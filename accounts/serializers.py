@@ -6,13 +6,12 @@ from django.conf import settings
 from django.contrib.auth import authenticate
 from django.contrib.gis.geos import Point
 from django.db import transaction, IntegrityError
-from django.db.models import Count, Q
+from django.db.models import Q
 from fcm_django.models import FCMDevice
 from rest_framework import serializers
-from rest_framework.authtoken.models import Token
 from accounts.models import (AccountVerification, Role, User, UserPreference, GRADING_CHOICES, UserDetails,
                              ListCategory, RouteSaveList, UserRouteFeedback, SavedEvent, UserBiometricData,
-                             UserDetailPercentage, WallVisit, QuestionAnswer, )
+                             UserDetailPercentage, QuestionAnswer, )
 from config.local import forgotpassword_url, emailverification_url
 from core import utils as core_utils
 from core.exception import CustomException
@@ -322,8 +321,7 @@ class OldResetPasswordSerializer(serializers.Serializer):
             user_obj.set_password(attrs["password"])
             user_obj.save()
             # deleting token to signout user out of other device
-            Token.objects.filter(user=user_obj).delete()
-            Token.objects.get_or_create(user=user_obj)
+            core_utils.reset_user_token(user_obj)
             return True, 2
 
 
@@ -360,8 +358,7 @@ class ResetPasswordSerializer(serializers.Serializer):
         user_obj.set_password(validated_data["password"])
         user_obj.save()
         # deleting token to signout user out of other device
-        Token.objects.filter(user=user_obj).delete()
-        Token.objects.get_or_create(user=user_obj)
+        core_utils.reset_user_token(user_obj)
 
         # To mark token as used
         account_verify.is_used = True
@@ -540,6 +537,20 @@ class ClimberHomeListSerializer(serializers.ModelSerializer):
         fields = ('id', 'gym_name', 'gym_avatar', 'zipcode',)
 
 
+class NearbyGymListSerializer(ClimberHomeListSerializer):
+    """
+        NearbyGymListSerializer class used to handle the gyms near me list with the distance in km.
+    """
+    distance = serializers.SerializerMethodField()
+
+    def get_distance(self, obj):
+        return round(obj.distance.km, 2)
+
+    class Meta:
+        model = GymDetails
+        fields = ('id', 'gym_name', 'gym_avatar', 'zipcode', 'address', 'distance',)
+
+
 class ClimberHomeDetailSerializer(serializers.ModelSerializer):
     """
         ClimberHomeDetailSerializer class used to handle Climber Home Detail serializer.
@@ -728,21 +739,17 @@ class SectionWallDetailSerializer(core_serializers.DynamicFieldsModelSerializer)
     wall_type = ClimberWallTypeSerializer()
 
     def get_count_detail(self, obj):
-        # Add or Get visit instance
-        visit_instance, created = WallVisit.objects.get_or_create(wall=obj, user=self.context.get('request'))
-        # visit_instance.user.add(self.context.get('request'))
-        # visit_instance.save()
-        count_data = core_utils.get_round_completed_data(obj, visit_instance)
+        # Visit is recorded by the wall route view before the ETag check
+        count_data = core_utils.get_round_completed_data(obj)
         return count_data
 
     def get_route_data(self, obj):
+        # To fetch category only for login user
         route_tags = WallRoute.objects.select_related('grade', 'color',).prefetch_related(
-            'route_save_list', 'route_save_list__list_category'). \
+            core_utils.get_user_route_save_list_prefetch(self.context.get('request'))). \
             filter(section_wall=self.context.get('section_wall')).order_by('id')
         route_serializer = WallRouteWithCategoryInfoSerializer(route_tags, many=True,
                                                                context={'request': self.context.get('request')})
-        # To filter category only for login user
-        core_utils.update_route_category_data(route_serializer.data, self.context.get('request'))
         return route_serializer.data
 
     class Meta:
@@ -788,24 +795,19 @@ class OnlyWallRouteDetailSerializer(core_serializers.DynamicFieldsModelSerialize
     section_wall = SectionWallDetailSerializer(fields=('id', 'image', 'name',))
 
     def get_grade_percentage(self, obj):
-        query_set = UserRouteFeedback.objects.filter(
-            route=obj.id).values('grade').annotate(grade_count=Count('id'))
-        grade_count1, grade_count2, grade_count3 = core_utils.get_sequence_data(query_set)
-        # grade_count1 = UserRouteFeedback.objects.filter(
-        #     route=obj.id, grade=UserRouteFeedback.CommunityGradeType.NEGATIVE).count()
-        # grade_count2 = UserRouteFeedback.objects.filter(
-        #     route=obj.id, grade=UserRouteFeedback.CommunityGradeType.NORMAL).count()
-        # grade_count3 = UserRouteFeedback.objects.filter(
-        #     route=obj.id, grade=UserRouteFeedback.CommunityGradeType.POSITIVE).count()
-        data = core_utils.get_percentage_from_grade_count([grade_count1, grade_count2, grade_count3])
+        route_stats = core_utils.get_route_stats(obj)
+        data = core_utils.get_percentage_from_grade_count([route_stats.negative_grade_count,
+                                                           route_stats.normal_grade_count,
+                                                           route_stats.positive_grade_count])
         return data
 
     def get_no_climber_completed(self, obj):
-        climber_completed = User.all_delete_objects.filter(
-            user_route_feedback__route=obj.id, user_route_feedback__route_progress__in=[1, 2, 3]).distinct().count()
-        return climber_completed
+        return core_utils.get_route_stats(obj).completed_climbers
 
     def get_is_added_into_category(self, obj):
+        # annotated by the route detail view
+        if hasattr(obj, 'is_added_into_category'):
+            return obj.is_added_into_category
         user = self.context.get('user')
         # route_save_obj = obj.route_save_list.filter(user_id=user).first()
         route_save_obj = obj.route_save_list.filter(user_id=user, list_category__is_deleted=False).first()
@@ -945,9 +947,14 @@ class RouteFeedbackSerializer(core_serializers.DynamicFieldsModelSerializer):
         """
         user_instance = self.context.get('request')
         validated_data['user'] = user_instance
-        instance = UserRouteFeedback.objects.create(**validated_data)
+        with transaction.atomic():
+            # wall stats lock first, the feedback and its stats update are committed together
+            core_utils.lock_wall_stats_for_route(validated_data['route'].id)
+            instance = UserRouteFeedback.objects.create(**validated_data)
+            core_utils.update_wall_stats_on_feedback(instance)
         # To track gym visit
         core_utils.track_gym_visit_by_user(user_instance, validated_data['route'], instance.id)
+        core_utils.update_route_stats_on_feedback(instance)
         return instance
 
     class Meta:
@@ -956,6 +963,48 @@ class RouteFeedbackSerializer(core_serializers.DynamicFieldsModelSerializer):
                   'rating', 'feedback',)
 
 
+class RouteFeedbackBatchItemSerializer(RouteFeedbackSerializer):
+    """
+        RouteFeedbackBatchItemSerializer class used to validate one feedback of the batch sync.
+    """
+    client_key = serializers.CharField(max_length=64, required=True)
+
+    class Meta:
+        model = UserRouteFeedback
+        fields = ('id', 'gym', 'route', 'route_progress', 'attempt_count', 'route_note', 'climb_count', 'grade',
+                  'rating', 'feedback', 'client_key',)
+        # uniqueness of the client key is handled as a replay in create
+        validators = []
+
+
+class RouteFeedbackBatchSerializer(serializers.Serializer):
+    """
+        RouteFeedbackBatchSerializer class used to add a batch of route feedbacks (offline sync).
+    """
+    feedbacks = RouteFeedbackBatchItemSerializer(many=True, allow_empty=False)
+
+    def validate_feedbacks(self, feedbacks):
+        if len(feedbacks) > core_utils.ROUTE_FEEDBACK_BATCH_LIMIT:
+            raise serializers.ValidationError(validation_message.get('FEEDBACK_BATCH_LIMIT').format(
+                core_utils.ROUTE_FEEDBACK_BATCH_LIMIT))
+        client_keys = [each['client_key'] for each in feedbacks]
+        if len(client_keys) != len(set(client_keys)):
+            raise serializers.ValidationError(validation_message.get('DUPLICATE_CLIENT_KEY'))
+        return feedbacks
+
+    def create(self, validated_data):
+        """
+            method used to add the route feedbacks of the batch
+        :param validated_data:
+        :return: list of feedbacks
+        """
+        user_instance = self.context.get('request')
+        return core_utils.create_route_feedback_batch(user_instance, validated_data['feedbacks'])
+
+    def to_representation(self, instance):
+        return {'feedbacks': RouteFeedbackBatchItemSerializer(instance, many=True).data}
+
+
 class PercentageDetailSerializer(core_serializers.DynamicFieldsModelSerializer):
     """
         PercentageDetailSerializer class used to get user percentage details.
@@ -1,3 +1,45 @@
-from django.test import TestCase
+from datetime import timedelta
 
-# Create your tests here.
+from django.utils import timezone
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APITestCase
+
+from accounts.models import Role, User
+from core import utils as core_utils
+from gyms.models import Announcement, GymDetails
+
+
+class AnnouncementETagTest(APITestCase):
+    """
+        AnnouncementETagTest class used to check the announcement list ETag changes when the owner activates or
+        deactivates an announcement.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        owner = User.objects.create(email='owner@crimpit.test', full_name='Gym Owner')
+        cls.gym = GymDetails.objects.create(user=owner, gym_name='Test Gym', gym_phone_number='0000000000')
+        climber = User.objects.create(email='climber@crimpit.test', full_name='Climber')
+        Role.objects.create(user=climber, name=Role.RoleType.CLIMBER)
+        cls.token = Token.objects.create(user=climber)
+        cls.active_announcement = Announcement.objects.create(gym=cls.gym, title='Active')
+        cls.inactive_announcement = Announcement.objects.create(gym=cls.gym, title='Inactive', is_active=False)
+        # same updated_at on both rows, only the toggle itself may change the ETag
+        Announcement.all_objects.filter(gym=cls.gym).update(updated_at=timezone.now() - timedelta(days=1))
+
+    def setUp(self):
+        self.client.credentials(HTTP_AUTHORIZATION='Token ' + self.token.key)
+
+    def test_etag_changes_after_toggle(self):
+        url = '/crimpit/user/announcement'
+        response = self.client.get(url, {'gym_id': self.gym.id})
+        self.assertEqual(response.status_code, 200)
+        etag = response['ETag']
+        self.assertEqual(self.client.get(url, {'gym_id': self.gym.id}, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        core_utils.active_delete_announcement(Announcement.all_objects.filter(id=self.active_announcement.id), 0)
+        core_utils.active_delete_announcement(Announcement.all_objects.filter(id=self.inactive_announcement.id), 1)
+        response = self.client.get(url, {'gym_id': self.gym.id}, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+        self.assertEqual([each['id'] for each in response.data['data']],
+                         [self.inactive_announcement.id])
@@ -26,6 +26,7 @@ urlpatterns = [
     url('^climber_home_decision$', user_views.ClimberHomeDecisionViewSet.as_view({'get': 'list'}),
         name='climbers-home-decision-view-set'),
     url('^climber_home$', user_views.ClimberHomeViewSet.as_view({'get': 'list'}), name='climbers-home-view-set'),
+    url('^nearby_gym$', user_views.NearbyGymViewSet.as_view({'get': 'list'}), name='nearby-gym-view-set'),
     path('climber_home/<int:gym_id>', user_views.ClimberHomeViewSet.as_view({'get': 'retrieve'}),
          name='climbers-home-view-set'),
     path('climber_home_more/<int:gym_id>', user_views.ClimberHomeMoreViewSet.as_view({'get': 'retrieve'}),
@@ -33,6 +34,7 @@ urlpatterns = [
     url('^climber_home_section$', user_views.ClimberHomeSectionViewSet.as_view({'get': 'list'}),
         name='climber-home-section-click-viewset'),
     url('^wall_route$', user_views.WallRouteViewSet.as_view({'get': 'list'}), name='wall-route-view-set'),
+    url('^wall_route_tag$', user_views.WallRouteTagViewSet.as_view({'get': 'list'}), name='wall-route-tag-view-set'),
     path('wall_route/<int:route_id>', user_views.WallRouteViewSet.as_view({'get': 'retrieve'}),
          name='wall-route-view-set'),
     path('wall_route_only_feedback/<int:route_id>', user_views.WallRouteFeedbackViewSet.as_view({'get': 'retrieve'}),
@@ -47,6 +49,8 @@ urlpatterns = [
         {'get': 'list', 'post': 'create', 'put': 'update'}), name='save-route-in-category-view-set'),
     url('^route_feedback$', user_views.RouteFeedbackViewSet.as_view({'get': 'list', 'post': 'create'}),
         name='route-feedback-view-set'),
+    url('^route_feedback_batch$', user_views.RouteFeedbackViewSet.as_view({'post': 'batch_create'}),
+        name='route-feedback-batch-view-set'),
     path('route_feedback/<int:feedback_id>', user_views.RouteFeedbackViewSet.as_view({'get': 'retrieve'}),
          name='route-feedback-view-set'),
 
@@ -2,7 +2,7 @@ from datetime import datetime, timezone
 
 ''' rest framework import '''
 from django.contrib.gis.geos import GEOSGeometry
-from django.db.models import Avg, Count, Sum, Q, Value, CharField, OuterRef, Exists, Subquery
+from django.db.models import Avg, Count, Sum, Q, Value, CharField, OuterRef, Exists, F
 from rest_framework import status as status_code, filters
 from rest_framework import mixins, views, viewsets
 from rest_framework.permissions import AllowAny, IsAuthenticated
@@ -20,6 +20,7 @@ from accounts.serializers import (UserSignUpSerializer, VerifyEmailSerializer, R
                                   GetHomeGymSerializer, UnmarkHomeGymSerializer, ClimberHomeListSerializer,
                                   ClimberHomeDetailSerializer, ResendForgotPasswordLinkSerializer,
                                   ListCategorySerializer, RouteIntoCategorySerializer, RouteFeedbackSerializer,
+                                  RouteFeedbackBatchSerializer,
                                   RouteFeedbackDetailSerializer, ClimberEventDetailSerializer,
                                   ClimberSaveEventSerializer, ClimberAnnounceDetailSerializer,
                                   SaveEventDetailSerializer, BiometricDataSerializer, BiometricDataDetailSerializer,
@@ -28,14 +29,14 @@ from accounts.serializers import (UserSignUpSerializer, VerifyEmailSerializer, R
                                   SectionWallDetailSerializer,
                                   OnlyWallRouteDetailSerializer, WallRouteWithCategoryInfoSerializer,
                                   NotFoundGymSerializer, ClimbingInfoSerializer, ClimbingInfoDetailSerializer,
-                                  QuestionAnswerSerializer, )
+                                  QuestionAnswerSerializer, NearbyGymListSerializer, )
 from core.authentication import CustomTokenAuthentication
 from core.exception import get_custom_error, CustomException
 from core.messages import success_message, validation_message
 from core.pagination import CustomPagination
 from core.permissions import (CheckUserRoleStatusPermission,
                               UserEmailVerifiedPermission, AppClimberPermission)
-from core.response import SuccessResponse
+from core.response import SuccessResponse, NotModifiedResponse
 from core import utils as core_utils
 from gyms.models import GymDetails, GymLayout, LayoutSection, WallRoute, SectionWall, Event, Announcement
 
@@ -527,9 +528,14 @@ class ClimberHomeViewSet(viewsets.ViewSet):
             return Response(get_custom_error(message='Please provide the zipcode or gym name.',
                                              error_location=validation_message.get('CLIMBER_HOME'), status=400),
                             status=status_code.HTTP_400_BAD_REQUEST)
-        gyms = GymDetails.objects.filter(
-            (Q(zipcode=zipcode) | Q(gym_name__icontains=zipcode)), user__is_active=True,
-            is_admin_approved=True).order_by("-id")
+        if request.GET.get('search_type') == 'similar':
+            # typo tolerant gym name search, best matches first
+            gyms = core_utils.get_trigram_search_queryset(
+                GymDetails.objects.filter(user__is_active=True, is_admin_approved=True), zipcode, ('gym_name',))
+        else:
+            gyms = GymDetails.objects.filter(
+                (Q(zipcode=zipcode) | Q(gym_name__icontains=zipcode)), user__is_active=True,
+                is_admin_approved=True).order_by("-id")
         if page_size:
             pagination_class = self.pagination_class()
             page = pagination_class.paginate_queryset(gyms, request)
@@ -558,6 +564,44 @@ class ClimberHomeViewSet(viewsets.ViewSet):
         return SuccessResponse(serializer.data, status=status_code.HTTP_200_OK)
 
 
+class NearbyGymViewSet(viewsets.ViewSet):
+    """
+        NearbyGymViewSet class used to list the gyms near the climber location.
+    """
+    authentication_classes = (CustomTokenAuthentication,)
+    permission_classes = (IsAuthenticated, AppClimberPermission,)
+    list_serializer_class = NearbyGymListSerializer
+    pagination_class = CustomPagination
+
+    def list(self, request):
+        """
+            get method used for the distance sorted gym list.
+            :param request: lat, lng, radius (km, optional), limit (1 to NEARBY_GYM_MAX_LIMIT) or page_size (optional)
+            :return: response
+        """
+        try:
+            lat = float(request.GET.get('lat', ''))
+            lng = float(request.GET.get('lng', ''))
+            radius = float(request.GET.get('radius')) if request.GET.get('radius') else None
+            limit = min(int(request.GET.get('limit') or core_utils.NEARBY_GYM_LIMIT), core_utils.NEARBY_GYM_MAX_LIMIT)
+        except ValueError:
+            lat = lng = None
+        if lat is None or not (-90 <= lat <= 90 and -180 <= lng <= 180) or (radius is not None and radius <= 0) or \
+                limit <= 0:
+            return Response(get_custom_error(message=validation_message.get('PROVIDE_LAT_LNG'),
+                                             error_location=validation_message.get('CLIMBER_HOME'), status=400),
+                            status=status_code.HTTP_400_BAD_REQUEST)
+        gyms = core_utils.get_nearby_gyms(lat, lng, radius)
+        if request.GET.get('page_size', ''):
+            pagination_class = self.pagination_class()
+            page = pagination_class.paginate_queryset(gyms, request)
+            if page is not None:
+                serializer = self.list_serializer_class(page, many=True)
+                return SuccessResponse(pagination_class.get_paginated_response(serializer.data).data)
+        serializer = self.list_serializer_class(gyms[:limit], many=True)
+        return SuccessResponse(serializer.data)
+
+
 # class ClimberHomeMoreViewSet(viewsets.ViewSet):
 #     """
 #         ClimberHomeMoreViewSet class used to handle the Climber home layout detail.
@@ -677,7 +721,28 @@ class ClimberHomeMoreViewSet(viewsets.ViewSet):
         if category_id:
             category = int(category_id)
         user_data = {'user_preference': user_preference_val, 'gym_preference': rb}
+        etag = core_utils.get_etag('climber_layout', gym_detail.id, gym_detail.content_version, category, floor_id,
+                                   user_data)
+        if core_utils.is_etag_matched(request, etag):
+            return NotModifiedResponse(etag)
+        # layout only changes with the gym content version, so the serialized layout is cached per version
+        gym_layout_data = core_utils.get_cached_gym_layout_data(
+            'climber', gym_detail, category, floor_id,
+            lambda: self.get_gym_layout_data(gym_id, category, floor_id))
+        response = SuccessResponse({'user_data': user_data, 'gym_layout_data': gym_layout_data,
+                                    'category': category}, status=status_code.HTTP_200_OK)
+        response['ETag'] = etag
+        return response
 
+    @staticmethod
+    def get_gym_layout_data(gym_id, category, floor_id):
+        """
+            method used to serialize the floor list, section points and section + wall details of the floor.
+        :param gym_id:
+        :param category:
+        :param floor_id:
+        :return:
+        """
         gym_layout = GymLayout.objects.prefetch_related('gym_layout_section', 'gym_layout_section__section_wall'). \
             filter(gym=gym_id, category=category).all()
 
@@ -694,7 +759,7 @@ class ClimberHomeMoreViewSet(viewsets.ViewSet):
             else:
                 get_floor_id = gym_layout.first().id
             # To show floor list only
-            floor_list = core_utils.get_is_selected_floor(gym_layout.values('id', 'title'), get_floor_id)
+            floor_list = core_utils.get_is_selected_floor(list(gym_layout.values('id', 'title')), get_floor_id)
             gym_layout_data = {'floor_list': floor_list}
             floor_gym_layout = gym_layout.prefetch_related('gym_layout_section', 'gym_layout_section__section_wall'). \
                 filter(id=get_floor_id).first()
@@ -715,11 +780,9 @@ class ClimberHomeMoreViewSet(viewsets.ViewSet):
             # To get section + its wall details
             serialized_data = GymLayoutDetailSerializer(floor_gym_layout)
             gym_layout_data.update(serialized_data.data)
-            return SuccessResponse({'user_data': user_data, 'gym_layout_data': gym_layout_data,
-                                    'category': category}, status=status_code.HTTP_200_OK)
+            return gym_layout_data
         gym_layout_data = {'floor_list': [], "only_layout_section": [], "gym_layout_section": []}
-        return SuccessResponse({'user_data': user_data, 'gym_layout_data': gym_layout_data,
-                                'category': category}, status=status_code.HTTP_200_OK)
+        return gym_layout_data
 
 
 class ClimberHomeSectionViewSet(viewsets.ViewSet):
@@ -728,25 +791,66 @@ class ClimberHomeSectionViewSet(viewsets.ViewSet):
     """
     authentication_classes = (CustomTokenAuthentication,)
     permission_classes = (IsAuthenticated, AppClimberPermission,)
-    list_serializer_class = SectionWallDetailSerializer
+    list_serializer_class = LayoutSectionDetailSerializer
 
     def list(self, request):
         """
-        list method used for wall routes.
-            :param request:
+        list method used to get the section (with its walls) clicked on the floor image.
+            :param request: floor_id, x, y (image point)
             :return: response
         """
-        # Currently not using, it can be used to get data of wall on click section on home page
+        try:
+            floor_id = int(request.GET.get('floor_id', ''))
+            x = float(request.GET.get('x', ''))
+            y = float(request.GET.get('y', ''))
+        except ValueError:
+            return Response(get_custom_error(message=validation_message.get('PROVIDE_FLOOR_POINT'),
+                                             error_location=validation_message.get('CLIMBER_HOME'), status=400),
+                            status=status_code.HTTP_400_BAD_REQUEST)
+        floor_detail = GymLayout.objects.select_related('gym').filter(id=floor_id).first()
+        if not floor_detail:
+            return Response(get_custom_error(message=validation_message.get('PROVIDE_LAYOUT_ID'),
+                                             error_location=validation_message.get('CLIMBER_HOME'), status=400),
+                            status=status_code.HTTP_400_BAD_REQUEST)
+        # For block gym
+        common_block_gym_fun(request.user, floor_detail.gym)
+        section_detail = core_utils.get_section_at_point(floor_id, x, y)
+        if section_detail:
+            serializer = self.list_serializer_class(section_detail)
+            return SuccessResponse(serializer.data, status=status_code.HTTP_200_OK)
+        return SuccessResponse({}, status=status_code.HTTP_200_OK)
 
-        # section_id = request.GET.get('section_id', '')
-        # if not section_id:
-        #     return Response(get_custom_error(message='Please provide the section id.',
-        #                                      error_location='wall route', status=400),
-        #                     status=status_code.HTTP_400_BAD_REQUEST)
-        # wall_detail = SectionWall.objects.filter(layout_section=section_id).first()
-        # serializer = self.list_serializer_class(wall_detail)
-        # return SuccessResponse(serializer.data, status=status_code.HTTP_200_OK)
-        return SuccessResponse({'a': "Success"})
+
+class WallRouteTagViewSet(viewsets.ViewSet):
+    """
+        WallRouteTagViewSet class used to find the route tags tapped on the wall image.
+    """
+    authentication_classes = (CustomTokenAuthentication,)
+    permission_classes = (IsAuthenticated, AppClimberPermission,)
+
+    def list(self, request):
+        """
+        list method used to get the route tags nearest to the tapped point or inside the visible box.
+            :param request: wall_id, x, y, radius (optional) or min_x, min_y, max_x, max_y, limit (optional)
+            :return: response
+        """
+        wall_id = request.GET.get('wall_id', '')
+        wall_detail = SectionWall.objects.select_related('gym_layout__gym').filter(id=wall_id).first() \
+            if wall_id.isdigit() else None
+        if not wall_detail:
+            return Response(get_custom_error(message=validation_message.get('WALL_ID_REQUIRED'),
+                                             error_location='wall route', status=400),
+                            status=status_code.HTTP_400_BAD_REQUEST)
+        # For block gym
+        common_block_gym_fun(request.user, wall_detail.gym_layout.gym)
+        try:
+            route_tags = core_utils.get_route_tag_list(WallRoute.objects.filter(section_wall=wall_detail),
+                                                       request.GET)
+        except ValueError:
+            return Response(get_custom_error(message=validation_message.get('PROVIDE_ROUTE_TAG_POINT'),
+                                             error_location='wall route', status=400),
+                            status=status_code.HTTP_400_BAD_REQUEST)
+        return SuccessResponse(route_tags, status=status_code.HTTP_200_OK)
 
 
 class WallRouteViewSet(viewsets.ViewSet):
@@ -773,9 +877,17 @@ class WallRouteViewSet(viewsets.ViewSet):
         if wall_detail:
             # For block gym
             common_block_gym_fun(request.user, wall_detail.gym_layout.gym)
+            # Visit is buffered and moved into WallVisit by the flush_wall_visits command
+            core_utils.record_wall_visit(request.user, wall_detail.id)
+            etag = core_utils.get_etag('wall_route', request.user.id,
+                                       *core_utils.get_wall_route_signature(wall_detail, request.user))
+            if core_utils.is_etag_matched(request, etag):
+                return NotModifiedResponse(etag)
             serializer = self.list_serializer_class(wall_detail, context={'request': request.user,
                                                                           'section_wall': wall_detail})
-            return SuccessResponse(serializer.data, status=status_code.HTTP_200_OK)
+            response = SuccessResponse(serializer.data, status=status_code.HTTP_200_OK)
+            response['ETag'] = etag
+            return response
         return SuccessResponse({}, status=status_code.HTTP_200_OK)
 
     # def list(self, request):
@@ -819,10 +931,13 @@ class WallRouteViewSet(viewsets.ViewSet):
             :param route_id:
             :return: response
         """
-        route_tag = WallRoute.objects.select_related('section_wall', 'grade', 'color', 'route_type',).filter(id=route_id).first()
+        route_tag = WallRoute.objects.select_related('section_wall', 'gym', 'grade', 'color', 'route_type',
+                                                     'route_stats',).\
+            annotate(is_added_into_category=Exists(RouteSaveList.objects.filter(
+                route=OuterRef('pk'), user=request.user, list_category__is_deleted=False))).filter(id=route_id).first()
         if route_tag:
             # For block gym
-            common_block_gym_fun(request.user, route_tag.section_wall.gym_layout.gym)
+            common_block_gym_fun(request.user, route_tag.gym)
             serializer = self.detail_serializer_class(route_tag, context={'user': request.user})
             return SuccessResponse(serializer.data, status=status_code.HTTP_200_OK)
         # return SuccessResponse({}, status=status_code.HTTP_200_OK)
@@ -849,9 +964,9 @@ class WallRouteFeedbackViewSet(viewsets.ViewSet):
         """
         page_size = request.GET.get('page_size', '')
         # For block gym
-        route_tag = WallRoute.objects.filter(id=route_id).first()
+        route_tag = WallRoute.objects.select_related('gym').filter(id=route_id).first()
         if route_tag:
-            common_block_gym_fun(request.user, route_tag.section_wall.gym_layout.gym)
+            common_block_gym_fun(request.user, route_tag.gym)
         else:
             return Response(get_custom_error(message=validation_message.get('ROUTE_IS_DELETED'),
                                              error_location='wall_route', status=400),
@@ -989,11 +1104,9 @@ class RouteIntoCategoryViewSet(viewsets.ViewSet):
             # order_by('section_wall')
 
         # To annotate for gym details instead of get gym detail in serializer
-        gym_details = GymDetails.objects.filter(gym_layout__gym_layout_wall__section_wall_route=OuterRef('pk'))
         wall_route = WallRoute.objects.select_related('section_wall', 'grade', 'color', 'route_type',).prefetch_related('route_save_list').\
             filter(route_save_list__list_category=category_id, route_save_list__user=request.user).\
-            annotate(gym_id=Subquery(gym_details.values('id')[:1]),
-                     gym_name=Subquery(gym_details.values('gym_name')[:1])).order_by('-route_save_list')
+            annotate(gym_name=F('gym__gym_name')).order_by('-route_save_list')
 
         pagination_class = self.pagination_class()
         page = pagination_class.paginate_queryset(wall_route, request)
@@ -1061,6 +1174,7 @@ class RouteFeedbackViewSet(viewsets.ViewSet):
     action_serializers = {
         'list': RouteFeedbackDetailSerializer,
         'create': RouteFeedbackSerializer,
+        'batch_create': RouteFeedbackBatchSerializer,
         'retrieve': RouteFeedbackDetailSerializer
     }
 
@@ -1105,8 +1219,7 @@ class RouteFeedbackViewSet(viewsets.ViewSet):
         # Only not deleted feedbacks will show
         # feedbacks_queryset = UserRouteFeedback.objects.filter(user=request.user).order_by('-id').\
         #     values('id', 'route_id')
-        feedbacks_queryset = UserRouteFeedback.objects.filter(user=request.user, route__is_deleted=False).order_by('-id').\
-            values('id', 'route_id')
+        feedbacks_queryset = UserRouteFeedback.objects.filter(user=request.user, route__is_deleted=False)
         feedbacks = core_utils.show_latest_unique_feedback(feedbacks_queryset)
         updated_feedbacks = UserRouteFeedback.objects.select_related('gym', 'route', 'route__section_wall', 'route__grade',
                                                                      'route__color', 'route__route_type',). \
@@ -1135,6 +1248,19 @@ class RouteFeedbackViewSet(viewsets.ViewSet):
         serializer.save()
         return SuccessResponse(serializer.data, status=status_code.HTTP_200_OK)
 
+    def batch_create(self, request):
+        """
+            post method used to add (sync) a batch of route feedbacks with client keys, already synced
+            client keys are returned without creating them again.
+            :param request: feedbacks
+            :return: response
+        """
+        serializer = self.action_serializers.get(self.action)(data=request.data,
+                                                              context={'request': request.user})
+        serializer.is_valid(raise_exception=True)
+        serializer.save()
+        return SuccessResponse(serializer.data, status=status_code.HTTP_200_OK)
+
     def retrieve(self, request, feedback_id):
         """
         retrieve method used to get route feedback detail by id.
@@ -1190,14 +1316,22 @@ class AnnouncementViewSet(viewsets.ViewSet):
             common_block_gym_fun(request.user, gym_detail)
         # announcements = Announcement.objects.filter(gym=gym_id).order_by('-created_at')
         announcements = Announcement.objects.select_related('template').filter(gym=gym_id).order_by('-priority')
+        etag = core_utils.get_etag('announcement', gym_id, request.GET.urlencode(),
+                                   *core_utils.get_queryset_signature(announcements, 'updated_at',
+                                                                      'template__updated_at'))
+        if core_utils.is_etag_matched(request, etag):
+            return NotModifiedResponse(etag)
         pagination_class = self.pagination_class()
         page = pagination_class.paginate_queryset(announcements, request)
         if page is not None:
             serializer = self.action_serializers.get(self.action)(instance=page, many=True)
-            return SuccessResponse(pagination_class.get_paginated_response(serializer.data).data,
-                                   status=status_code.HTTP_200_OK)
-        serializer = self.action_serializers.get(self.action)(announcements, many=True)
-        return SuccessResponse(serializer.data, status=status_code.HTTP_200_OK)
+            response = SuccessResponse(pagination_class.get_paginated_response(serializer.data).data,
+                                       status=status_code.HTTP_200_OK)
+        else:
+            serializer = self.action_serializers.get(self.action)(announcements, many=True)
+            response = SuccessResponse(serializer.data, status=status_code.HTTP_200_OK)
+        response['ETag'] = etag
+        return response
 
     def retrieve(self, request, announcement_id):
         """
@@ -1245,15 +1379,26 @@ class EventViewSet(viewsets.ViewSet):
             common_block_gym_fun(request.user, gym_detail)
         today_date_time = datetime.now(timezone.utc)
         events = Event.objects.filter(gym=gym_id, start_date__gte=today_date_time).order_by('start_date')
+        # saved/going info of the user is part of the event listing
+        etag = core_utils.get_etag('event', gym_id, request.user.id, request.GET.urlencode(),
+                                   *core_utils.get_queryset_signature(events),
+                                   *core_utils.get_queryset_signature(SavedEvent.objects.filter(
+                                       user=request.user, save_event__in=events)))
+        if core_utils.is_etag_matched(request, etag):
+            return NotModifiedResponse(etag)
         pagination_class = self.pagination_class()
         page = pagination_class.paginate_queryset(events, request)
         if page is not None:
             serializer = self.action_serializers.get(self.action)(instance=page, many=True,
                                                                   context={'request': request.user})
-            return SuccessResponse(pagination_class.get_paginated_response(serializer.data).data,
-                                   status=status_code.HTTP_200_OK)
-        serializer = self.action_serializers.get(self.action)(events, many=True, context={'request': request.user})
-        return SuccessResponse(serializer.data, status=status_code.HTTP_200_OK)
+            response = SuccessResponse(pagination_class.get_paginated_response(serializer.data).data,
+                                       status=status_code.HTTP_200_OK)
+        else:
+            serializer = self.action_serializers.get(self.action)(events, many=True,
+                                                                  context={'request': request.user})
+            response = SuccessResponse(serializer.data, status=status_code.HTTP_200_OK)
+        response['ETag'] = etag
+        return response
 
     def create(self, request):
         """
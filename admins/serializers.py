@@ -10,7 +10,6 @@ from core.exception import CustomException
 from core import serializers as core_serializers
 from config.local import forgotpassword_url, emailverification_url, admin_forgotpassword_url
 from multiprocessing import Process
-from rest_framework.authtoken.models import Token
 from core.serializers import DynamicFieldsModelSerializer
 from django.contrib.gis.db import models
 from admins.models import SubscriptionPlan, Domain
@@ -133,8 +132,7 @@ class AdminResetPasswordSerializer(serializers.Serializer):
         user_obj.set_password(validated_data["password"])
         user_obj.save()
         # deleting token to signout user from  other devices
-        Token.objects.filter(user=user_obj).delete()
-        Token.objects.get_or_create(user=user_obj)
+        core_utils.reset_user_token(user_obj)
 
         # To mark token as used
         account_verify.is_used = True
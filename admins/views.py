@@ -34,6 +34,7 @@ from rest_framework.filters import SearchFilter
 from rest_framework import generics
 from django.shortcuts import get_object_or_404
 from core.permissions import CheckAdminRoleStatusPermission
+from core.authentication import invalidate_token_cache
 from admins.serializers import (ListSubscriptionSerializer,)
 from admins.models import SubscriptionPlan, Domain
 from core.exception import get_custom_error, CustomException
@@ -224,8 +225,8 @@ class StaffMemberCountViewSet(viewsets.ViewSet):
         # climber_count = user_data.filter(user_details__isnull=False).count()
         climber_count = user_data.filter(user_role__name=Role.RoleType.CLIMBER,
                                          user_role__role_status=True).count()
-        wall_count = SectionWall.all_objects.filter(layout_section__gym_layout__gym__isnull=False).count()
-        route_count = WallRoute.all_objects.filter(section_wall__layout_section__gym_layout__gym__isnull=False).count()
+        wall_count = SectionWall.all_objects.filter(gym__isnull=False).count()
+        route_count = WallRoute.all_objects.filter(gym__isnull=False).count()
         content = {
             'total_no_of_staff_members': staff_member_count,
             'total_gym_registered': gym_registered,
@@ -259,6 +260,16 @@ class ListUserViewSet(mixins.ListModelMixin, viewsets.GenericViewSet):
         return query
         # return self.filter_queryset(query)
 
+    def filter_queryset(self, queryset):
+        if self.request.query_params.get('search_type') != 'similar':
+            return super(ListUserViewSet, self).filter_queryset(queryset)
+        # ranked trigram search replaces the icontains search filter
+        for backend in self.filter_backends:
+            if backend is not filters.SearchFilter:
+                queryset = backend().filter_queryset(self.request, queryset, self)
+        return core_utils.get_trigram_search_queryset(queryset, self.request.query_params.get('search', ''),
+                                                      self.search_fields)
+
     def create(self, request, *args, **kwargs):
         response = super().list(self, request, *args, **kwargs)
         return SuccessResponse(response.data, status=status_code.HTTP_200_OK)
@@ -397,8 +408,8 @@ class GymProfileViewSet(viewsets.ViewSet):
                                                    user__user_role__role_status=True).count()
         layout_count = GymLayout.all_objects.filter(gym__user=gym_user_id).count()
         section_count = LayoutSection.all_objects.filter(gym_layout__gym__user=gym_user_id).count()
-        wall_count = SectionWall.all_objects.filter(layout_section__gym_layout__gym__user=gym_user_id).count()
-        route_count = WallRoute.all_objects.filter(section_wall__layout_section__gym_layout__gym__user=gym_user_id).count()
+        wall_count = SectionWall.all_objects.filter(gym__user=gym_user_id).count()
+        route_count = WallRoute.all_objects.filter(gym__user=gym_user_id).count()
         announcement_count = Announcement.all_objects.filter(gym__user=gym_user_id).count()
         event_count = Event.all_objects.filter(gym__user=gym_user_id).count()
         data = {}
@@ -426,9 +437,11 @@ class DeleteBulkUserViewSet(viewsets.ViewSet):
         print(action_type)
         if action_type == "ACTIVATE":
             User.all_objects.filter(id__in=user_ids).update(is_active=True)
+            invalidate_token_cache(user_ids)
             msg = success_message.get("BULK_USER_ACTIVATED")
         elif action_type == "DEACTIVATE":
             User.all_objects.filter(id__in=user_ids).update(is_active=False)
+            invalidate_token_cache(user_ids)
             msg = success_message.get("BULK_USER_DEACTIVATED")
         return SuccessResponse({"message": msg}, status=status_code.HTTP_200_OK)
 
@@ -441,6 +454,7 @@ class DeleteSingleUserViewSet(viewsets.ViewSet):
         user = User.objects.filter(id=user_id)
         if user:
             user.update(is_active=False)
+            invalidate_token_cache(user_id)
         return Response("Selected User has been deleted")
 
 
@@ -531,6 +545,7 @@ class ApproveViewSet(viewsets.ViewSet):
             gym_detail.update(is_admin_approved=True)
             user = User.objects.filter(gym_detail_user=gym_id)
             user.update(is_active=True)
+            invalidate_token_cache(list(user.values_list('id', flat=True)))
             to_mail = user.first().email
             # send approval mail to gym user
             p = Process(target=core_utils.send_html_mail_to_single_user,
@@ -563,6 +578,7 @@ class RejectViewSet(viewsets.ViewSet):
         if user_detail:
             to_mail = user_detail.first().email
             user_detail.update(is_active=False)
+            invalidate_token_cache(list(user_detail.values_list('id', flat=True)))
             # send rejection mail to gym user
             p = Process(target=core_utils.send_html_mail_to_single_user,
                         args=('Review Status Changed', to_mail, 'rejection_mail.html', {'email': to_mail}))
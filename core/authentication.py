@@ -1,16 +1,119 @@
 # authentication.py
+from django.conf import settings
+from django.core.cache import caches
 from rest_framework.authentication import TokenAuthentication, exceptions, _
+from rest_framework.authtoken.models import Token
 
 from core.messages import validation_message
 
+# token cache settings, the cache is only used with a shared cache backend from CACHES (e.g. redis) set as
+# TOKEN_CACHE_ALIAS so an invalidation is seen by every worker, it is off when the alias is None (default)
+# or TOKEN_CACHE_TIMEOUT = 0
+TOKEN_CACHE_TIMEOUT = getattr(settings, 'TOKEN_CACHE_TIMEOUT', 60)
+TOKEN_CACHE_ALIAS = getattr(settings, 'TOKEN_CACHE_ALIAS', None)
+TOKEN_CACHE_ENABLED = bool(TOKEN_CACHE_TIMEOUT and TOKEN_CACHE_ALIAS)
+TOKEN_CACHE_PREFIX = 'auth_token:'
+
+
+class TokenSnapshotCache:
+    """
+        TokenSnapshotCache class used to keep token key -> (user id, token created) in the shared cache backend,
+        there is no process level copy so a deleted snapshot is gone for every worker. The user itself is never
+        cached, it is loaded fresh on every request so profile/flag changes are seen at once.
+    """
+
+    def __init__(self, timeout, alias):
+        self.timeout = timeout
+        self.alias = alias
+
+    @property
+    def shared_cache(self):
+        return caches[self.alias]
+
+    def get(self, key):
+        """
+            method used to get the token snapshot, returns None on miss.
+        :param key:
+        :return: (user id, token created) or None
+        """
+        return self.shared_cache.get(TOKEN_CACHE_PREFIX + key)
+
+    def set(self, key, token):
+        """
+            method used to store the token snapshot.
+        :param key:
+        :param token:
+        :return:
+        """
+        self.shared_cache.set(TOKEN_CACHE_PREFIX + key, (token.user_id, token.created), self.timeout)
+
+    def delete(self, keys):
+        """
+            method used to remove the token snapshots.
+        :param keys:
+        :return:
+        """
+        if keys:
+            self.shared_cache.delete_many([TOKEN_CACHE_PREFIX + key for key in keys])
+
+
+token_cache = TokenSnapshotCache(TOKEN_CACHE_TIMEOUT, TOKEN_CACHE_ALIAS)
+
+
+def invalidate_token_keys(keys):
+    """
+        method used to drop the cached snapshots of the token keys, use it after the tokens are deleted
+        so a request running meanwhile can not cache the old token again.
+    :param keys: token keys
+    :return:
+    """
+    if TOKEN_CACHE_ENABLED:
+        token_cache.delete(list(keys))
+
+
+def invalidate_token_cache(user_ids):
+    """
+        method used to drop cached token snapshots of the users, call it whenever a token is
+        re-created or the user is activated, deactivated or deleted.
+    :param user_ids: user id or list of user ids
+    :return:
+    """
+    if not TOKEN_CACHE_ENABLED:
+        return
+    if not isinstance(user_ids, (list, tuple, set)):
+        user_ids = [user_ids]
+    invalidate_token_keys(Token.objects.filter(user_id__in=user_ids).values_list('key', flat=True))
+
 
 class CustomTokenAuthentication(TokenAuthentication):
+    def get_cached_token(self, model, key):
+        """
+            method used to build the token from the cached snapshot with the user loaded fresh, returns None on
+            miss or when the user row is gone.
+        :param model:
+        :param key:
+        :return:
+        """
+        snapshot = token_cache.get(key)
+        if snapshot is None:
+            return None
+        user_id, created = snapshot
+        user = model._meta.get_field('user').related_model._base_manager.filter(id=user_id).first()
+        if user is None:
+            token_cache.delete([key])
+            return None
+        return model(key=key, user=user, created=created)
+
     def authenticate_credentials(self, key):
         model = self.get_model()
-        try:
-            token = model.objects.select_related('user').get(key=key)
-        except model.DoesNotExist:
-            raise exceptions.AuthenticationFailed(_('Invalid token.'))
+        token = self.get_cached_token(model, key) if TOKEN_CACHE_ENABLED else None
+        if token is None:
+            try:
+                token = model.objects.select_related('user').get(key=key)
+            except model.DoesNotExist:
+                raise exceptions.AuthenticationFailed(_('Invalid token.'))
+            if TOKEN_CACHE_ENABLED:
+                token_cache.set(key, token)
         if not token.user.is_active or token.user.is_deleted:  # Here I added something new !!
             # raise exceptions.AuthenticationFailed(_('User inactive or deleted.'))
             raise exceptions.AuthenticationFailed(_(validation_message.get('ACCOUNT_DEACTIVATED')))
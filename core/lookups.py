@@ -0,0 +1,55 @@
+"""
+    file contains project level lookups and expressions
+"""
+from django.db.models import CharField, FloatField, Func, IntegerField, Lookup, Value
+from django.db.models.lookups import IContains
+
+
+@CharField.register_lookup
+class TrigramWordSimilar(Lookup):
+    """
+        TrigramWordSimilar lookup used for the pg_trgm word similarity operator, answered from a
+        gin_trgm_ops index of the column (field__trigram_word_similar='bouldr').
+    """
+    lookup_name = 'trigram_word_similar'
+
+    def as_sql(self, compiler, connection):
+        lhs, lhs_params = self.process_lhs(compiler, connection)
+        rhs, rhs_params = self.process_rhs(compiler, connection)
+        return '%s %%> %s' % (lhs, rhs), lhs_params + rhs_params
+
+
+@CharField.register_lookup
+class TrigramIContains(IContains):
+    """
+        TrigramIContains lookup used for a case insensitive substring match written as ILIKE, unlike
+        icontains (UPPER(field) LIKE) it is answered from a gin_trgm_ops index of the column
+        (field__trigram_icontains='crimp').
+    """
+    lookup_name = 'trigram_icontains'
+
+    def as_sql(self, compiler, connection):
+        lhs, lhs_params = self.process_lhs(compiler, connection)
+        rhs, rhs_params = self.process_rhs(compiler, connection)
+        return '%s ILIKE %s' % (lhs, rhs), lhs_params + rhs_params
+
+
+class TrigramWordSimilarity(Func):
+    """
+        TrigramWordSimilarity expression used to rank the trigram word similarity matches.
+    """
+    function = 'WORD_SIMILARITY'
+    output_field = FloatField()
+
+    def __init__(self, expression, string, **extra):
+        if not hasattr(string, 'resolve_expression'):
+            string = Value(string)
+        super().__init__(string, expression, **extra)
+
+
+class Age(Func):
+    """
+        Age expression used to get the age in full years of a date column (birthday) on the database date.
+    """
+    template = "CAST(DATE_PART('year', AGE(%(expressions)s)) AS integer)"
+    output_field = IntegerField()
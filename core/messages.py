@@ -57,6 +57,15 @@ success_message = {
 # validation message dictionary.
 validation_message = {
     "LAT_LNG_FOR_ADDRESS": "Please provide lat and lng of address",
+    "PROVIDE_LAT_LNG": "Please provide valid lat, lng, radius and limit.",
+    "PROVIDE_FLOOR_POINT": "Please provide the floor id and valid x, y point.",
+    "FEEDBACK_BATCH_LIMIT": "Maximum {} feedbacks can be synced at once.",
+    "DUPLICATE_CLIENT_KEY": "Client keys of the feedbacks must be unique.",
+    "PROVIDE_TREND_RANGE": "Please provide valid start_date, end_date (YYYY-MM-DD) and interval (day, week or month).",
+    "TREND_RANGE_TOO_LARGE": "Date range is too large for the interval, maximum {} buckets are allowed.",
+    "INVALID_AGE_RANGE": "Please provide a valid age range (min-max).",
+    "INVALID_CURSOR": "Please provide a valid cursor and order_by for the cursor pagination.",
+    "PROVIDE_ROUTE_TAG_POINT": "Please provide the wall id and a valid x, y point or min_x, min_y, max_x, max_y box.",
     "EMAIL_DOMAIN_WRONG": "Domain should match with the registered Domain Names.",
     'EMAIL_ALREADY_EXIST': "This email is already registered.",
     "EMAIL_ALREADY_VERIFIED": "Email has been verified already.",
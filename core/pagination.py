@@ -1,3 +1,10 @@
+import base64
+import binascii
+import json
+from datetime import datetime
+
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
 from rest_framework.pagination import PageNumberPagination
 
 
@@ -11,3 +18,80 @@ class CustomPagination(PageNumberPagination):
         """
         self.page_size_query_param = 'page_size'
         return super(CustomPagination, self).paginate_queryset(queryset, request, view)
+
+
+class KeysetPagination(object):
+    """
+        KeysetPagination class used to paginate a query set annotated with keyset_value by a (keyset_value, id)
+        cursor, the next page is read with a range filter instead of an offset so page N costs the same as page 1
+    """
+    cursor_query_param = 'cursor'
+    page_size_query_param = 'page_size'
+    page_size = 20
+    max_page_size = 500
+    value_field = 'keyset_value'
+
+    def __init__(self):
+        self.next_cursor = None
+
+    def get_page_size(self, request):
+        """
+            method used to get the requested page size
+        """
+        try:
+            page_size = int(request.query_params.get(self.page_size_query_param, self.page_size))
+        except (TypeError, ValueError):
+            return self.page_size
+        return min(max(page_size, 1), self.max_page_size)
+
+    def encode_cursor(self, row):
+        """
+            method used to encode the cursor of the last row of the page, datetimes are kept with their
+            microseconds so the next page starts exactly after the row
+        """
+        value = row[self.value_field]
+        if isinstance(value, datetime):
+            value = {'datetime': value.isoformat()}
+        cursor = json.dumps([value, row['id']])
+        return base64.urlsafe_b64encode(cursor.encode()).decode()
+
+    def decode_cursor(self, cursor):
+        """
+            method used to decode the cursor, raises ValueError for an invalid cursor
+        """
+        try:
+            value, last_id = json.loads(base64.urlsafe_b64decode(cursor.encode()).decode())
+            if isinstance(value, dict):
+                value = parse_datetime(value['datetime'])
+                if value is None:
+                    raise ValueError('Invalid cursor')
+            return value, int(last_id)
+        except (KeyError, TypeError, ValueError, binascii.Error):
+            raise ValueError('Invalid cursor')
+
+    def paginate_queryset(self, queryset, request, descending=False):
+        """
+            method used to paginate the query set, raises ValueError for an invalid cursor
+        """
+        page_size = self.get_page_size(request)
+        cursor = request.query_params.get(self.cursor_query_param)
+        if descending:
+            queryset = queryset.order_by('-%s' % self.value_field, '-id')
+        else:
+            queryset = queryset.order_by(self.value_field, 'id')
+        if cursor:
+            value, last_id = self.decode_cursor(cursor)
+            lookup = 'lt' if descending else 'gt'
+            queryset = queryset.filter(Q(**{'%s__%s' % (self.value_field, lookup): value}) |
+                                       Q(**{self.value_field: value, 'id__%s' % lookup: last_id}))
+        rows = list(queryset[:page_size + 1])
+        if len(rows) > page_size:
+            rows = rows[:page_size]
+            self.next_cursor = self.encode_cursor(rows[-1])
+        return rows
+
+    def get_paginated_response(self, data):
+        """
+            method used to get the paginated response data
+        """
+        return {'next_cursor': self.next_cursor, 'results': data}
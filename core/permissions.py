@@ -1,6 +1,7 @@
 from django.db.models import Q
 from rest_framework.permissions import BasePermission
 from accounts.models import Role
+from core import utils as core_utils
 from core.exception import CustomException
 from core.messages import variables, validation_message
 from rest_framework.authtoken.models import Token
@@ -27,8 +28,7 @@ class AppClimberPermission(BasePermission):
     message = variables.get("PERMISSION_MESSAGE")
 
     def has_permission(self, request, view):
-        if Role.objects.filter(user__email=request.user.email, name=Role.RoleType.CLIMBER,
-                               role_status=True).exists():
+        if Role.RoleType.CLIMBER in core_utils.get_request_role_context(request)['roles']:
             return True
         return False
 
@@ -41,8 +41,7 @@ class AppStaffPermission(BasePermission):
     message = variables.get("STAFF_PERMISSION_MESSAGE")
 
     def has_permission(self, request, view):
-        if Role.objects.filter(user__email=request.user.email, name=Role.RoleType.GYM_STAFF,
-                               role_status=True).exists():
+        if Role.RoleType.GYM_STAFF in core_utils.get_request_role_context(request)['roles']:
             return True
         return False
 
@@ -131,9 +130,8 @@ class IsGymOwner(BasePermission):
             # token_obj = Token.objects.filter(key=token).first()
             # if Role.objects.filter(user__email=request.user.email,name=Role.RoleType.GYM_OWNER,
             #                        role_status=True).exists():
-            if Role.objects.filter(user__email=request.user.email.lower(),
-                                   name__in=[Role.RoleType.GYM_OWNER, Role.RoleType.GYM_STAFF],
-                                   role_status=True).exists():
+            roles = core_utils.get_request_role_context(request)['roles']
+            if {Role.RoleType.GYM_OWNER, Role.RoleType.GYM_STAFF} & roles:
                 return True
             else:
                 return False
@@ -13,3 +13,15 @@ class SuccessResponse(Response):
         """
         result = {"data": data}
         super().__init__(result, status)
+
+
+class NotModifiedResponse(Response):
+    """
+        NotModifiedResponse class used to answer a conditional GET whose ETag still matches.
+    """
+    def __init__(self, etag):
+        """
+            override the default constructor
+        :param etag:
+        """
+        super().__init__(status=304, headers={'ETag': etag})
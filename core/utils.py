@@ -1,18 +1,27 @@
 """
     file contains project level methods
 """
+import hashlib
 import os
 import secrets
 import uuid
 from datetime import date, datetime, timedelta
 from dateutil.relativedelta import relativedelta
+from itertools import chain
 import random
 import sendgrid
-from math import ceil
+from math import ceil, cos, radians
 from multiprocessing import Process
 
-from django.contrib.gis.geos import Point
-from django.db.models import Count, Max, Sum, Q, ExpressionWrapper, Func
+from django.conf import settings
+from django.contrib.gis.db.models import GeographyField, PointField
+from django.contrib.gis.db.models.functions import Distance
+from django.contrib.gis.geos import Point, Polygon
+from django.contrib.gis.measure import D
+from django.core.cache import cache
+from django.db import connection, transaction
+from django.db.models import Count, Exists, Max, Sum, Q, ExpressionWrapper, Func, IntegerField, OuterRef, Prefetch, \
+    Subquery, Value
 from django.template.loader import render_to_string
 from django.utils import timezone
 from fcm_django.models import FCMDevice
@@ -21,8 +30,10 @@ from rest_framework.authtoken.models import Token
 from sendgrid.helpers.mail import Content, Email, Mail, To
 
 from accounts.models import AccountVerification, Role, UserDetails, UserPreference, UserRouteFeedback, WallVisit, User, \
-    UserDetailPercentage, UserSubscription, GymVisit, UserBiometricData
+    UserDetailPercentage, UserSubscription, GymVisit, UserBiometricData, PendingWallVisit, RouteSaveList
 from config.local import (FROM_EMAIL, SEND_GRID_API_KEY, emailverification_url, ADMIN_MAIL)
+from core.authentication import invalidate_token_cache, invalidate_token_keys
+from core.lookups import Age, TrigramWordSimilarity
 from core.exception import CustomException
 from core.messages import validation_message, success_message
 from core.messages import variables
@@ -32,13 +43,55 @@ from rest_framework.response import Response
 from core.exception import get_custom_error, CustomException
 from rest_framework import status as status_code
 from gyms.models import WallRoute
-from django.db.models import Count, Avg, Max, DecimalField, FloatField, F
-from django.db.models.functions import Cast
-from gyms.models import GymLayout,LayoutSection,SectionWall
+from django.db.models import Count, Max, Min, DateField, DateTimeField, DecimalField, FloatField, F
+from django.db.models.functions import Coalesce, Greatest, Trunc, TruncDate
+from gyms.models import GymLayout,LayoutSection,SectionWall, SectionWallStats, WallRouteStats, bump_gym_content_version, \
+    GymDailyStats
 
 import logging
 log = logging.getLogger(__name__)
 
+WALL_VISIT_BUFFER_TIMEOUT = getattr(settings, 'WALL_VISIT_BUFFER_TIMEOUT', 60 * 60 * 24)
+ROUTE_FEEDBACK_BATCH_LIMIT = getattr(settings, 'ROUTE_FEEDBACK_BATCH_LIMIT', 100)
+GYM_LAYOUT_CACHE_TIMEOUT = getattr(settings, 'GYM_LAYOUT_CACHE_TIMEOUT', 60 * 60 * 24)
+NEARBY_GYM_LIMIT = getattr(settings, 'NEARBY_GYM_LIMIT', 20)
+NEARBY_GYM_MAX_LIMIT = getattr(settings, 'NEARBY_GYM_MAX_LIMIT', 100)
+TRIGRAM_SEARCH_LIMIT = getattr(settings, 'TRIGRAM_SEARCH_LIMIT', 50)
+ROUTE_TAG_LIMIT = getattr(settings, 'ROUTE_TAG_LIMIT', 10)
+ROUTE_TAG_MAX_LIMIT = getattr(settings, 'ROUTE_TAG_MAX_LIMIT', 500)
+DASHBOARD_TREND_MAX_BUCKETS = getattr(settings, 'DASHBOARD_TREND_MAX_BUCKETS', 400)
+# member list orderings paginated by cursor, with the value used in place of null
+MEMBER_LIST_KEYSET_FIELDS = {
+    'user_details__home_gym_added_on': Value(datetime(1970, 1, 1, tzinfo=timezone.utc), output_field=DateTimeField()),
+    'last_updated': Value(datetime(1970, 1, 1, tzinfo=timezone.utc), output_field=DateTimeField()),
+    'full_name': Value(''),
+    'email': None,
+    'submitted': None,
+    'id': None,
+}
+DASHBOARD_TREND_INTERVALS = ('day', 'week', 'month')
+# red point, flash and on sight are counted as completed
+COMPLETED_ROUTE_PROGRESS = [UserRouteFeedback.RouteProgressType.RED_POINT, UserRouteFeedback.RouteProgressType.FLASH,
+                            UserRouteFeedback.RouteProgressType.ON_SIGHT]
+# route stats climber fields of each route progress and (climber, feedback count) fields of each community grade
+ROUTE_PROGRESS_STATS_FIELDS = {
+    UserRouteFeedback.RouteProgressType.PROJECTING: 'projecting_climbers',
+    UserRouteFeedback.RouteProgressType.RED_POINT: 'red_point_climbers',
+    UserRouteFeedback.RouteProgressType.FLASH: 'flash_climbers',
+    UserRouteFeedback.RouteProgressType.ON_SIGHT: 'on_sight_climbers',
+}
+# per day rollup fields of the gym dashboard
+GYM_DAILY_FEEDBACK_FIELDS = ['feedback_count', 'projecting_count', 'red_point_count', 'flash_count', 'on_sight_count']
+GYM_DAILY_STATS_FIELDS = GYM_DAILY_FEEDBACK_FIELDS + ['wall_visit_count', 'new_wall_count', 'new_member_count']
+COMMUNITY_GRADE_STATS_FIELDS = {
+    UserRouteFeedback.CommunityGradeType.NEGATIVE: ('negative_climbers', 'negative_grade_count'),
+    UserRouteFeedback.CommunityGradeType.NORMAL: ('normal_climbers', 'normal_grade_count'),
+    UserRouteFeedback.CommunityGradeType.POSITIVE: ('positive_climbers', 'positive_grade_count'),
+}
+ROUTE_STATS_FIELDS = ['rating_sum', 'rating_count', 'feedback_climbers', 'completed_climbers', 'graded_climbers'] + \
+    list(ROUTE_PROGRESS_STATS_FIELDS.values()) + \
+    [field_name for each in COMMUNITY_GRADE_STATS_FIELDS.values() for field_name in each]
+
 
 def get_the_week_day_mapping(week_day_name):
     """
@@ -142,12 +195,28 @@ def get_or_create_user_token(instance):
     :return: token key
     """
     try:
+        # refresh the cached token snapshot on every login
+        invalidate_token_cache(instance.id)
         token, created = Token.objects.get_or_create(user=instance)
     except Exception as e:
         print(e)
     return token.key
 
 
+def reset_user_token(user_obj):
+    """
+        method used to delete the user token (sign out from other devices) and create a new one
+    :param user_obj:
+    :return: token
+    """
+    old_tokens = Token.objects.filter(user=user_obj)
+    old_keys = list(old_tokens.values_list('key', flat=True))
+    old_tokens.delete()
+    invalidate_token_keys(old_keys)
+    token, created = Token.objects.get_or_create(user=user_obj)
+    return token
+
+
 def update_or_create_fcm_detail(user, registration_id, device_type):
     """
         method used to save the fcm device token details
@@ -527,6 +596,236 @@ def get_is_selected_floor(dict_val, floor_id):
     return dict_val
 
 
+def get_gym_layout_cache_key(layout_type, gym_detail, category, floor_id):
+    """
+        method used to get the cache key of the serialized gym layout, the gym content version is part
+        of the key so any layout/section/wall change makes the old payloads unreachable.
+    :param layout_type: climber or staff
+    :param gym_detail:
+    :param category:
+    :param floor_id:
+    :return:
+    """
+    return 'gym_layout:{}:{}:{}:{}:{}'.format(layout_type, gym_detail.id, category, floor_id,
+                                              gym_detail.content_version)
+
+
+def get_cached_gym_layout_data(layout_type, gym_detail, category, floor_id, build_layout_data):
+    """
+        method used to get the serialized gym layout from cache, it is built and cached on miss.
+    :param layout_type: climber or staff
+    :param gym_detail:
+    :param category:
+    :param floor_id:
+    :param build_layout_data: callable returning the serialized gym layout
+    :return:
+    """
+    cache_key = get_gym_layout_cache_key(layout_type, gym_detail, category, floor_id)
+    gym_layout_data = cache.get(cache_key)
+    if gym_layout_data is None:
+        gym_layout_data = build_layout_data()
+        cache.set(cache_key, gym_layout_data, GYM_LAYOUT_CACHE_TIMEOUT)
+    return gym_layout_data
+
+
+class KNNDistance(Func):
+    """
+        KNNDistance class used to order by the <-> distance operator, which postgres answers from the
+        GiST index of the geometry column (nearest first) instead of sorting every row.
+    """
+    arg_joiner = ' <-> '
+    template = '(%(expressions)s)'
+    output_field = FloatField()
+
+
+class SubqueryCount(Subquery):
+    """
+        SubqueryCount class used to annotate the row count of an uncorrelated queryset, postgres runs it
+        once per query.
+    """
+    template = '(SELECT COUNT(*) FROM (%(subquery)s) _count)'
+    output_field = IntegerField()
+
+
+def get_nearby_gyms(lat, lng, radius=None):
+    """
+        method used to get the approved gyms ordered by distance from the location.
+    :param lat:
+    :param lng:
+    :param radius: radius in km, no radius limit if None
+    :return: queryset annotated with the distance
+    """
+    point = Point(x=lng, y=lat, srid=4326)
+    gyms = GymDetails.objects.filter(geo_point__isnull=False, user__is_active=True, is_admin_approved=True)
+    if radius is not None:
+        # index assisted bounding box (&&) first, then the exact sphere distance
+        lat_delta = radius / 111.32
+        lng_delta = min(radius / (111.32 * max(cos(radians(lat)), 0.01)), 180)
+        bbox = Polygon.from_bbox((lng - lng_delta, lat - lat_delta, lng + lng_delta, lat + lat_delta))
+        bbox.srid = 4326
+        gyms = gyms.filter(geo_point__bboverlaps=bbox, geo_point__distance_lte=(point, D(km=radius)))
+    # geography <-> orders by the sphere distance like the reported Distance (geometry <-> would order by
+    # planar degrees), answered from the gym_geo_point_geog_idx GiST index of geo_point::geography
+    return gyms.annotate(distance=Distance('geo_point', point)).order_by(
+        KNNDistance(Func('geo_point', template='(%(expressions)s)::geography', output_field=GeographyField()),
+                    Value(point, output_field=GeographyField(srid=4326))), 'id')
+
+
+def get_section_at_point(floor_id, x, y):
+    """
+        method used to hit test the floor sections, returns the section containing the image point.
+        Sections are matched with ST_Contains on the spatial index of section_point.
+    :param floor_id:
+    :param x:
+    :param y:
+    :return: section or None
+    """
+    point = Point(x=x, y=y, srid=4326)
+    return LayoutSection.objects.prefetch_related('section_wall').filter(
+        gym_layout=floor_id, section_point__contains=point).order_by('id').first()
+
+
+def get_nearest_route_tags(queryset, x, y, radius=None):
+    """
+        method used to order the route tags by the distance from the wall image point, nearest first.
+        The <-> ordering and the ST_DWithin radius are answered from the GiST index of tag_geom.
+    :param queryset: WallRoute or GhostWallRoute queryset
+    :param x:
+    :param y:
+    :param radius: max distance in image units, no radius limit if None
+    :return: queryset annotated with the distance
+    """
+    point = Point(x=x, y=y, srid=4326)
+    queryset = queryset.filter(tag_geom__isnull=False)
+    if radius is not None:
+        queryset = queryset.filter(tag_geom__dwithin=(point, radius))
+    return queryset.annotate(
+        distance=KNNDistance('tag_geom', Value(point, output_field=PointField(srid=4326)))).order_by('distance', 'id')
+
+
+def get_route_tags_in_bbox(queryset, min_x, min_y, max_x, max_y):
+    """
+        method used to get the route tags inside the wall image box, matched on the GiST index of tag_geom.
+    :param queryset: WallRoute or GhostWallRoute queryset
+    :param min_x:
+    :param min_y:
+    :param max_x:
+    :param max_y:
+    :return: queryset
+    """
+    bbox = Polygon.from_bbox((min(min_x, max_x), min(min_y, max_y), max(min_x, max_x), max(min_y, max_y)))
+    bbox.srid = 4326
+    return queryset.filter(tag_geom__contained=bbox).order_by('id')
+
+
+def get_route_tag_list(queryset, query_params):
+    """
+        method used to get the route tags of a wall for the tap selection/overlap check, either nearest to
+        the x, y point (optional radius, limit, exclude_id) or inside the min_x, min_y, max_x, max_y box.
+        Raises ValueError on invalid params.
+    :param queryset: WallRoute or GhostWallRoute queryset of the wall
+    :param query_params:
+    :return: list of route tags
+    """
+    limit = min(int(query_params.get('limit') or ROUTE_TAG_LIMIT), ROUTE_TAG_MAX_LIMIT)
+    if limit <= 0:
+        raise ValueError('invalid route tag limit')
+    if query_params.get('exclude_id'):
+        queryset = queryset.exclude(id=int(query_params.get('exclude_id')))
+    if all(query_params.get(key, '') != '' for key in ('min_x', 'min_y', 'max_x', 'max_y')):
+        route_tags = get_route_tags_in_bbox(queryset, *[float(query_params.get(key))
+                                                        for key in ('min_x', 'min_y', 'max_x', 'max_y')])
+        return list(route_tags.values('id', 'name', 'tag_point')[:limit])
+    radius = float(query_params.get('radius')) if query_params.get('radius') else None
+    if radius is not None and radius < 0:
+        raise ValueError('invalid route tag radius')
+    route_tags = get_nearest_route_tags(queryset, float(query_params.get('x', '')), float(query_params.get('y', '')),
+                                        radius)
+    return list(route_tags.values('id', 'name', 'tag_point', 'distance')[:limit])
+
+
+def get_trigram_search_queryset(queryset, search, search_fields, limit=None):
+    """
+        method used to filter the queryset by trigram word similarity (typo tolerant) on the search fields
+        and rank the matches, best match first.
+    :param queryset:
+    :param search:
+    :param search_fields: field names/paths having a gin_trgm_ops index
+    :param limit: top N matches, TRIGRAM_SEARCH_LIMIT if None
+    :return: queryset annotated with the similarity
+    """
+    if not search:
+        return queryset
+    model_objects = queryset.model._base_manager
+    match_filter = Q()
+    # one indexed sub query per field, an OR over joined columns can not use the indexes
+    for field_name in search_fields:
+        match_filter |= Q(pk__in=model_objects.filter(
+            **{'{}__trigram_word_similar'.format(field_name): search}).values('pk'))
+    similarity = [Coalesce(TrigramWordSimilarity(field_name, search), Value(0.0)) for field_name in search_fields]
+    similarity = Greatest(*similarity) if len(similarity) > 1 else similarity[0]
+    queryset = queryset.filter(match_filter).annotate(similarity=similarity).order_by('-similarity', 'pk')
+    return queryset[:limit or TRIGRAM_SEARCH_LIMIT]
+
+
+def get_etag(*parts):
+    """
+        method used to build the ETag of a response from the values it depends on.
+    :param parts:
+    :return: quoted ETag
+    """
+    return '"{}"'.format(hashlib.md5(repr(parts).encode()).hexdigest())
+
+
+def is_etag_matched(request, etag):
+    """
+        method used to check the If-None-Match header of the request against the ETag.
+    :param request:
+    :param etag:
+    :return:
+    """
+    if_none_match = request.META.get('HTTP_IF_NONE_MATCH', '')
+    if not if_none_match:
+        return False
+    # proxies may weaken the ETag (W/"...") when they compress the response
+    client_etags = [each.strip().replace('W/', '', 1) for each in if_none_match.split(',')]
+    return etag in client_etags or '*' in client_etags
+
+
+def get_queryset_signature(queryset, *date_fields):
+    """
+        method used to get the row count and latest update time(s) of the queryset, to build the ETag
+        of a listing without serializing it.
+    :param queryset:
+    :param date_fields: fields to take the max of, updated_at if not provided
+    :return: tuple
+    """
+    date_fields = date_fields or ('updated_at',)
+    aggregates = {'field_{}'.format(index): Max(field_name) for index, field_name in enumerate(date_fields)}
+    signature = queryset.order_by().aggregate(row_count=Count('id'), **aggregates)
+    return (signature['row_count'],) + tuple(signature['field_{}'.format(index)] for index in range(len(date_fields)))
+
+
+def get_wall_route_signature(wall_detail, user):
+    """
+        method used to get the values the wall route listing of the user depends on: the wall, its stats,
+        its routes and the user's save list entries of those routes.
+    :param wall_detail:
+    :param user:
+    :return: tuple
+    """
+    wall_stats = SectionWallStats.objects.filter(section_wall=wall_detail).values_list(
+        'round_attempted', 'round_completed', 'wall_visit').first()
+    route_signature = get_queryset_signature(WallRoute.objects.filter(section_wall=wall_detail),
+                                             'updated_at', 'grade__updated_at', 'color__updated_at')
+    save_list_signature = tuple(RouteSaveList.route.through.objects.filter(
+        wallroute__section_wall=wall_detail, routesavelist__user=user).order_by('id').values_list(
+        'routesavelist', 'wallroute', 'routesavelist__list_category__is_deleted',
+        'routesavelist__list_category__updated_at'))
+    return (wall_detail.updated_at, wall_detail.gym_layout.gym.content_version, wall_stats, route_signature,
+            save_list_signature)
+
+
 def delete_staff_role_for_user(instance):
     """
         method used to delete staff role of user if have.
@@ -674,34 +973,291 @@ def get_percentage_from_grade_count(grade_count_list):
     return data_dict
 
 
-def get_round_completed_data(obj, visit_instance):
+def get_round_completed_data(obj, visit_instance=None):
     """
-        method used to get round completed details.
+        method used to get round completed details from the materialized wall stats.
     :param obj:
     :param visit_instance:
     :return:
     """
-    round_attempted_count = User.all_delete_objects.filter(
-        user_route_feedback__route__section_wall=obj, user_route_feedback__route_progress=0).distinct().count()
-    round_completed_count = User.all_delete_objects.filter(
-        user_route_feedback__route__section_wall=obj, user_route_feedback__route_progress__in=[1, 2, 3]). \
-        distinct().count()
-    wall_popularity_count = round_attempted_count + round_completed_count
-
-    if visit_instance:
-        # wall_visit_count = visit_instance.user.all().only('id').count()
-        wall_visit_count = WallVisit.objects.filter(wall=obj).only('id').count()
-    else:
-        wall_visit_count = 0
+    wall_stats = SectionWallStats.objects.filter(section_wall=obj).first()
+    if not wall_stats:
+        wall_stats = rebuild_wall_stats([obj.id])[0]
     data = {
-        'round_attempted': round_attempted_count,
-        'round_completed': round_completed_count,
-        'wall_popularity': wall_popularity_count,
-        'wall_visit': wall_visit_count
+        'round_attempted': wall_stats.round_attempted,
+        'round_completed': wall_stats.round_completed,
+        'wall_popularity': wall_stats.wall_popularity,
+        'wall_visit': wall_stats.wall_visit
     }
     return data
 
 
+def rebuild_wall_stats(wall_ids=None):
+    """
+        method used to recalculate the wall stats from feedback and visit history.
+    :param wall_ids: list of wall ids, all walls if None
+    :return: list of wall stats
+    """
+    walls = SectionWall.all_objects.all()
+    if wall_ids is not None:
+        walls = walls.filter(id__in=wall_ids)
+    wall_ids = list(walls.values_list('id', flat=True))
+    feedback_data = UserRouteFeedback.objects.filter(route__section_wall__in=wall_ids).\
+        values('route__section_wall').annotate(
+        round_attempted=Count('user', distinct=True,
+                              filter=Q(route_progress=UserRouteFeedback.RouteProgressType.PROJECTING)),
+        round_completed=Count('user', distinct=True, filter=Q(route_progress__in=COMPLETED_ROUTE_PROGRESS)))
+    feedback_data = {each['route__section_wall']: each for each in feedback_data}
+    visit_data = dict(WallVisit.objects.filter(wall__in=wall_ids).values('wall').annotate(count=Count('id')).
+                      values_list('wall', 'count'))
+    existing_stats = {each.section_wall_id: each for each in
+                      SectionWallStats.objects.filter(section_wall__in=wall_ids)}
+    update_list, create_list = [], []
+    for wall_id in wall_ids:
+        wall_stats = existing_stats.get(wall_id) or SectionWallStats(section_wall_id=wall_id)
+        wall_feedback = feedback_data.get(wall_id, {})
+        wall_stats.round_attempted = wall_feedback.get('round_attempted', 0)
+        wall_stats.round_completed = wall_feedback.get('round_completed', 0)
+        wall_stats.wall_visit = visit_data.get(wall_id, 0)
+        if wall_stats.pk:
+            update_list.append(wall_stats)
+        else:
+            create_list.append(wall_stats)
+    with transaction.atomic():
+        SectionWallStats.objects.bulk_update(update_list, ['round_attempted', 'round_completed', 'wall_visit'],
+                                             batch_size=500)
+        SectionWallStats.objects.bulk_create(create_list, batch_size=500, ignore_conflicts=True)
+    return update_list + create_list
+
+
+def lock_wall_stats_for_route(route_id):
+    """
+        method used to lock the stats row of the wall of the route until the transaction ends. Take it before
+        the feedback is created, so a concurrent feedback of the same climber on the wall waits and then sees
+        this one when it checks whether the climber is already counted.
+    :param route_id:
+    :return: wall stats or None
+    """
+    return SectionWallStats.objects.select_for_update(of=('self',)).filter(
+        section_wall__section_wall_route=route_id).first()
+
+
+def update_wall_stats_on_feedback(feedback_instance):
+    """
+        method used to update the wall stats when the climber submits a route feedback.
+        Climbers are counted once per wall for attempted and once for completed. Call it in the transaction
+        that created the feedback, after lock_wall_stats_for_route.
+    :param feedback_instance:
+    :return:
+    """
+    route_progress = feedback_instance.route_progress
+    if route_progress == UserRouteFeedback.RouteProgressType.PROJECTING:
+        progress_filter, field_name = [route_progress], 'round_attempted'
+    elif route_progress in COMPLETED_ROUTE_PROGRESS:
+        progress_filter, field_name = COMPLETED_ROUTE_PROGRESS, 'round_completed'
+    else:
+        return False
+    wall_id = WallRoute.all_objects.filter(id=feedback_instance.route_id).values_list('section_wall',
+                                                                                     flat=True).first()
+    if not wall_id:
+        return False
+    with transaction.atomic():
+        # already locked by lock_wall_stats_for_route when called from the feedback create
+        wall_stats = SectionWallStats.objects.select_for_update().filter(section_wall=wall_id).first()
+        if not wall_stats:
+            rebuild_wall_stats([wall_id])
+            return True
+        already_counted = UserRouteFeedback.objects.filter(
+            user=feedback_instance.user_id, route__section_wall=wall_id, route_progress__in=progress_filter).\
+            exclude(id=feedback_instance.id).exists()
+        if not already_counted:
+            SectionWallStats.objects.filter(id=wall_stats.id).update(**{field_name: F(field_name) + 1})
+    return True
+
+
+def update_wall_stats_on_visit(wall_ids, visit_count=1):
+    """
+        method used to add new wall visits to the wall stats.
+    :param wall_ids: wall id or list of wall ids
+    :param visit_count:
+    :return:
+    """
+    if not isinstance(wall_ids, (list, tuple, set)):
+        wall_ids = [wall_ids]
+    updated = SectionWallStats.objects.filter(section_wall__in=wall_ids).update(
+        wall_visit=F('wall_visit') + visit_count)
+    if updated != len(wall_ids):
+        missing = set(wall_ids) - set(SectionWallStats.objects.filter(section_wall__in=wall_ids).
+                                      values_list('section_wall', flat=True))
+        rebuild_wall_stats(list(missing))
+    return True
+
+
+def record_wall_visit(user, wall_id):
+    """
+        method used to buffer the wall visit of the user without touching WallVisit, repeated views of
+        the same wall are skipped through the cache.
+    :param user:
+    :param wall_id:
+    :return:
+    """
+    if cache.add('wall_visit:{}:{}'.format(wall_id, user.id), True, WALL_VISIT_BUFFER_TIMEOUT):
+        PendingWallVisit.objects.create(user=user, wall_id=wall_id)
+    return True
+
+
+def flush_pending_wall_visits(batch_size=5000):
+    """
+        method used to move the buffered wall visits into WallVisit (one row per user and wall)
+        and add the new visits to the wall stats.
+    :param batch_size:
+    :return: number of new wall visits
+    """
+    total_created = 0
+    while True:
+        with transaction.atomic():
+            pending_visits = list(PendingWallVisit.objects.select_for_update(skip_locked=True).
+                                  order_by('id').values('id', 'user', 'wall')[:batch_size])
+            if not pending_visits:
+                break
+            visit_pairs = sorted({(each['user'], each['wall']) for each in pending_visits})
+            # the unique (user, wall) constraint skips the pairs already inserted, also by a parallel flush,
+            # only the rows really inserted are returned and counted
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    'INSERT INTO {} (user_id, wall_id, created_at, updated_at, is_deleted) '
+                    'SELECT UNNEST(%s::integer[]), UNNEST(%s::integer[]), NOW(), NOW(), FALSE '
+                    'ON CONFLICT DO NOTHING RETURNING wall_id'.format(WallVisit._meta.db_table),
+                    [[each[0] for each in visit_pairs], [each[1] for each in visit_pairs]])
+                new_wall_ids = [each[0] for each in cursor.fetchall()]
+            PendingWallVisit.objects.filter(id__in=[each['id'] for each in pending_visits]).delete()
+            wall_visit_count = dict()
+            for wall_id in new_wall_ids:
+                wall_visit_count[wall_id] = wall_visit_count.get(wall_id, 0) + 1
+            visit_count_walls = dict()
+            for wall_id, visit_count in wall_visit_count.items():
+                visit_count_walls.setdefault(visit_count, []).append(wall_id)
+            for visit_count, walls in visit_count_walls.items():
+                update_wall_stats_on_visit(walls, visit_count)
+            total_created += len(new_wall_ids)
+    return total_created
+
+
+def get_route_stats(route):
+    """
+        method used to get the materialized feedback aggregates of the route.
+    :param route:
+    :return: route stats
+    """
+    try:
+        return route.route_stats
+    except WallRouteStats.DoesNotExist:
+        return rebuild_route_stats([route.id])[0]
+
+
+def rebuild_route_stats(route_ids=None):
+    """
+        method used to recalculate the route stats from the feedback history.
+    :param route_ids: list of route ids, all routes if None
+    :return: list of route stats
+    """
+    routes = WallRoute.all_objects.all()
+    if route_ids is not None:
+        routes = routes.filter(id__in=route_ids)
+    route_ids = list(routes.values_list('id', flat=True))
+    not_projecting = ~Q(route_progress=UserRouteFeedback.RouteProgressType.PROJECTING)
+    annotations = {
+        'rating_sum': Sum('rating', filter=not_projecting),
+        'rating_count': Count('id', filter=not_projecting),
+        'feedback_climbers': Count('user', distinct=True),
+        'completed_climbers': Count('user', distinct=True, filter=Q(route_progress__in=COMPLETED_ROUTE_PROGRESS)),
+        'graded_climbers': Count('user', distinct=True, filter=Q(grade__isnull=False)),
+    }
+    for route_progress, field_name in ROUTE_PROGRESS_STATS_FIELDS.items():
+        annotations[field_name] = Count('user', distinct=True, filter=Q(route_progress=route_progress))
+    for grade, (climber_field, count_field) in COMMUNITY_GRADE_STATS_FIELDS.items():
+        annotations[climber_field] = Count('user', distinct=True, filter=Q(grade=grade))
+        annotations[count_field] = Count('id', filter=Q(grade=grade))
+    feedback_data = UserRouteFeedback.objects.filter(route__in=route_ids).values('route').annotate(**annotations)
+    feedback_data = {each['route']: each for each in feedback_data}
+    existing_stats = {each.route_id: each for each in WallRouteStats.objects.filter(route__in=route_ids)}
+    update_list, create_list = [], []
+    for route_id in route_ids:
+        route_stats = existing_stats.get(route_id) or WallRouteStats(route_id=route_id)
+        route_feedback = feedback_data.get(route_id, {})
+        for field_name in ROUTE_STATS_FIELDS:
+            setattr(route_stats, field_name, route_feedback.get(field_name) or 0)
+        if route_stats.pk:
+            update_list.append(route_stats)
+        else:
+            create_list.append(route_stats)
+    with transaction.atomic():
+        WallRouteStats.objects.bulk_update(update_list, ROUTE_STATS_FIELDS, batch_size=500)
+        WallRouteStats.objects.bulk_create(create_list, batch_size=500, ignore_conflicts=True)
+    return update_list + create_list
+
+
+def get_route_feedback_contribution(feedback_values, count_climber=True):
+    """
+        method used to get what the feedbacks of one climber add to the route stats.
+    :param feedback_values: list of (route_progress, grade, rating) of the climber on the route
+    :param count_climber: False for feedbacks without user, those are not counted as climbers
+    :return: dict of route stats field and value
+    """
+    contribution = dict.fromkeys(ROUTE_STATS_FIELDS, 0)
+    for route_progress, grade, rating in feedback_values:
+        if route_progress != UserRouteFeedback.RouteProgressType.PROJECTING:
+            contribution['rating_sum'] += rating or 0
+            contribution['rating_count'] += 1
+        if grade in COMMUNITY_GRADE_STATS_FIELDS:
+            contribution[COMMUNITY_GRADE_STATS_FIELDS[grade][1]] += 1
+        if not count_climber:
+            continue
+        contribution['feedback_climbers'] = 1
+        if route_progress in COMPLETED_ROUTE_PROGRESS:
+            contribution['completed_climbers'] = 1
+        if route_progress in ROUTE_PROGRESS_STATS_FIELDS:
+            contribution[ROUTE_PROGRESS_STATS_FIELDS[route_progress]] = 1
+        if grade is not None:
+            contribution['graded_climbers'] = 1
+        if grade in COMMUNITY_GRADE_STATS_FIELDS:
+            contribution[COMMUNITY_GRADE_STATS_FIELDS[grade][0]] = 1
+    return contribution
+
+
+def update_route_stats_on_feedback(feedback_instance, previous_values=None):
+    """
+        method used to update the route stats when the climber adds or updates a route feedback.
+        Only the difference made by the feedback of this climber is applied to the stats row.
+    :param feedback_instance:
+    :param previous_values: (route_progress, grade, rating) of the feedback before the update, None on create
+    :return:
+    """
+    if not feedback_instance.route_id:
+        return False
+    with transaction.atomic():
+        # row lock serialises concurrent feedbacks on the same route
+        route_stats = WallRouteStats.objects.select_for_update().filter(route=feedback_instance.route_id).first()
+        if not route_stats:
+            rebuild_route_stats([feedback_instance.route_id])
+            return True
+        other_values = []
+        if feedback_instance.user_id:
+            other_values = list(UserRouteFeedback.objects.filter(
+                route=feedback_instance.route_id, user=feedback_instance.user_id).exclude(
+                id=feedback_instance.id).values_list('route_progress', 'grade', 'rating'))
+        current_values = (feedback_instance.route_progress, feedback_instance.grade, feedback_instance.rating)
+        count_climber = bool(feedback_instance.user_id)
+        before = get_route_feedback_contribution(other_values + ([previous_values] if previous_values else []),
+                                                 count_climber)
+        after = get_route_feedback_contribution(other_values + [current_values], count_climber)
+        changes = {field_name: F(field_name) + (after[field_name] - before[field_name])
+                   for field_name in ROUTE_STATS_FIELDS if after[field_name] != before[field_name]}
+        if changes:
+            WallRouteStats.objects.filter(id=route_stats.id).update(**changes)
+    return True
+
+
 def check_event_delete_or_pass_status(event_detail):
     """
         method used to check event deactivated or deleted or has been passed.
@@ -740,17 +1296,15 @@ def modify_data_group_by_wall(data):
     return main_dict
 
 
-def update_route_category_data(serialized_data, user):
-    try:
-        for each in serialized_data:
-            each['route_save_list'] = [j for j in each['route_save_list'] if j['user'] == user.id
-                                       and not j['list_category_is_deleted']]
-            # for i, j in enumerate(each['route_save_list']):
-            #     if j['user'] != user.id:
-            #         del each['route_save_list'][i]
-    except Exception:
-        pass
-    return serialized_data
+def get_user_route_save_list_prefetch(user):
+    """
+        method used to prefetch only the requested user's save list entries (with non deleted category)
+        of the routes instead of the entries of every user.
+    :param user:
+    :return: Prefetch object for route_save_list
+    """
+    return Prefetch('route_save_list', queryset=RouteSaveList.objects.select_related('list_category').filter(
+        user=user, list_category__is_deleted=False))
 
 
 def active_delete_announcement(announcement_detail, option_val):
@@ -766,7 +1320,8 @@ def active_delete_announcement(announcement_detail, option_val):
         is_active, is_deleted = True, True
         msg = success_message.get('ANNOUNCEMENT_DELETED_SUCCESSFULLY')
     try:
-        announcement_detail.update(is_active=is_active, is_deleted=is_deleted)
+        # queryset update skips auto_now, updated_at is set so the list ETag changes
+        announcement_detail.update(is_active=is_active, is_deleted=is_deleted, updated_at=timezone.now())
     except Exception:
         pass
     return msg
@@ -784,7 +1339,8 @@ def active_delete_event(event_detail, option_val):
         is_active, is_deleted = True, True
         msg = success_message.get('EVENT_DELETED_SUCCESSFULLY')
     try:
-        event_detail.update(is_active=is_active, is_deleted=is_deleted)
+        # queryset update skips auto_now, updated_at is set so the list ETag changes
+        event_detail.update(is_active=is_active, is_deleted=is_deleted, updated_at=timezone.now())
     except Exception:
         pass
     return msg
@@ -841,10 +1397,13 @@ def update_announcement_priority(announcement_objs, priority):
     :return:
     """
     user_bulk_update_list = list()
+    # bulk_update skips auto_now, updated_at is set so the announcement list ETag changes with the order
+    updated_at = timezone.now()
     for i, j in zip(announcement_objs, priority):
         i.priority = j
+        i.updated_at = updated_at
         user_bulk_update_list.append(i)
-    Announcement.objects.bulk_update(user_bulk_update_list, ['priority'])
+    Announcement.objects.bulk_update(user_bulk_update_list, ['priority', 'updated_at'])
     return True
 
 
@@ -897,107 +1456,59 @@ def serialize_all_data(serializer_name, announcements_1, announcements_2, priori
     return serialize_data_final
 
 
-def specific_route_details(route_id, route_obj):
-    class Round(Func):
-        function = 'ROUND'
-        arity = 2
-
-    route_details_obj = route_obj.values('id', 'name', 'color__name', 'color__hex_value', 'grade__sub_category_value',
-                                         'created_at', 'created_by__full_name', 'created_by__gym_detail_user__gym_name',
-                                         "section_wall__image", "section_wall__name",
-                                         ).annotate(avg_rating=Round(Avg('route_feedback__rating', filter=~Q(
-                                                                             route_feedback__route_progress=UserRouteFeedback.RouteProgressType.PROJECTING)), 1),
-                                                    count_climbers=Count('route_feedback__user', distinct=True,
-                                                                         filter=~Q(
-                                                                             route_feedback__route_progress=UserRouteFeedback.RouteProgressType.PROJECTING)
-                                                    # count_climbers=Count('route_feedback__rating'
-                                                                         )).first()
+def specific_route_details(route_obj, route_stats):
+    """
+        method used to get the route details with the rating from the route stats.
+    :param route_obj:
+    :param route_stats:
+    :return:
+    """
+    route_details_obj = WallRoute.all_objects.filter(id=route_obj.id).values(
+        'id', 'name', 'color__name', 'color__hex_value', 'grade__sub_category_value', 'created_at',
+        'created_by__full_name', 'created_by__gym_detail_user__gym_name', "section_wall__image", "section_wall__name",
+    ).first()
+    route_details_obj.update({'avg_rating': route_stats.avg_rating, 'count_climbers': route_stats.completed_climbers})
     return route_details_obj
 
 
-def route_progress_details(route_id, route_obj, count_of_objects):
-    count_of_objects_unique = count_of_objects.values_list('user_id', flat=True).distinct().count()
-    # count_of_objects = count_of_objects.count()
-    try:
-        update_data = route_obj.values(
-            "route_feedback__route_progress"
-        ).annotate(users_count=Count("route_feedback__user", distinct=True))
-        sum_data = sum(each['users_count'] for each in update_data)
-        if sum_data != 0:
-        # if count_of_objects != 0:
-            feedback_objs =route_obj.values(
-                "route_feedback__route_progress"
-            ).annotate(users_count=Count("route_feedback__user", distinct=True),
-                       percentage=Cast(Count("route_feedback__user", distinct=True
-                                             ) * 100, FloatField(),
-                                       ) / sum_data
-                       ).all()
-                       # users_count = Count("route_feedback__route_progress"),
-                       # percentage=Cast(Count("route_feedback__route_progress",
-                       #                       ) * 100, FloatField(),
-                       #                 ) / count_of_objects
-                       # ).all()
-        else:
-            feedback_objs = [
-                {
-                    "route_feedback__route_progress": None,
-                    "users_count": 0,
-                    "percentage": 0
-                }
-                ]
-    except Exception as e:
-        print(e)
-        feedback_objs = [
-            {
-                "route_feedback__route_progress": None,
-                "users_count": 0,
-                "percentage": 0
-            }
-        ]
-    return feedback_objs, count_of_objects_unique
-    # return feedback_objs, count_of_objects
+def get_route_stats_level(route_stats, level_fields, level_key):
+    """
+        method used to get climbers count and percentage of each level (route progress/community grade).
+    :param route_stats:
+    :param level_fields: dict of level and route stats field
+    :param level_key:
+    :return:
+    """
+    level_data = [(level, getattr(route_stats, field_name)) for level, field_name in level_fields.items()]
+    sum_data = sum(users_count for level, users_count in level_data)
+    if sum_data == 0:
+        return [{level_key: None, "users_count": 0, "percentage": 0}]
+    return [{level_key: level, "users_count": users_count, "percentage": users_count * 100 / sum_data}
+            for level, users_count in level_data if users_count]
 
 
-def community_grade_route_details(route_id, route_obj, count_of_objects):
-    count_of_objects_unique = count_of_objects.values_list('user_id', flat=True).distinct().count()
-    # count_of_objects = count_of_objects.count()
-    try:
-        update_data = route_obj.filter(route_feedback__grade__isnull=False).values(
-            "route_feedback__grade",
-        ).annotate(users_count=Count("route_feedback__user", distinct=True))
-        sum_data = sum(each['users_count'] for each in update_data)
-        # if count_of_objects != 0:
-        if sum_data != 0:
-            # feedback_objs = route_obj.values(
-            feedback_objs = route_obj.filter(route_feedback__grade__isnull=False).values(
-                "route_feedback__grade",
-            ).annotate(users_count=Count("route_feedback__user", distinct=True),
-                       percentage=Cast(Count("route_feedback__user", distinct=True
-                                             ) * 100, FloatField(),
-                                       ) / sum_data
-                       ).all()
-            # users_count = Count("route_feedback__grade"),
-            # percentage = Cast(Count("route_feedback__grade"
-            #                         ) * 100, FloatField(),
-            #                   ) / count_of_objects
-            # ).all()
-        else:
-            feedback_objs = [
-                {
-                    "route_feedback__grade": None,
-                    "users_count": 0,
-                    "percentage": 0
-                }]
-    except Exception as e:
-        print(e)
-        feedback_objs = [
-                {
-                    "route_feedback__grade": None,
-                    "users_count": 0,
-                    "percentage": 0
-                }]
-    return feedback_objs, count_of_objects_unique, route_obj.first().grade.sub_category_value
-    # return feedback_objs, count_of_objects, route_obj.first().grade.sub_category_value
+def route_progress_details(route_stats):
+    """
+        method used to get the route progress level of the route from the route stats.
+    :param route_stats:
+    :return:
+    """
+    feedback_objs = get_route_stats_level(route_stats, ROUTE_PROGRESS_STATS_FIELDS, "route_feedback__route_progress")
+    return feedback_objs, route_stats.feedback_climbers
+
+
+def community_grade_route_details(route_obj, route_stats):
+    """
+        method used to get the community grade level of the route from the route stats.
+    :param route_obj:
+    :param route_stats:
+    :return:
+    """
+    grade_fields = {grade: each[0] for grade, each in COMMUNITY_GRADE_STATS_FIELDS.items()}
+    feedback_objs = get_route_stats_level(route_stats, grade_fields, "route_feedback__grade")
+    grade_value = route_obj.grade.sub_category_value if route_obj.grade else None
+    return feedback_objs, route_stats.graded_climbers, grade_value
+
 
 def rating_range_output(rating,queryset):
     if int(rating) == 1:
@@ -1081,13 +1592,12 @@ def compare_updated_at(serialized_data, ordering):
     return order_serialized_data
 
 
-def update_copy_queryset_for_submitted_count(copy_queryset, queryset):
-    updated_queryset = [each_1 for each in queryset for each_1 in copy_queryset if each_1['id'] == each['id']]
-    return updated_queryset
-
-
 def update_age_calculation(query_data):
-    print("11111")
+    """
+        method used to add the age of each member row from the birthday, only called for the rows of a page
+    :param query_data:
+    :return:
+    """
     today = datetime.today().date()
     for each in query_data:
         birthday = each['user_biometric__birthday']
@@ -1095,19 +1605,21 @@ def update_age_calculation(query_data):
             each['age'] = today.year - birthday.year - ((today.month, today.day) < (birthday.month, birthday.day))
         else:
             each['age'] = None
-        print(each)
     return query_data
 
 
-def update_age_calculation_on_single(query_data):
-    if query_data:
-        today = datetime.today().date()
-        birthday = query_data[0]['user_biometric__birthday']
-        if birthday:
-            query_data[0]['user_details__age'] = today.year - birthday.year - ((today.month, today.day) < (birthday.month, birthday.day))
-        else:
-            query_data[0]['user_details__age'] = None
-    return query_data
+def get_birthday_range(age_range):
+    """
+        method used to convert the "min-max" age range to the birthday bounds, a member is between min and max
+        years old when born after today - (max + 1) years and on or before today - min years
+    :param age_range:
+    :return: (born_after, born_on_or_before), raises ValueError for an invalid range
+    """
+    min_age, max_age = [int(each) for each in age_range.split('-')]
+    if min_age < 0 or max_age < min_age:
+        raise ValueError('Invalid age range')
+    today = datetime.today().date()
+    return today - relativedelta(years=max_age + 1), today - relativedelta(years=min_age)
 
 
 def filter_on_member_list(queryset, climbing_level=None, age_range=None, gender=None,
@@ -1127,20 +1639,36 @@ def filter_on_member_list(queryset, climbing_level=None, age_range=None, gender=
         elif climbing_level == str(11):
         # if str(11) in climbing_level:
             queryset = queryset.filter(user_preference__bouldering_grading='Fontainebleau')
-    queryset = update_age_calculation(queryset)
-    # if age_range:
-    #     print(queryset)
-    #     queryset = queryset.filter(user_details__age__range=age_range.split('-'))
+    if age_range:
+        born_after, born_on_or_before = get_birthday_range(age_range)
+        queryset = queryset.filter(user_biometric__birthday__gt=born_after,
+                                   user_biometric__birthday__lte=born_on_or_before)
     if gender:
         queryset = queryset.filter(user_biometric__gender=gender)
-    copy_queryset = queryset
     if search_submitted_route:
-        queryset = queryset.filter(user_route_feedback__gym=gym_detail_user,
-                                   user_route_feedback__route__name__icontains=search_submitted_route)
-        queryset = update_copy_queryset_for_submitted_count(copy_queryset, queryset)
+        # semi join, a join on the feedback would repeat the members and change their submitted count
+        queryset = queryset.filter(Exists(UserRouteFeedback.objects.filter(
+            user=OuterRef('pk'), gym=gym_detail_user, route__name__trigram_icontains=search_submitted_route)))
     return queryset
 
 
+def get_member_list_keyset(queryset, ordering):
+    """
+        method used to annotate the member list with the keyset value of the requested ordering, nulls are
+        coalesced so the (keyset_value, id) cursor stays comparable
+    :param queryset:
+    :param ordering:
+    :return: (queryset, descending), raises ValueError for an ordering that can not be paginated by cursor
+    """
+    descending = ordering.startswith('-')
+    field = ordering.lstrip('-')
+    if field not in MEMBER_LIST_KEYSET_FIELDS:
+        raise ValueError('Invalid ordering')
+    null_value = MEMBER_LIST_KEYSET_FIELDS[field]
+    value = F(field) if null_value is None else Coalesce(field, null_value)
+    return queryset.annotate(keyset_value=value), descending
+
+
 def update_date_format(query_data):
     for each in query_data:
         if each['last_updated']:
@@ -1156,51 +1684,25 @@ def filter_submitted_route(serialize_data, submitted_route=None):
 
 
 def check_gym_is_blocked(request_user, gym_detail):
-    if request_user in gym_detail.blocked_user.all():
-        return False
-    return True
-
-
-def check_dashboard_attempts_total(route_progress=None, last_week=False):
-    today = date.today()
-    # last_week_date = today - timedelta(days=7)
-    last_week_date1 = today - timedelta(days=14)
-    last_week_date2 = today - timedelta(days=7)
-    if last_week:
-        # Calculating increase or decrease count based on comparison between last week and this week
-        # count_val = Count('gym_route_feedback', filter=Q(gym_route_feedback__route_progress=route_progress,
-        #                                                  gym_route_feedback__created_at__date__gte=last_week_date))
-        count_val1 = Count('gym_route_feedback', filter=Q(gym_route_feedback__route_progress__in=route_progress,
-                                                          gym_route_feedback__created_at__date__gte=last_week_date1,
-                                                          gym_route_feedback__created_at__date__lt=last_week_date2))
-        count_val2 = Count('gym_route_feedback', filter=Q(gym_route_feedback__route_progress__in=route_progress,
-                                                          gym_route_feedback__created_at__date__gte=last_week_date2))
-        count_val = count_val2 - count_val1
-    else:
-        count_val = Count('gym_route_feedback', filter=Q(gym_route_feedback__route_progress__in=route_progress))
-    return count_val
+    """
+        method used to check the user is blocked by the gym, an exists on the unique (gym, user) index of
+        the blocked_user table so the blocked users are never loaded.
+    :param request_user:
+    :param gym_detail:
+    :return: False if the user is blocked
+    """
+    return not GymDetails.blocked_user.through.objects.filter(gymdetails_id=gym_detail.id,
+                                                              user_id=request_user.id).exists()
 
 
-def check_dashboard_feedback_total(route_progress=None, total=False, last_week=False):
-    today = date.today()
-    # last_week_date = today - timedelta(days=7)
-    last_week_date1 = today - timedelta(days=14)
-    last_week_date2 = today - timedelta(days=7)
-    if total:
-        count_val = Count('gym_route_feedback', filter=~Q(gym_route_feedback__route_progress=route_progress))
-    elif last_week:
-        # Calculating increase or decrease count based on comparison between last week and this week
-        # count_val = Count('gym_route_feedback', filter=Q(gym_route_feedback__route_progress=route_progress,
-        #                                                  gym_route_feedback__created_at__date__gte=last_week_date))
-        count_val1 = Count('gym_route_feedback', filter=Q(gym_route_feedback__route_progress=route_progress,
-                                                          gym_route_feedback__created_at__date__gte=last_week_date1,
-                                                          gym_route_feedback__created_at__date__lt=last_week_date2))
-        count_val2 = Count('gym_route_feedback', filter=Q(gym_route_feedback__route_progress=route_progress,
-                                                          gym_route_feedback__created_at__date__gte=last_week_date2))
-        count_val = count_val2 - count_val1
-    else:
-        count_val = Count('gym_route_feedback', filter=Q(gym_route_feedback__route_progress=route_progress))
-    return count_val
+def block_user_for_gym(gym_detail, user_id):
+    """
+        method used to block the user for the gym
+    :param gym_detail:
+    :param user_id:
+    :return:
+    """
+    gym_detail.blocked_user.add(user_id)
 
 
 def check_dashboard_route_type_total(route_type=None, total=False, percentage=False, v1=None, route_count=0):
@@ -1243,99 +1745,68 @@ def get_total_members(users):
     return member_count
 
 
-def convert_height_to_range(height_range):
-    height_range_dict = [
-        {"key": "0-1", "value": 0},
-        {"key": "1.1-2", "value": 0},
-        {"key": "2.1-3", "value": 0},
-        {"key": "3.1-4", "value": 0},
-        {"key": "4.1-5", "value": 0},
-        ]
-    for each in height_range:
-        each['height'] = each['height'] * 0.0254
-        if 0 < each['height'] < 1:
-            height_range_dict[0]["value"] += each['height_range_count']
-        elif 1 < each['height'] <= 2:
-            height_range_dict[1]["value"] += each['height_range_count']
-        elif 2 < each['height'] <= 3:
-            height_range_dict[2]["value"] += each['height_range_count']
-        elif 3 < each['height'] <= 4:
-            height_range_dict[3]["value"] += each['height_range_count']
-        elif 4 < each['height'] <= 5:
-            height_range_dict[4]["value"] += each['height_range_count']
-    # height_range_dict = {
-    #         "0-1": 0,
-    #         "1.1-2": 0,
-    #         "2.1-3": 0,
-    #         "3.1-4": 0,
-    #         "4.1-5": 0
-    #     }
-    # for each in height_range:
-    #     each['height'] = each['height'] * 0.0254
-    #     if 0 < each['height'] < 1:
-    #         height_range_dict["0-1"] += each['height_range_count']
-    #     elif 1 < each['height'] <= 2:
-    #         height_range_dict["1.1-2"] += each['height_range_count']
-    #     elif 2 < each['height'] <= 3:
-    #         height_range_dict["2.1-3"] += each['height_range_count']
-    #     elif 3 < each['height'] <= 4:
-    #         height_range_dict["3.1-4"] += each['height_range_count']
-    #     elif 4 < each['height'] <= 5:
-    #         height_range_dict["4.1-5"] += each['height_range_count']
-    return height_range_dict
-
-
-def convert_wingspan_to_range( wingspan_range):
-    wingspan_range_dict = [
-        {"key": "0-1", "value": 0},
-        {"key": "1.1-2", "value": 0},
-        {"key": "2.1-3", "value": 0},
-        {"key": "3.1-4", "value": 0},
-        {"key": "4.1-5", "value": 0},
-    ]
-    for each in wingspan_range:
-        each['wingspan'] = each['wingspan'] * 0.0254
-        if 0 < each['wingspan'] < 1:
-            wingspan_range_dict[0]["value"] += each['wingspan_range_count']
-        elif 1 < each['wingspan'] <= 2:
-            wingspan_range_dict[1]["value"] += each['wingspan_range_count']
-        elif 2 < each['wingspan'] <= 3:
-            wingspan_range_dict[2]["value"] += each['wingspan_range_count']
-        elif 3 < each['wingspan'] <= 4:
-            wingspan_range_dict[3]["value"] += each['wingspan_range_count']
-        elif 4 < each['wingspan'] <= 5:
-            wingspan_range_dict[4]["value"] += each['wingspan_range_count']
-
-    # wingspan_range_dict = {
-    #         "0-1": 0,
-    #         "1.1-2": 0,
-    #         "2.1-3": 0,
-    #         "3.1-4": 0,
-    #         "4.1-5": 0
-    #     }
-    # for each in wingspan_range:
-    #     each['wingspan'] = each['wingspan'] * 0.0254
-    #     if 0 < each['wingspan'] < 1:
-    #         wingspan_range_dict["0-1"] += each['wingspan_range_count']
-    #     elif 1 < each['wingspan'] <= 2:
-    #         wingspan_range_dict["1.1-2"] += each['wingspan_range_count']
-    #     elif 2 < each['wingspan'] <= 3:
-    #         wingspan_range_dict["2.1-3"] += each['wingspan_range_count']
-    #     elif 3 < each['wingspan'] <= 4:
-    #         wingspan_range_dict["3.1-4"] += each['wingspan_range_count']
-    #     elif 4 < each['wingspan'] <= 5:
-    #         wingspan_range_dict["4.1-5"] += each['wingspan_range_count']
-    return wingspan_range_dict
-
-
-def create_rope_bouldering_graph_for_value(request_user, grading_system, sub_category):
-    count_data = GradeType.objects.filter(grading_system=grading_system, sub_category=sub_category).order_by('id').\
-        values('sub_category_value').annotate(
-        count=Count('route_grade', filter=Q(route_grade__section_wall__gym_layout__gym__user=request_user,
-                                            route_grade__is_deleted=False))
-    )
-    total_count = sum([each['count'] for each in count_data])
-    return count_data, total_count
+def get_biometric_histogram_data(gym_detail):
+    """
+        method used to get the height and wingspan ranges (in meter) of the gym members with one aggregate,
+        the biometric rows are binned in sql.
+    :param gym_detail:
+    :return: height_range, wingspan_range
+    """
+    range_keys = [("0-1", 0, 1), ("1.1-2", 1, 2), ("2.1-3", 2, 3), ("3.1-4", 3, 4), ("4.1-5", 4, 5)]
+    aggregates = dict()
+    for field_name in ('height', 'wingspan'):
+        for index, (key, low, high) in enumerate(range_keys):
+            # first range is open on both ends, the others are (low, high]
+            value_filter = Q(**{field_name + '_meter__gt': low, field_name + '_meter__lt': high}) if index == 0 else \
+                Q(**{field_name + '_meter__gt': low, field_name + '_meter__lte': high})
+            aggregates['{}_{}'.format(field_name, index)] = Count('id', filter=value_filter)
+    histogram = UserBiometricData.objects.filter(
+        user__is_deleted=False, user__is_active=True, user__user_details__home_gym=gym_detail).annotate(
+        height_meter=ExpressionWrapper(F('height') * 0.0254, output_field=FloatField()),
+        wingspan_meter=ExpressionWrapper(F('wingspan') * 0.0254, output_field=FloatField())).aggregate(**aggregates)
+    height_range = [{"key": key, "value": histogram['height_{}'.format(index)]}
+                    for index, (key, low, high) in enumerate(range_keys)]
+    wingspan_range = [{"key": key, "value": histogram['wingspan_{}'.format(index)]}
+                      for index, (key, low, high) in enumerate(range_keys)]
+    return height_range, wingspan_range
+
+
+def get_climbing_level_histogram_data(gym_detail, rope_grading, bouldering_grading):
+    """
+        method used to get the top rope, lead climbing and bouldering level counts of the gym members
+        with one grouped query.
+    :param gym_detail:
+    :param rope_grading: rope grading name of the gym or None
+    :param bouldering_grading: bouldering grading name of the gym or None
+    :return: top_rope, lead_climbing, bouldering level counts
+    """
+    grading_filter = Q()
+    if rope_grading:
+        grading_filter |= Q(rope_grading=rope_grading)
+    if bouldering_grading:
+        grading_filter |= Q(bouldering_grading=bouldering_grading)
+    if not grading_filter:
+        return [], [], []
+    level_counts = UserPreference.objects.filter(
+        user__is_deleted=False, user__is_active=True, user__user_details__home_gym=gym_detail).filter(
+        grading_filter).values(
+        'rope_grading', 'top_rope', 'lead_climbing', 'bouldering_grading', 'bouldering').\
+        annotate(count=Count('id')).order_by()
+    top_rope, lead_climbing, bouldering = dict(), dict(), dict()
+    for each in level_counts:
+        if rope_grading and each['rope_grading'] == rope_grading:
+            top_rope[each['top_rope']] = top_rope.get(each['top_rope'], 0) + each['count']
+            lead_climbing[each['lead_climbing']] = lead_climbing.get(each['lead_climbing'], 0) + each['count']
+        if bouldering_grading and each['bouldering_grading'] == bouldering_grading:
+            bouldering[each['bouldering']] = bouldering.get(each['bouldering'], 0) + each['count']
+
+    def get_level_list(grading_key, grading_name, level_key, level_data):
+        return [{grading_key: grading_name, level_key: level, 'count': count}
+                for level, count in sorted(level_data.items(), key=lambda item: (item[0] is None, item[0] or ''))]
+
+    return get_level_list('rope_grading', rope_grading, 'top_rope', top_rope), \
+        get_level_list('rope_grading', rope_grading, 'lead_climbing', lead_climbing), \
+        get_level_list('bouldering_grading', bouldering_grading, 'bouldering', bouldering)
 
 
 def create_exception_message(ex):
@@ -1440,7 +1911,7 @@ def is_subscription_wall_number(requested_user):
     data = requested_user.user_subscription
     if data.is_subscribed and data.plan:
         wall_count = SectionWall.all_objects.filter(
-            layout_section__gym_layout__gym__user=requested_user,
+            gym__user=requested_user,
             created_at__gte=data.subscription_start).count()
         data_count = int(data.plan.uploaded_wall_number)
         if wall_count < data_count:
@@ -1458,7 +1929,7 @@ def get_wall_slot_left(gym_id):
     user_plan = user_subscription.plan
     if not user_plan:
         return "NO ACTIVE PLAN"
-    wall_count = SectionWall.all_objects.filter(layout_section__gym_layout__gym=gym_id,
+    wall_count = SectionWall.all_objects.filter(gym=gym_id,
                                                 created_at__gte=user_subscription.subscription_start).count()
     data_count = int(user_plan.uploaded_wall_number)
     diff_count = data_count - wall_count
@@ -1504,66 +1975,139 @@ def send_custom_mail_to_gyms(gym_user_ids, subject, message):
 
 
 def show_latest_unique_feedback(queryset):
-    emp_dict1, emp_dict2 = list(), list()
-    for each in queryset:
-        if each['route_id'] not in emp_dict1:
-            emp_dict1.append(each['route_id'])
-            emp_dict2.append(each['id'])
-    return emp_dict2
+    """
+        method used to get the latest feedback id of every route of the feedback queryset, as a
+        DISTINCT ON (route_id) subquery so the caller can filter and paginate in SQL.
+    :param queryset: UserRouteFeedback queryset
+    :return: queryset of ids
+    """
+    return queryset.order_by('route_id', '-id').distinct('route_id').values('id')
 
 
 def track_gym_visit_by_user(user_instance, route_instance, feedback_id):
     try:
-        gym_detail = route_instance.section_wall.layout_section.gym_layout.gym
         today = date.today()
-        GymVisit.objects.get_or_create(user=user_instance, gym=gym_detail, updated_at__date=today,
+        GymVisit.objects.get_or_create(user=user_instance, gym_id=route_instance.gym_id, updated_at__date=today,
                                        defaults={'route_feedback': feedback_id})
     except Exception as e:
         print(e)
     return True
 
 
-def get_gym_visit(user_id, gym_detail_user):
+def track_gym_visit_by_feedbacks(user_instance, feedbacks):
+    """
+        method used to track today's gym visit of the user for a batch of route feedbacks,
+        one visit per gym like track_gym_visit_by_user.
+    :param user_instance:
+    :param feedbacks: list of route feedbacks
+    :return:
+    """
+    feedback_ids = {each.route_id: each.id for each in feedbacks if each.route_id}
+    route_gyms = WallRoute.all_objects.filter(id__in=feedback_ids.keys()).\
+        values_list('id', 'gym')
+    gym_feedbacks = dict()
+    for route_id, gym_id in route_gyms:
+        if gym_id and gym_id not in gym_feedbacks:
+            gym_feedbacks[gym_id] = feedback_ids[route_id]
+    visited_gyms = set(GymVisit.objects.filter(user=user_instance, gym__in=gym_feedbacks.keys(),
+                                               updated_at__date=date.today()).values_list('gym', flat=True))
+    GymVisit.objects.bulk_create([GymVisit(user=user_instance, gym_id=gym_id, route_feedback=feedback_id)
+                                  for gym_id, feedback_id in gym_feedbacks.items() if gym_id not in visited_gyms])
+    return True
+
+
+def create_route_feedback_batch(user_instance, feedback_list):
+    """
+        method used to save a batch of route feedbacks with client keys. Keys already synced by the user
+        are skipped, so a replayed batch creates nothing. Gym visits and the route/wall stats of the
+        touched routes are updated once for the whole batch.
+    :param user_instance:
+    :param feedback_list: list of validated feedback data having client_key
+    :return: feedbacks of all the client keys of the batch
+    """
+    client_keys = [each['client_key'] for each in feedback_list]
+    with transaction.atomic():
+        synced_keys = set(UserRouteFeedback.objects.filter(user=user_instance, client_key__in=client_keys).
+                          values_list('client_key', flat=True))
+        # ignore_conflicts covers a replay racing this batch on the unique (user, client_key)
+        UserRouteFeedback.objects.bulk_create([UserRouteFeedback(user=user_instance, **each)
+                                               for each in feedback_list if each['client_key'] not in synced_keys],
+                                              batch_size=500, ignore_conflicts=True)
+    feedbacks = list(UserRouteFeedback.objects.select_related('route').filter(
+        user=user_instance, client_key__in=client_keys).order_by('id'))
+    new_feedbacks = [each for each in feedbacks if each.client_key not in synced_keys]
+    if new_feedbacks:
+        route_ids = list({each.route_id for each in new_feedbacks if each.route_id})
+        track_gym_visit_by_feedbacks(user_instance, new_feedbacks)
+        # stats are rebuilt from the feedback rows, so concurrent replays can not count twice
+        rebuild_route_stats(route_ids)
+        rebuild_wall_stats(list(WallRoute.all_objects.filter(id__in=route_ids, section_wall__isnull=False).
+                                values_list('section_wall', flat=True).distinct()))
+    return feedbacks
+
+
+def get_member_profile(user_id, gym_detail):
+    """
+        method used to get the member profile for the gym in one statement, with the route progress histogram,
+        attempted/completed counts, age, staff flag and this/last week gym visits. The visits and the staff
+        flag are sub queries so they do not multiply the feedback join.
+    :param user_id:
+    :param gym_detail:
+    :return: list with the profile, empty if the user does not exist
+    """
     today = date.today()
     last_week_date1 = today - timedelta(days=14)
     last_week_date2 = today - timedelta(days=7)
-    gym_visit_all = GymVisit.objects.filter(user=user_id, gym=gym_detail_user)
-    gym_visit = gym_visit_all.filter(updated_at__date__gte=last_week_date2).count()
-    gym_visit_last_week = gym_visit_all.filter(updated_at__date__gte=last_week_date1,
-                                               updated_at__date__lt=last_week_date2).count()
-    return gym_visit, gym_visit_last_week
-
-
-def get_dashboard_all_type_feedback_data(requested_user):
-    user_route_feedback = GymDetails.objects.prefetch_related('gym_route_feedback'). \
-        filter(user=requested_user, gym_route_feedback__route__is_deleted=False).values('id').annotate(
-        # filter(user=request.user).values('id').annotate(
-        projecting_count=check_dashboard_feedback_total(0),
-        last_week_projecting_count=check_dashboard_feedback_total(0, last_week=True),
-        total_rfo_count=check_dashboard_feedback_total(0, total=True),
-        red_point_count=check_dashboard_feedback_total(1),
-        last_week_red_point_count=check_dashboard_feedback_total(1, last_week=True),
-        flash_count=check_dashboard_feedback_total(2),
-        last_week_flash_count=check_dashboard_feedback_total(2, last_week=True),
-        on_sight_count=check_dashboard_feedback_total(3),
-        last_week_on_sight_count=check_dashboard_feedback_total(3, last_week=True),
-    ).first()
-    if not user_route_feedback:
-        user_route_feedback = {
-            "projecting_count": 0,
-            "last_week_projecting_count": 0,
-            "total_rfo_count": 0,
-            "red_point_count": 0,
-            "last_week_red_point_count": 0,
-            "flash_count": 0,
-            "last_week_flash_count": 0,
-            "on_sight_count": 0,
-            "last_week_on_sight_count": 0
-        }
-
-    # added to count last week data only if gym is created before last week
+    gym_visits = GymVisit.objects.filter(user=OuterRef('pk'), gym=gym_detail).values('id')
+    progress_counts = {
+        progress_name + '_count': Count('user_route_feedback', filter=Q(user_route_feedback__gym=gym_detail,
+                                                                       user_route_feedback__route_progress=progress))
+        for progress, progress_name in enumerate(('projecting', 'red_point', 'flash', 'on_sight'))}
+    queryset = User.objects.filter(id=user_id).values(
+        'id', 'full_name', 'email', 'created_at', 'user_details__user_avatar',
+        'user_biometric__gender', 'user_preference__prefer_climbing', 'user_preference__bouldering',
+        'user_preference__top_rope', 'user_preference__lead_climbing', 'user_biometric__shoe_size',
+        'user_biometric__weight', 'user_biometric__hand_size', 'user_biometric__height',
+        'user_biometric__birthday', 'user_biometric__wingspan', 'user_biometric__ape_index'). \
+        annotate(total_count=Count('user_route_feedback', filter=Q(user_route_feedback__gym=gym_detail)),
+                 route_attempted=Count('user_route_feedback', filter=Q(user_route_feedback__gym=gym_detail,
+                                                                       user_route_feedback__route_progress=0)),
+                 route_completed=F('total_count') - F('route_attempted'),
+                 age=Age('user_biometric__birthday'),
+                 is_gym_staff=Exists(Role.objects.filter(user=OuterRef('pk'), name=Role.RoleType.GYM_STAFF,
+                                                         role_status=True)),
+                 gym_visit=SubqueryCount(gym_visits.filter(updated_at__date__gte=last_week_date2)),
+                 gym_visit_last_week=SubqueryCount(gym_visits.filter(updated_at__date__gte=last_week_date1,
+                                                                     updated_at__date__lt=last_week_date2)),
+                 **progress_counts)
+    profile = list(queryset)
+    for each in profile:
+        each['user_details__age'] = each.pop('age')
+    return profile
+
+
+def get_dashboard_all_type_feedback_data(requested_user, gym_detail):
+    """
+        method used to get the feedback counts per route progress of the dashboard from the daily rollup.
+    :param requested_user:
+    :param gym_detail:
+    :return:
+    """
     today = date.today()
+    last_week_date1 = today - timedelta(days=14)
     last_week_date2 = today - timedelta(days=7)
+    stats = get_gym_dashboard_stats(gym_detail.id, last_week_date1, last_week_date2, GYM_DAILY_FEEDBACK_FIELDS)
+    total, this_week, previous_week = stats['total'], stats['this_week'], stats['previous_week']
+    user_route_feedback = {
+        "id": gym_detail.id,
+        "total_rfo_count": total['feedback_count'] - total['projecting_count'],
+    }
+    for progress_name in ('projecting', 'red_point', 'flash', 'on_sight'):
+        field_name = progress_name + '_count'
+        user_route_feedback[field_name] = total[field_name]
+        user_route_feedback['last_week_' + field_name] = this_week[field_name] - previous_week[field_name]
+
+    # added to count last week data only if gym is created before last week
     if requested_user.created_at.date() >= last_week_date2:
         user_route_feedback["last_week_projecting_count"] = 0
         user_route_feedback["last_week_red_point_count"] = 0
@@ -1572,137 +2116,54 @@ def get_dashboard_all_type_feedback_data(requested_user):
     return user_route_feedback
 
 
-# def get_dashboard_all_route_type_data(requested_user):
-#     route_type_count_before = GymDetails.objects.prefetch_related('gym_layout__gym_layout_wall__section_wall_route'). \
-#         filter(user=requested_user).values('id'). \
-#         annotate(total_route_count_val=Count('gym_layout__gym_layout_wall__section_wall_route',
-#                                              filter=Q(
-#                                                  gym_layout__gym_layout_wall__section_wall_route__is_deleted=False)))
-#     before_route = route_type_count_before[0]['total_route_count_val']
-#     route_type_count = GymDetails.objects.prefetch_related('gym_layout__gym_layout_wall__section_wall_route'). \
-#         filter(user=requested_user).values('id').annotate(
-#         total_route_count=check_dashboard_route_type_total(total=True),
-#         endurance_count=check_dashboard_route_type_total(0),
-#         endurance_percentage=check_dashboard_route_type_total(
-#             percentage=True, v1='endurance_count', route_count=before_route),
-#         strength_count=check_dashboard_route_type_total(1),
-#         strength_percentage=check_dashboard_route_type_total(
-#             percentage=True, v1='strength_count', route_count=before_route),
-#         training_count=check_dashboard_route_type_total(2),
-#         training_percentage=check_dashboard_route_type_total(
-#             percentage=True, v1='training_count', route_count=before_route),
-#         competition_count=check_dashboard_route_type_total(3),
-#         competition_percentage=check_dashboard_route_type_total(
-#             percentage=True, v1='competition_count', route_count=before_route)
-#     ).first()
-#
-#     route_type_count['endurance_percentage'] = round(route_type_count['endurance_percentage'], 2)
-#     route_type_count['strength_percentage'] = round(route_type_count['strength_percentage'], 2)
-#     route_type_count['training_percentage'] = round(route_type_count['training_percentage'], 2)
-#     route_type_count['competition_percentage'] = round(route_type_count['competition_percentage'], 2)
-#     return route_type_count
-
-
 def get_dashboard_all_route_type_data(requested_user):
-    try:
-        all_route_type_count = WallRoute.objects. \
-            filter(section_wall__layout_section__gym_layout__gym__user=requested_user, is_deleted=False,
-                   route_type__isnull=False).count()
-        route_type_count = WallRoute.objects.filter(
-            section_wall__layout_section__gym_layout__gym__user=requested_user, is_deleted=False,
-            route_type__isnull=False).values('route_type__id', 'route_type__name').order_by('route_type__id').\
-            annotate(specific_route_count=Count('id'))
-        all_route_type_total = RouteType.objects.filter(gym__user=requested_user).order_by('id')
-        all_route_type = all_route_type_total.values_list('id', flat=True)
-        updated_route_type_count = [{'route_type__id': each.id, 'route_type__name': each.name, 'specific_route_count': 0, 'specific_route_percentage': 0} for each in all_route_type_total]
-        for ind, each in enumerate(all_route_type):
-            for each1 in route_type_count:
-                if each == each1['route_type__id']:
-                    updated_route_type_count[ind]['route_type__id'] = each1['route_type__id']
-                    updated_route_type_count[ind]['route_type__name'] = each1['route_type__name']
-                    updated_route_type_count[ind]['specific_route_count'] = each1['specific_route_count']
-                    updated_route_type_count[ind]['specific_route_percentage'] = round(
-                        each1['specific_route_count'] * 100 / all_route_type_count, 2)
-                    break
-        route_type_data = {"total_route_count": all_route_type_count, "specific_route_count": updated_route_type_count}
-    except:
-        route_type_data = {"total_route_count": 0, "specific_route_count": []}
-    return route_type_data
+    """
+        method used to get the active route count of every route type of the gym (left join from RouteType,
+        so unused route types are listed with 0) and the total with one grouped query.
+    :param requested_user: gym owner
+    :return:
+    """
+    routes = WallRoute.objects.filter(gym__user=requested_user, route_type__isnull=False)
+    route_type_count = RouteType.objects.filter(gym__user=requested_user).annotate(
+        specific_route_count=Count('route_type', filter=Q(route_type__is_active=True, route_type__is_deleted=False,
+                                                          route_type__gym__user=requested_user)),
+        total_route_count=SubqueryCount(routes.values('id'))).order_by('id').values(
+        'id', 'name', 'specific_route_count', 'total_route_count')
+    route_type_count = list(route_type_count)
+    all_route_type_count = route_type_count[0]['total_route_count'] if route_type_count else routes.count()
+    updated_route_type_count = [{
+        'route_type__id': each['id'],
+        'route_type__name': each['name'],
+        'specific_route_count': each['specific_route_count'],
+        'specific_route_percentage': round(each['specific_route_count'] * 100 / all_route_type_count, 2)
+        if all_route_type_count else 0,
+    } for each in route_type_count]
+    return {"total_route_count": all_route_type_count, "specific_route_count": updated_route_type_count}
 
 
 def get_dashboard_all_type_range_data(requested_user, gym_detail):
-    ## To get height range
-    height_range = UserBiometricData.objects.filter(user__is_deleted=False,
-                                                    user__is_active=True,
-                                                    user__user_details__home_gym=gym_detail,
-                                                    height__isnull=False).values('height'). \
-        annotate(height_range_count=Count('height')).order_by('height')
-    # To convert normal data into range data
-    height_range_updated = convert_height_to_range(height_range)
-
-    ## To get wingspan range
-    wingspan_range = UserBiometricData.objects.filter(user__is_deleted=False,
-                                                      user__is_active=True,
-                                                      user__user_details__home_gym=gym_detail,
-                                                      wingspan__isnull=False).values('wingspan'). \
-        annotate(wingspan_range_count=Count('wingspan')).order_by('wingspan')
-    # To convert normal data into range data
-    wingspan_range_updated = convert_wingspan_to_range(wingspan_range)
+    ## To get height and wingspan range
+    height_range_updated, wingspan_range_updated = get_biometric_histogram_data(gym_detail)
 
     ## To get climbing level range
-    climbing_level_range1 = None
-    climbing_level_range1a = None
-    climbing_level_range2 = None
-    key_data1 = None
-    key_data2 = None
-    gym_details = GymDetails.objects.filter(user=requested_user).first()
-    if gym_details.RopeClimbing == 1:
-        climbing_level_range1 = UserPreference.objects.filter(
-            user__is_deleted=False, user__is_active=True, user__user_details__home_gym=gym_details,
-            rope_grading="YDS Scale").values('rope_grading', 'top_rope'). \
-            annotate(count=Count('id'))
-        climbing_level_range1a = UserPreference.objects.filter(
-            user__is_deleted=False, user__is_active=True, user__user_details__home_gym=gym_details,
-            rope_grading="YDS Scale").values('rope_grading', 'lead_climbing'). \
-            annotate(count=Count('id'))
-        key_data1 = 'YDS_Scale_Or_Francia'
-        grading_name1 = 'YDS Scale'
-    elif gym_details.RopeClimbing == 2:
-        climbing_level_range1 = UserPreference.objects.filter(
-            user__is_deleted=False, user__is_active=True, user__user_details__home_gym=gym_details,
-            rope_grading="Francia").values('rope_grading', 'top_rope'). \
-            annotate(count=Count('id'))
-        climbing_level_range1a = UserPreference.objects.filter(
-            user__is_deleted=False, user__is_active=True, user__user_details__home_gym=gym_details,
-            rope_grading="Francia").values('rope_grading', 'lead_climbing'). \
-            annotate(count=Count('id'))
-        key_data1 = 'YDS_Scale_Or_Francia'
-        grading_name1 = 'Francia'
-    if gym_details.Bouldering == 10:
-        climbing_level_range2 = UserPreference.objects.filter(
-            user__is_deleted=False, user__is_active=True, user__user_details__home_gym=gym_details,
-            bouldering_grading="V System").values('bouldering_grading', 'bouldering'). \
-            annotate(count=Count('id'))
-        key_data2 = 'V_System_Or_Fontainebleau'
-        grading_name2 = 'V System'
-    elif gym_details.Bouldering == 11:
-        climbing_level_range2 = UserPreference.objects.filter(
-            user__is_deleted=False, user__is_active=True, user__user_details__home_gym=gym_details,
-            bouldering_grading="Fontainebleau").values('bouldering_grading', 'bouldering'). \
-            annotate(count=Count('id'))
-        key_data2 = 'V_System_Or_Fontainebleau'
-        grading_name2 = 'Fontainebleau'
+    rope_grading_names = {GymDetails.RopeClimbingOptions.YDSSCALE: 'YDS Scale',
+                          GymDetails.RopeClimbingOptions.FRANCIA: 'Francia'}
+    bouldering_grading_names = {GymDetails.BoulderingOptions.V_SYSTEM: 'V System',
+                                GymDetails.BoulderingOptions.FONTAINEBLEAU: 'Fontainebleau'}
+    grading_name1 = rope_grading_names.get(gym_detail.RopeClimbing)
+    grading_name2 = bouldering_grading_names.get(gym_detail.Bouldering)
+    top_rope_range, lead_climbing_range, bouldering_range = get_climbing_level_histogram_data(
+        gym_detail, grading_name1, grading_name2)
     climbing_level_range = dict()
-    if gym_details.RopeClimbing:
-        climbing_level_range[key_data1] = {
+    if gym_detail.RopeClimbing:
+        climbing_level_range['YDS_Scale_Or_Francia'] = {
             'grading_name': grading_name1,
-            'top_rope': climbing_level_range1,
-            'lead_climbing': climbing_level_range1a}
-    if gym_details.Bouldering:
-        climbing_level_range2_data = climbing_level_range2 if climbing_level_range2 else []
-        climbing_level_range[key_data2] = {
+            'top_rope': top_rope_range if grading_name1 else None,
+            'lead_climbing': lead_climbing_range if grading_name1 else None}
+    if gym_detail.Bouldering:
+        climbing_level_range['V_System_Or_Fontainebleau'] = {
                                               'grading_name': grading_name2,
-                                              'level_data': climbing_level_range2_data
+                                              'level_data': bouldering_range
                                           }
     range_data = {'climbing_level_range': climbing_level_range,
                   'height_range': height_range_updated, 'wingspan_range': wingspan_range_updated,
@@ -1732,85 +2193,297 @@ def create_route_type(gym_obj):
     return True
 
 
-def get_wall_count_for_dashboard(requested_user, last_week_date1, last_week_date2):
-    wall_count = SectionWall.all_objects.filter(gym_layout__gym__user=requested_user). \
-        values('id').aggregate(
-        wall_count=Count('id'),
-        las_week_wall_count=
-        Count('id', filter=Q(created_at__date__gte=last_week_date2)) -
-        Count('id', filter=Q(created_at__date__gte=last_week_date1, created_at__date__lt=last_week_date2)))
-    return wall_count
-
-
-def get_route_attempt_count_for_dashboard(requested_user):
-    route_attempt_count = GymDetails.objects.prefetch_related('gym_route_feedback'). \
-        filter(user=requested_user, gym_route_feedback__route__is_deleted=False).values('id').annotate(
-        # filter(user=request.user).values('id').annotate(
-        attempts_count=check_dashboard_attempts_total([0, 1, 2, 3]),
-        last_week_attempts_count=check_dashboard_attempts_total([0, 1, 2, 3], last_week=True)).first()
-    if not route_attempt_count:
-        route_attempt_count = {
-            "attempts_count": 0,
-            "last_week_attempts_count": 0
-        }
-    return route_attempt_count
-
-
-def get_total_member_count_for_dashboard(requested_user, last_week_date1, last_week_date2):
-    # total_member_count = User.all_objects.select_related('user_details').filter(
-    total_member_count = User.objects.select_related('user_details').filter(
-        user_details__home_gym=requested_user.gym_detail_user).values('id').aggregate(
-        member_count=Count('id'),
-        last_week_member_count=
-        Count('id', filter=Q(user_details__home_gym_added_on__date__gte=last_week_date2)) -
-        Count('id', filter=Q(user_details__home_gym_added_on__date__gte=last_week_date1,
-                             user_details__home_gym_added_on__date__lt=last_week_date2)))
-    return total_member_count
-
-
-def get_total_wall_visit_for_dashboard(requested_user, last_week_date1, last_week_date2):
-    total_wall_visit = WallVisit.objects.filter(wall__gym_layout__gym__user=requested_user). \
-        values('id').aggregate(
-        wall_visit=Count('id'),
-        last_week_wall_vist=
-        Count('id', filter=Q(created_at__date__gte=last_week_date2)) -
-        Count('id', filter=Q(created_at__date__gte=last_week_date1, created_at__date__lt=last_week_date2)))
-    return total_wall_visit
-
-
-def get_rope_bouldering_graph(requested_user):
-    gym_details = GymDetails.objects.filter(user=requested_user).first()
-    rope_climbing_data, bouldering_data = None, None
-    total_count1, total_count2 = 0, 0
-    if gym_details.RopeClimbing == GymDetails.RopeClimbingOptions.YDSSCALE:
-        rope_climbing_data, total_count1 = create_rope_bouldering_graph_for_value(
-            request_user=requested_user, grading_system=GymLayout.ClimbingType.ROPE_CLIMBING,
-            sub_category=GymDetails.RopeClimbingOptions.YDSSCALE)
-    elif gym_details.RopeClimbing == GymDetails.RopeClimbingOptions.FRANCIA:
-        rope_climbing_data, total_count1 = create_rope_bouldering_graph_for_value(
-            request_user=requested_user, grading_system=GymLayout.ClimbingType.ROPE_CLIMBING,
-            sub_category=GymDetails.RopeClimbingOptions.FRANCIA)
-    if gym_details.Bouldering == GymDetails.BoulderingOptions.V_SYSTEM:
-        bouldering_data, total_count2 = create_rope_bouldering_graph_for_value(
-            request_user=requested_user, grading_system=GymLayout.ClimbingType.BOULDERING,
-            sub_category=GymDetails.BoulderingOptions.V_SYSTEM)
-    elif gym_details.Bouldering == GymDetails.BoulderingOptions.FONTAINEBLEAU:
-        bouldering_data, total_count2 = create_rope_bouldering_graph_for_value(
-            request_user=requested_user, grading_system=GymLayout.ClimbingType.BOULDERING,
-            sub_category=GymDetails.BoulderingOptions.FONTAINEBLEAU)
+def get_dashboard_count_data(gym_id, last_week_date1, last_week_date2):
+    """
+        method used to get the wall, attempt, member and wall visit counts of the dashboard from the daily
+        rollup, last week values are this week minus the week before.
+    :param gym_id:
+    :param last_week_date1: start of the week before
+    :param last_week_date2: start of this week
+    :return: wall_count, route_attempt_count, total_member_count, total_wall_visit
+    """
+    stats = get_gym_dashboard_stats(gym_id, last_week_date1, last_week_date2)
+    total, this_week, previous_week = stats['total'], stats['this_week'], stats['previous_week']
+
+    def get_last_week_count(*field_names):
+        return sum(this_week[each] - previous_week[each] for each in field_names)
+
+    attempt_fields = ('projecting_count', 'red_point_count', 'flash_count', 'on_sight_count')
+    wall_count = {'wall_count': total['new_wall_count'],
+                  'las_week_wall_count': get_last_week_count('new_wall_count')}
+    route_attempt_count = {'id': gym_id, 'attempts_count': sum(total[each] for each in attempt_fields),
+                           'last_week_attempts_count': get_last_week_count(*attempt_fields)}
+    # members without home_gym_added_on are not in the rollup, the current member count is an indexed count
+    total_member_count = {'member_count': User.objects.filter(user_details__home_gym=gym_id).count(),
+                          'last_week_member_count': get_last_week_count('new_member_count')}
+    total_wall_visit = {'wall_visit': total['wall_visit_count'],
+                        'last_week_wall_vist': get_last_week_count('wall_visit_count')}
+    return wall_count, route_attempt_count, total_member_count, total_wall_visit
+
+
+def get_day_start(day):
+    """
+        method used to get the aware start datetime of the day, range filters on it can use the created_at index.
+    :param day:
+    :return:
+    """
+    return timezone.make_aware(datetime.combine(day, datetime.min.time()))
+
+
+def get_gym_daily_counts(start_date, end_date, gym_ids=None, field_names=None):
+    """
+        method used to count the dashboard numbers per gym and day from the raw history.
+    :param start_date: first day
+    :param end_date: day after the last day
+    :param gym_ids: list of gym ids, all gyms if None
+    :param field_names: GYM_DAILY_STATS_FIELDS to count, all if None
+    :return: dict of (gym id, day) and the counts of field_names
+    """
+    field_names = field_names or GYM_DAILY_STATS_FIELDS
+    start, end = get_day_start(start_date), get_day_start(end_date)
+    feedbacks = UserRouteFeedback.objects.filter(gym__isnull=False, route__is_deleted=False,
+                                                 created_at__gte=start, created_at__lt=end)
+    wall_visits = WallVisit.objects.filter(wall__gym__isnull=False, created_at__gte=start, created_at__lt=end)
+    walls = SectionWall.all_objects.filter(gym__isnull=False, created_at__gte=start, created_at__lt=end)
+    members = User.objects.filter(user_details__home_gym__isnull=False, user_details__home_gym_added_on__gte=start,
+                                  user_details__home_gym_added_on__lt=end)
+    if gym_ids is not None:
+        feedbacks = feedbacks.filter(gym__in=gym_ids)
+        wall_visits = wall_visits.filter(wall__gym__in=gym_ids)
+        walls = walls.filter(gym__in=gym_ids)
+        members = members.filter(user_details__home_gym__in=gym_ids)
+    progress_type = UserRouteFeedback.RouteProgressType
+    grouped_counts = [
+        (GYM_DAILY_FEEDBACK_FIELDS, feedbacks.values('gym', day=TruncDate('created_at')).annotate(
+            feedback_count=Count('id'),
+            projecting_count=Count('id', filter=Q(route_progress=progress_type.PROJECTING)),
+            red_point_count=Count('id', filter=Q(route_progress=progress_type.RED_POINT)),
+            flash_count=Count('id', filter=Q(route_progress=progress_type.FLASH)),
+            on_sight_count=Count('id', filter=Q(route_progress=progress_type.ON_SIGHT)))),
+        (['wall_visit_count'], wall_visits.values(gym=F('wall__gym'), day=TruncDate('created_at')).
+         annotate(wall_visit_count=Count('id'))),
+        (['new_wall_count'], walls.values('gym', day=TruncDate('created_at')).annotate(new_wall_count=Count('id'))),
+        (['new_member_count'], members.values(gym=F('user_details__home_gym'),
+                                              day=TruncDate('user_details__home_gym_added_on')).
+         annotate(new_member_count=Count('id'))),
+    ]
+    daily_counts = dict()
+    for group_fields, queryset in grouped_counts:
+        # only the queries of the requested fields are run
+        if not set(group_fields) & set(field_names):
+            continue
+        for each in queryset.order_by():
+            key = (each.pop('gym'), each.pop('day'))
+            daily_counts.setdefault(key, dict.fromkeys(field_names, 0)).update(
+                {field_name: each[field_name] for field_name in group_fields if field_name in field_names})
+    return daily_counts
+
+
+def rebuild_gym_daily_stats(start_date, end_date=None, gym_ids=None):
+    """
+        method used to recalculate the daily gym rollup of the days from the raw history.
+    :param start_date: first day
+    :param end_date: day after the last day, tomorrow if None
+    :param gym_ids: list of gym ids, all gyms if None
+    :return: number of rollup rows written
+    """
+    end_date = end_date or date.today() + timedelta(days=1)
+    daily_counts = get_gym_daily_counts(start_date, end_date, gym_ids)
+    existing_stats = GymDailyStats.objects.filter(date__gte=start_date, date__lt=end_date)
+    if gym_ids is not None:
+        existing_stats = existing_stats.filter(gym__in=gym_ids)
+    existing_stats = {(each.gym_id, each.date): each for each in existing_stats}
+    update_list, create_list = [], []
+    for key in set(daily_counts) | set(existing_stats):
+        counts = daily_counts.get(key, dict.fromkeys(GYM_DAILY_STATS_FIELDS, 0))
+        gym_stats = existing_stats.get(key) or GymDailyStats(gym_id=key[0], date=key[1])
+        for field_name in GYM_DAILY_STATS_FIELDS:
+            setattr(gym_stats, field_name, counts[field_name])
+        if gym_stats.pk:
+            update_list.append(gym_stats)
+        else:
+            create_list.append(gym_stats)
+    with transaction.atomic():
+        GymDailyStats.objects.bulk_update(update_list, GYM_DAILY_STATS_FIELDS, batch_size=500)
+        GymDailyStats.objects.bulk_create(create_list, batch_size=500, ignore_conflicts=True)
+    return len(update_list) + len(create_list)
+
+
+def rebuild_gym_daily_stats_on_delete(wall_ids=None, route_ids=None):
+    """
+        method used to rebuild the daily gym rollup of the days touched by deleted walls and routes, so the
+        dashboard leaves out the deleted walls and the feedback of the deleted routes. Call it after the delete.
+    :param wall_ids: deleted wall ids, their routes are deleted with them
+    :param route_ids: deleted route ids
+    :return: number of rollup rows written
+    """
+    wall_ids, route_ids = list(wall_ids or []), list(route_ids or [])
+    if not wall_ids and not route_ids:
+        return 0
+    feedback_filter = Q(route__in=route_ids) | Q(route__section_wall__in=wall_ids)
+    day_ranges = chain(
+        UserRouteFeedback.objects.filter(feedback_filter, gym__isnull=False).values('gym').annotate(
+            first_day=Min(TruncDate('created_at')), last_day=Max(TruncDate('created_at'))).order_by(),
+        SectionWall._base_manager.filter(id__in=wall_ids, gym__isnull=False).values('gym').annotate(
+            first_day=Min(TruncDate('created_at')), last_day=Max(TruncDate('created_at'))).order_by(),
+    )
+    gym_days = dict()
+    for each in day_ranges:
+        first_day, last_day = gym_days.get(each['gym'], (each['first_day'], each['last_day']))
+        gym_days[each['gym']] = (min(first_day, each['first_day']), max(last_day, each['last_day']))
+    row_count = 0
+    for gym_id, (first_day, last_day) in gym_days.items():
+        row_count += rebuild_gym_daily_stats(first_day, last_day + timedelta(days=1), [gym_id])
+    return row_count
+
+
+def get_trend_bucket(day, interval):
+    """
+        method used to get the start of the day/week (monday, like postgres date_trunc)/month bucket of the day.
+    :param day:
+    :param interval: day, week or month
+    :return:
+    """
+    if interval == 'week':
+        return day - timedelta(days=day.weekday())
+    if interval == 'month':
+        return day.replace(day=1)
+    return day
+
+
+def get_trend_bucket_count(start_date, end_date, interval):
+    """
+        method used to count the buckets covering the date range without building them.
+    :param start_date:
+    :param end_date: last day, included
+    :param interval: day, week or month
+    :return:
+    """
+    first_bucket, last_bucket = get_trend_bucket(start_date, interval), get_trend_bucket(end_date, interval)
+    if interval == 'month':
+        return (last_bucket.year - first_bucket.year) * 12 + last_bucket.month - first_bucket.month + 1
+    return (last_bucket - first_bucket).days // (7 if interval == 'week' else 1) + 1
+
+
+def get_trend_buckets(start_date, end_date, interval):
+    """
+        method used to get the bucket start dates covering the date range, no bucket after the last one is
+        computed so the range can end at date.max.
+    :param start_date:
+    :param end_date: last day, included
+    :param interval: day, week or month
+    :return: list of dates
+    """
+    first_bucket = get_trend_bucket(start_date, interval)
+    bucket_count = get_trend_bucket_count(start_date, end_date, interval)
+    if interval == 'month':
+        return [first_bucket + relativedelta(months=index) for index in range(bucket_count)]
+    step = timedelta(days=7 if interval == 'week' else 1)
+    return [first_bucket + step * index for index in range(bucket_count)]
+
+
+def get_gym_dashboard_trend(gym_id, start_date, end_date, interval):
+    """
+        method used to get the dashboard counts of the gym per day/week/month bucket of the date range with
+        one date_trunc grouped query over the daily rollup. Today is counted live like the dashboard.
+    :param gym_id:
+    :param start_date:
+    :param end_date: last day, included
+    :param interval: day, week or month
+    :return: list of bucket counts, empty buckets included
+    """
+    today = date.today()
+    trend_data = {bucket: dict.fromkeys(GYM_DAILY_STATS_FIELDS, 0)
+                  for bucket in get_trend_buckets(start_date, end_date, interval)}
+    rollup_data = GymDailyStats.objects.filter(gym=gym_id, date__gte=start_date, date__lte=end_date, date__lt=today).\
+        annotate(bucket=Trunc('date', interval, output_field=DateField())).values('bucket').\
+        annotate(**{field_name: Sum(field_name) for field_name in GYM_DAILY_STATS_FIELDS}).order_by('bucket')
+    for each in rollup_data:
+        trend_data[each.pop('bucket')].update(each)
+    if start_date <= today <= end_date:
+        today_counts = get_gym_daily_counts(today, today + timedelta(days=1), [gym_id]).get((gym_id, today), {})
+        bucket_data = trend_data[get_trend_bucket(today, interval)]
+        for field_name, count in today_counts.items():
+            bucket_data[field_name] += count
+    trend_list = []
+    for bucket, counts in trend_data.items():
+        counts['attempts_count'] = counts['projecting_count'] + counts['red_point_count'] + counts['flash_count'] + \
+            counts['on_sight_count']
+        trend_list.append({'date': bucket, **counts})
+    return trend_list
+
+
+def get_gym_dashboard_stats(gym_id, last_week_date1, last_week_date2, field_names=None):
+    """
+        method used to sum the daily rollup of the gym for the all time totals, this week and the week before.
+        Today is still being filled, so it is counted live from the raw history.
+    :param gym_id:
+    :param last_week_date1: start of the week before
+    :param last_week_date2: start of this week
+    :param field_names: GYM_DAILY_STATS_FIELDS to sum, all if None
+    :return: dict of total, this_week and previous_week counts
+    """
+    field_names = field_names or GYM_DAILY_STATS_FIELDS
+    today = date.today()
+    aggregates = dict()
+    for field_name in field_names:
+        aggregates['total_' + field_name] = Sum(field_name)
+        aggregates['this_week_' + field_name] = Sum(field_name, filter=Q(date__gte=last_week_date2))
+        aggregates['previous_week_' + field_name] = Sum(field_name, filter=Q(date__gte=last_week_date1,
+                                                                             date__lt=last_week_date2))
+    rollup_data = GymDailyStats.objects.filter(gym=gym_id, date__lt=today).aggregate(**aggregates)
+    today_counts = get_gym_daily_counts(today, today + timedelta(days=1), [gym_id], field_names).\
+        get((gym_id, today), {})
+    stats = {'total': dict(), 'this_week': dict(), 'previous_week': dict()}
+    for field_name in field_names:
+        today_count = today_counts.get(field_name, 0)
+        stats['total'][field_name] = (rollup_data['total_' + field_name] or 0) + today_count
+        stats['this_week'][field_name] = (rollup_data['this_week_' + field_name] or 0) + today_count
+        stats['previous_week'][field_name] = rollup_data['previous_week_' + field_name] or 0
+    return stats
+
+
+def get_rope_bouldering_graph(gym_detail):
+    """
+        method used to get the route count per grade of the rope climbing and bouldering grading systems of
+        the gym with one grouped query, cached per gym content version.
+    :param gym_detail:
+    :return:
+    """
+    cache_key = 'rope_bouldering_graph:{}:{}:{}:{}'.format(gym_detail.id, gym_detail.content_version,
+                                                            gym_detail.RopeClimbing, gym_detail.Bouldering)
+    rope_bouldering_graph = cache.get(cache_key)
+    if rope_bouldering_graph is not None:
+        return rope_bouldering_graph
+    grade_filter = Q(pk__in=[])
+    if gym_detail.RopeClimbing in GymDetails.RopeClimbingOptions.values:
+        grade_filter |= Q(grading_system=GymLayout.ClimbingType.ROPE_CLIMBING, sub_category=gym_detail.RopeClimbing)
+    if gym_detail.Bouldering in GymDetails.BoulderingOptions.values:
+        grade_filter |= Q(grading_system=GymLayout.ClimbingType.BOULDERING, sub_category=gym_detail.Bouldering)
+    count_data = GradeType.objects.filter(grade_filter).order_by('id').values(
+        'grading_system', 'sub_category_value').annotate(
+        count=Count('route_grade', filter=Q(route_grade__gym=gym_detail.id, route_grade__is_deleted=False)))
+    rope_climbing_data, bouldering_data = [], []
+    for each in count_data:
+        grading_system = each.pop('grading_system')
+        if grading_system == GymLayout.ClimbingType.ROPE_CLIMBING:
+            rope_climbing_data.append(each)
+        else:
+            bouldering_data.append(each)
     rope_bouldering_graph = dict()
     if rope_climbing_data:
-        rope_bouldering_graph['total_rope_climbing_count'] = total_count1
+        rope_bouldering_graph['total_rope_climbing_count'] = sum(each['count'] for each in rope_climbing_data)
         rope_bouldering_graph['rope_climbing_data'] = rope_climbing_data
     else:
         rope_bouldering_graph['total_rope_climbing_count'] = -1
         rope_bouldering_graph['rope_climbing_data'] = None
     if bouldering_data:
-        rope_bouldering_graph['total_bouldering_count'] = total_count2
+        rope_bouldering_graph['total_bouldering_count'] = sum(each['count'] for each in bouldering_data)
         rope_bouldering_graph['bouldering_data'] = bouldering_data
     else:
         rope_bouldering_graph['total_bouldering_count'] = -1
         rope_bouldering_graph['bouldering_data'] = None
+    cache.set(cache_key, rope_bouldering_graph, GYM_LAYOUT_CACHE_TIMEOUT)
     return rope_bouldering_graph
 
 
@@ -1867,3 +2540,37 @@ def get_filtered_user_common_fun(gym, user_data):
         else:
             data = list(data1)
     return data
+
+
+def get_request_role_context(request):
+    """
+        method used to resolve the active roles, effective gym and gym owner of the requested user.
+        Resolved once per request with a single query and kept on the request for permissions and views.
+    :param request:
+    :return: dict with roles, is_gym_owner, gym_detail and gym_user
+    """
+    role_context = getattr(request, '_role_context', None)
+    if role_context is not None:
+        return role_context
+    role_list = list(Role.objects.select_related('user__gym_detail_user', 'user__user_details__home_gym__user').
+                     filter(user=request.user, role_status=True))
+    roles = {each.name for each in role_list}
+    is_gym_owner = Role.RoleType.GYM_OWNER in roles
+    gym_detail, gym_user = None, None
+    if role_list:
+        role_user = role_list[0].user
+        if is_gym_owner:
+            gym_detail = getattr(role_user, 'gym_detail_user', None)
+            gym_user = request.user
+        else:
+            user_details = getattr(role_user, 'user_details', None)
+            gym_detail = user_details.home_gym if user_details else None
+            gym_user = gym_detail.user if gym_detail else None
+    role_context = {
+        'roles': roles,
+        'is_gym_owner': is_gym_owner,
+        'gym_detail': gym_detail,
+        'gym_user': gym_user,
+    }
+    setattr(request, '_role_context', role_context)
+    return role_context
@@ -1,3 +1,5 @@
 #!/bin/bash
 source /home/ubuntu/jenkins/workspace/Crimpit-backend-python-dev/venv/bin/activate && cd /home/ubuntu/jenkins/workspace/Crimpit-backend-python-dev && python daily_check.py >> cronjobreport
-source /home/ubuntu/jenkins/workspace/Crimpit-backend-python-dev/venv/bin/activate && cd /home/ubuntu/jenkins/workspace/Crimpit-backend-python-dev && python remove_expo_file.py >> cronexpojobreport
\ No newline at end of file
+source /home/ubuntu/jenkins/workspace/Crimpit-backend-python-dev/venv/bin/activate && cd /home/ubuntu/jenkins/workspace/Crimpit-backend-python-dev && python remove_expo_file.py >> cronexpojobreport
+source /home/ubuntu/jenkins/workspace/Crimpit-backend-python-dev/venv/bin/activate && cd /home/ubuntu/jenkins/workspace/Crimpit-backend-python-dev && python manage.py flush_wall_visits >> cronwallvisitreport
+source /home/ubuntu/jenkins/workspace/Crimpit-backend-python-dev/venv/bin/activate && cd /home/ubuntu/jenkins/workspace/Crimpit-backend-python-dev && python manage.py rollup_gym_daily_stats >> crongymdailystatsreport
@@ -1,6 +1,7 @@
 from django.contrib import admin
 from gyms.models import GymDetails, ChangeRequestGymDetails, GymLayout, LayoutSection, SectionWall, WallRoute, \
-    PreLoadedTemplate, Announcement, Event, OpenFeedback, WallType, ColorType, RouteType
+    PreLoadedTemplate, Announcement, Event, OpenFeedback, WallType, ColorType, RouteType, SectionWallStats, \
+    WallRouteStats, GymDailyStats
 
 
 # Register your models here.
@@ -25,11 +26,27 @@ class SectionWallAdmin(admin.ModelAdmin):
     list_display = ('id', 'gym_layout', 'name', 'created_by', 'created_at',)
 
 
+@admin.register(SectionWallStats)
+class SectionWallStatsAdmin(admin.ModelAdmin):
+    list_display = ('id', 'section_wall', 'round_attempted', 'round_completed', 'wall_visit', 'updated_at',)
+
+
 @admin.register(WallRoute)
 class WallRouteAdmin(admin.ModelAdmin):
     list_display = ('id', 'section_wall', 'name', 'grade', 'route_type', 'created_by',)
 
 
+@admin.register(WallRouteStats)
+class WallRouteStatsAdmin(admin.ModelAdmin):
+    list_display = ('id', 'route', 'rating_sum', 'rating_count', 'feedback_climbers', 'completed_climbers',
+                    'updated_at',)
+
+
+@admin.register(GymDailyStats)
+class GymDailyStatsAdmin(admin.ModelAdmin):
+    list_display = ('id', 'gym', 'date', 'feedback_count', 'wall_visit_count', 'new_wall_count', 'new_member_count',)
+
+
 @admin.register(OpenFeedback)
 class OpenFeedbackAdmin(admin.ModelAdmin):
     list_display = ('id', 'gym_user', 'feedback', 'open_at',)
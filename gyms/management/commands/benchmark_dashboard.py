@@ -0,0 +1,62 @@
+import time
+from datetime import date, timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+
+from core import utils as core_utils
+from gyms.models import GymDetails, RouteType, WallRoute
+
+
+class Command(BaseCommand):
+    """
+        Command class used to measure the queries and time of the owner dashboard helpers for a gym,
+        optionally with extra custom route types added inside a rolled back transaction.
+    """
+    help = 'Benchmark the owner dashboard helpers of a gym.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--gym', type=int, required=True, help='Gym id to build the dashboard of.')
+        parser.add_argument('--route-types', type=int, default=0,
+                            help='Extra custom route types to add (rolled back after the run).')
+        parser.add_argument('--repeat', type=int, default=5, help='Runs per helper, the best time is shown.')
+
+    def run_helper(self, helper, repeat):
+        best_elapsed, query_count = None, 0
+        for _ in range(repeat):
+            with CaptureQueriesContext(connection) as queries:
+                start = time.perf_counter()
+                helper()
+                elapsed = (time.perf_counter() - start) * 1000
+            query_count = len(queries)
+            best_elapsed = elapsed if best_elapsed is None else min(best_elapsed, elapsed)
+        return query_count, best_elapsed
+
+    def handle(self, *args, **options):
+        gym_detail = GymDetails.objects.select_related('user').filter(id=options['gym']).first()
+        if not gym_detail:
+            raise CommandError('Gym %s does not exist.' % options['gym'])
+        requested_user = gym_detail.user
+        today = date.today()
+        last_week_date1, last_week_date2 = today - timedelta(days=14), today - timedelta(days=7)
+        helpers = (
+            ('route type', lambda: core_utils.get_dashboard_all_route_type_data(requested_user)),
+            ('range data', lambda: core_utils.get_dashboard_all_type_range_data(requested_user, gym_detail)),
+            ('feedback', lambda: core_utils.get_dashboard_all_type_feedback_data(requested_user, gym_detail)),
+            ('counts', lambda: core_utils.get_dashboard_count_data(gym_detail.id, last_week_date1, last_week_date2)),
+            ('grade graph', lambda: core_utils.get_rope_bouldering_graph(gym_detail)),
+        )
+        with transaction.atomic():
+            if options['route_types']:
+                route_types = RouteType.objects.bulk_create([
+                    RouteType(gym=gym_detail, name='Benchmark %s' % index) for index in range(options['route_types'])])
+                # spread the existing routes of the gym over the new route types
+                route_ids = list(WallRoute.objects.filter(gym=gym_detail).values_list('id', flat=True))
+                for index, route_id in enumerate(route_ids):
+                    WallRoute.objects.filter(id=route_id).update(route_type=route_types[index % len(route_types)])
+            self.stdout.write('route types: %s' % RouteType.objects.filter(gym=gym_detail).count())
+            for name, helper in helpers:
+                queries, elapsed = self.run_helper(helper, max(options['repeat'], 1))
+                self.stdout.write('%-12s queries: %-4s time: %.2f ms' % (name, queries, elapsed))
+            transaction.set_rollback(True)
@@ -0,0 +1,28 @@
+from django.core.management.base import BaseCommand
+
+from core import utils as core_utils
+from gyms.models import WallRoute
+
+
+class Command(BaseCommand):
+    """
+        Command class used to rebuild the materialized route stats from the feedback history.
+    """
+    help = 'Rebuild the per route rating, progress and community grade aggregates.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--route', type=int, nargs='*', help='Route ids to rebuild, all routes if not provided.')
+        parser.add_argument('--gym', type=int, help='Rebuild only the routes of this gym id.')
+        parser.add_argument('--batch-size', type=int, default=1000, help='Routes processed per batch.')
+
+    def handle(self, *args, **options):
+        routes = WallRoute.all_objects.all().order_by('id')
+        if options.get('route'):
+            routes = routes.filter(id__in=options['route'])
+        if options.get('gym'):
+            routes = routes.filter(gym=options['gym'])
+        route_ids = list(routes.values_list('id', flat=True))
+        batch_size = options['batch_size']
+        for index in range(0, len(route_ids), batch_size):
+            core_utils.rebuild_route_stats(route_ids[index:index + batch_size])
+        self.stdout.write(self.style.SUCCESS('Route stats rebuilt for %s route(s).' % len(route_ids)))
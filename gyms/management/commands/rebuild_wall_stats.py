@@ -0,0 +1,28 @@
+from django.core.management.base import BaseCommand
+
+from core import utils as core_utils
+from gyms.models import SectionWall
+
+
+class Command(BaseCommand):
+    """
+        Command class used to rebuild the materialized wall stats from feedback and visit history.
+    """
+    help = 'Rebuild the per wall attempted/completed/visit counts.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--wall', type=int, nargs='*', help='Wall ids to rebuild, all walls if not provided.')
+        parser.add_argument('--gym', type=int, help='Rebuild only the walls of this gym id.')
+        parser.add_argument('--batch-size', type=int, default=1000, help='Walls processed per batch.')
+
+    def handle(self, *args, **options):
+        walls = SectionWall.all_objects.all().order_by('id')
+        if options.get('wall'):
+            walls = walls.filter(id__in=options['wall'])
+        if options.get('gym'):
+            walls = walls.filter(gym=options['gym'])
+        wall_ids = list(walls.values_list('id', flat=True))
+        batch_size = options['batch_size']
+        for index in range(0, len(wall_ids), batch_size):
+            core_utils.rebuild_wall_stats(wall_ids[index:index + batch_size])
+        self.stdout.write(self.style.SUCCESS('Wall stats rebuilt for %s wall(s).' % len(wall_ids)))
@@ -0,0 +1,42 @@
+from datetime import date, timedelta
+
+from django.core.management.base import BaseCommand
+from django.db.models import Min
+
+from core import utils as core_utils
+from gyms.models import GymDetails
+
+
+class Command(BaseCommand):
+    """
+        Command class used to fill the daily gym rollup of the owner dashboard.
+    """
+    help = 'Recalculate the daily gym dashboard rollup of the recent days (or of the whole history with --all).'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=15,
+                            help='Number of recent days to recalculate, today included. The default covers the '
+                                 'two weeks compared on the dashboard so deleted walls/routes are reconciled.')
+        parser.add_argument('--all', action='store_true', help='Recalculate the whole history.')
+        parser.add_argument('--gym', type=int, nargs='*', help='Gym ids to recalculate, all gyms if not provided.')
+        parser.add_argument('--chunk-days', type=int, default=31, help='Days recalculated per batch.')
+
+    def handle(self, *args, **options):
+        gym_ids = options.get('gym') or None
+        end_date = date.today() + timedelta(days=1)
+        if options['all']:
+            gyms = GymDetails.objects.all()
+            if gym_ids:
+                gyms = gyms.filter(id__in=gym_ids)
+            first_created = gyms.aggregate(first_created=Min('created_at'))['first_created']
+            start_date = first_created.date() if first_created else date.today()
+        else:
+            start_date = end_date - timedelta(days=max(options['days'], 1))
+        row_count = 0
+        chunk_start = start_date
+        while chunk_start < end_date:
+            chunk_end = min(chunk_start + timedelta(days=options['chunk_days']), end_date)
+            row_count += core_utils.rebuild_gym_daily_stats(chunk_start, chunk_end, gym_ids)
+            chunk_start = chunk_end
+        self.stdout.write(self.style.SUCCESS('Gym daily stats written for %s gym day(s) from %s.' %
+                                             (row_count, start_date)))
@@ -0,0 +1,33 @@
+# Generated by Django 3.1.7 on 2021-09-20 10:12
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('gyms', '0032_auto_20210914_1351'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SectionWallStats',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Created At')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='Last Updated At')),
+                ('updated_by', models.IntegerField(blank=True, null=True, verbose_name='Updated by')),
+                ('is_deleted', models.BooleanField(default=False, verbose_name='Is Deleted')),
+                ('deleted_at', models.DateTimeField(blank=True, null=True)),
+                ('round_attempted', models.PositiveIntegerField(default=0, verbose_name='Round Attempted')),
+                ('round_completed', models.PositiveIntegerField(default=0, verbose_name='Round Completed')),
+                ('wall_visit', models.PositiveIntegerField(default=0, verbose_name='Wall Visit')),
+                ('section_wall', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='wall_stats', to='gyms.sectionwall')),
+            ],
+            options={
+                'verbose_name': 'SectionWallStats',
+                'verbose_name_plural': 'SectionWallStats',
+            },
+        ),
+    ]
@@ -0,0 +1,45 @@
+# Generated by Django 3.1.7 on 2021-09-21 11:40
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('gyms', '0033_sectionwallstats'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='WallRouteStats',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Created At')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='Last Updated At')),
+                ('updated_by', models.IntegerField(blank=True, null=True, verbose_name='Updated by')),
+                ('is_deleted', models.BooleanField(default=False, verbose_name='Is Deleted')),
+                ('deleted_at', models.DateTimeField(blank=True, null=True)),
+                ('rating_sum', models.PositiveIntegerField(default=0, verbose_name='Rating Sum')),
+                ('rating_count', models.PositiveIntegerField(default=0, verbose_name='Rating Count')),
+                ('feedback_climbers', models.PositiveIntegerField(default=0, verbose_name='Feedback Climbers')),
+                ('completed_climbers', models.PositiveIntegerField(default=0, verbose_name='Completed Climbers')),
+                ('projecting_climbers', models.PositiveIntegerField(default=0, verbose_name='Projecting Climbers')),
+                ('red_point_climbers', models.PositiveIntegerField(default=0, verbose_name='Red Point Climbers')),
+                ('flash_climbers', models.PositiveIntegerField(default=0, verbose_name='Flash Climbers')),
+                ('on_sight_climbers', models.PositiveIntegerField(default=0, verbose_name='On Sight Climbers')),
+                ('graded_climbers', models.PositiveIntegerField(default=0, verbose_name='Graded Climbers')),
+                ('negative_climbers', models.PositiveIntegerField(default=0, verbose_name='Negative Grade Climbers')),
+                ('normal_climbers', models.PositiveIntegerField(default=0, verbose_name='Normal Grade Climbers')),
+                ('positive_climbers', models.PositiveIntegerField(default=0, verbose_name='Positive Grade Climbers')),
+                ('negative_grade_count', models.PositiveIntegerField(default=0, verbose_name='Negative Grade Count')),
+                ('normal_grade_count', models.PositiveIntegerField(default=0, verbose_name='Normal Grade Count')),
+                ('positive_grade_count', models.PositiveIntegerField(default=0, verbose_name='Positive Grade Count')),
+                ('route', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='route_stats', to='gyms.wallroute')),
+            ],
+            options={
+                'verbose_name': 'WallRouteStats',
+                'verbose_name_plural': 'WallRouteStats',
+            },
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 3.1.7 on 2021-09-22 09:25
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('gyms', '0034_wallroutestats'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='gymdetails',
+            name='content_version',
+            field=models.PositiveIntegerField(default=0, verbose_name='Content Version'),
+        ),
+    ]
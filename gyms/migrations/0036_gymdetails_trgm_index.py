@@ -0,0 +1,19 @@
+# Generated by Django 3.1.7 on 2021-09-23 10:06
+
+import django.contrib.postgres.indexes
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0028_user_trgm_indexes'),
+        ('gyms', '0035_gymdetails_content_version'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='gymdetails',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['gym_name'], name='gym_name_trgm_idx', opclasses=['gin_trgm_ops']),
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 3.1.7 on 2021-09-24 11:18
+
+import django.contrib.gis.db.models.fields
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('gyms', '0036_gymdetails_trgm_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='wallroute',
+            name='tag_geom',
+            field=django.contrib.gis.db.models.fields.PointField(blank=True, null=True, srid=4326, verbose_name='Tag Point Geometry'),
+        ),
+        migrations.AddField(
+            model_name='ghostwallroute',
+            name='tag_geom',
+            field=django.contrib.gis.db.models.fields.PointField(blank=True, null=True, srid=4326, verbose_name='Tag Point Geometry'),
+        ),
+        migrations.RunSQL(
+            sql=[
+                "UPDATE gyms_wallroute SET tag_geom = ST_SetSRID(ST_MakePoint(tag_point[1], tag_point[2]), 4326) "
+                "WHERE array_length(tag_point, 1) >= 2;",
+                "UPDATE gyms_ghostwallroute SET tag_geom = ST_SetSRID(ST_MakePoint(tag_point[1], tag_point[2]), 4326) "
+                "WHERE array_length(tag_point, 1) >= 2;",
+            ],
+            reverse_sql=migrations.RunSQL.noop,
+        ),
+    ]
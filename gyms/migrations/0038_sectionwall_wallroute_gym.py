@@ -0,0 +1,36 @@
+# Generated by Django 3.1.7 on 2021-09-29 10:32
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('gyms', '0037_route_tag_geom'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='sectionwall',
+            name='gym',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='gym_section_wall', to='gyms.gymdetails'),
+        ),
+        migrations.AddField(
+            model_name='wallroute',
+            name='gym',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='gym_wall_route', to='gyms.gymdetails'),
+        ),
+        migrations.RunSQL(
+            sql=[
+                "UPDATE gyms_sectionwall AS w SET gym_id = l.gym_id FROM gyms_gymlayout AS l "
+                "WHERE w.gym_layout_id = l.id;",
+                "UPDATE gyms_sectionwall AS w SET gym_id = l.gym_id FROM gyms_layoutsection AS s "
+                "INNER JOIN gyms_gymlayout AS l ON s.gym_layout_id = l.id "
+                "WHERE w.gym_layout_id IS NULL AND w.layout_section_id = s.id;",
+                "UPDATE gyms_wallroute AS r SET gym_id = w.gym_id FROM gyms_sectionwall AS w "
+                "WHERE r.section_wall_id = w.id;",
+            ],
+            reverse_sql=migrations.RunSQL.noop,
+        ),
+    ]
@@ -0,0 +1,43 @@
+# Generated by Django 3.1.7 on 2021-09-30 08:52
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('gyms', '0038_sectionwall_wallroute_gym'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='GymDailyStats',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Created At')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='Last Updated At')),
+                ('updated_by', models.IntegerField(blank=True, null=True, verbose_name='Updated by')),
+                ('is_deleted', models.BooleanField(default=False, verbose_name='Is Deleted')),
+                ('deleted_at', models.DateTimeField(blank=True, null=True)),
+                ('date', models.DateField(verbose_name='Date')),
+                ('feedback_count', models.PositiveIntegerField(default=0, verbose_name='Feedback Count')),
+                ('projecting_count', models.PositiveIntegerField(default=0, verbose_name='Projecting Count')),
+                ('red_point_count', models.PositiveIntegerField(default=0, verbose_name='Red Point Count')),
+                ('flash_count', models.PositiveIntegerField(default=0, verbose_name='Flash Count')),
+                ('on_sight_count', models.PositiveIntegerField(default=0, verbose_name='On Sight Count')),
+                ('wall_visit_count', models.PositiveIntegerField(default=0, verbose_name='Wall Visit Count')),
+                ('new_wall_count', models.PositiveIntegerField(default=0, verbose_name='New Wall Count')),
+                ('new_member_count', models.PositiveIntegerField(default=0, verbose_name='New Member Count')),
+                ('gym', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='gym_daily_stats', to='gyms.gymdetails')),
+            ],
+            options={
+                'verbose_name': 'GymDailyStats',
+                'verbose_name_plural': 'GymDailyStats',
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='gymdailystats',
+            constraint=models.UniqueConstraint(fields=('gym', 'date'), name='unique_gym_daily_stats'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 3.1.7 on 2021-10-04 09:18
+
+import django.contrib.postgres.indexes
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('gyms', '0039_gymdailystats'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='wallroute',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['name'], name='wall_route_name_trgm_idx', opclasses=['gin_trgm_ops']),
+        ),
+    ]
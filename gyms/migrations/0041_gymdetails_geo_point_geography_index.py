@@ -0,0 +1,18 @@
+# Generated by Django 3.1.7 on 2021-10-06 11:42
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('gyms', '0040_wallroute_name_trgm_index'),
+    ]
+
+    operations = [
+        migrations.RunSQL(
+            sql='CREATE INDEX IF NOT EXISTS gym_geo_point_geog_idx ON gyms_gymdetails '
+                'USING GIST ((geo_point::geography));',
+            reverse_sql='DROP INDEX IF EXISTS gym_geo_point_geog_idx;',
+        ),
+    ]
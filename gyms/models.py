@@ -1,11 +1,15 @@
+from decimal import Decimal, ROUND_HALF_UP
+
 from django.contrib.postgres.search import SearchVectorField
 
 from accounts.models import ActiveUserManager, ActiveObjectsManager, User
 from core.models import BaseModel
 from django.contrib.gis.db import models
-from django.contrib.gis.geos import Polygon
+from django.contrib.gis.geos import Point, Polygon
 from django.contrib.postgres.fields import ArrayField
 from django.contrib.postgres.indexes import GinIndex
+from django.db.models import OuterRef, Subquery
+from django.db.models.functions import Coalesce
 from multiselectfield import MultiSelectField
 
 
@@ -65,10 +69,60 @@ class GymDetails(BaseModel):
     temp_documents = ArrayField(models.CharField(max_length=200), blank=True, null=True)
     document_state = models.IntegerField(choices=DocumentChoices.choices, blank=True, null=True,
                                          verbose_name='Document State')
+    # bumped on every layout/section/wall change, used to version the cached layout payloads
+    content_version = models.PositiveIntegerField(default=0, verbose_name='Content Version')
 
     class Meta:
         verbose_name = 'GymDetail'
         verbose_name_plural = 'GymDetails'
+        indexes = [
+            GinIndex(name='gym_name_trgm_idx', fields=['gym_name'], opclasses=['gin_trgm_ops']),
+        ]
+
+
+def bump_gym_content_version(gym_ids=None, layout_ids=None):
+    """
+        method used to bump the content version of the gyms, by gym ids or by gym layout ids.
+    :param gym_ids: gym id or list of gym ids
+    :param layout_ids: gym layout id or list of gym layout ids
+    :return:
+    """
+    gyms = GymDetails.objects.all()
+    if gym_ids is not None:
+        gyms = gyms.filter(id__in=gym_ids if isinstance(gym_ids, (list, tuple, set)) else [gym_ids])
+    elif layout_ids is not None:
+        gyms = gyms.filter(gym_layout__in=layout_ids if isinstance(layout_ids, (list, tuple, set)) else [layout_ids])
+    else:
+        return 0
+    return gyms.update(content_version=models.F('content_version') + 1)
+
+
+def sync_wall_gym(wall_ids):
+    """
+        method used to copy the gym of the gym layout (or of the layout section) onto the walls and
+        their routes, call it after a queryset update of the wall layout.
+    :param wall_ids: wall id or list of wall ids
+    :return:
+    """
+    if not isinstance(wall_ids, (list, tuple, set)):
+        wall_ids = [wall_ids]
+    SectionWall.all_objects.filter(id__in=wall_ids).update(gym=Coalesce(
+        Subquery(GymLayout.all_objects.filter(id=OuterRef('gym_layout')).values('gym')[:1]),
+        Subquery(LayoutSection.all_objects.filter(id=OuterRef('layout_section')).values('gym_layout__gym')[:1])))
+    WallRoute.all_objects.filter(section_wall__in=wall_ids).update(
+        gym=Subquery(SectionWall.all_objects.filter(id=OuterRef('section_wall')).values('gym')[:1]))
+    return True
+
+
+def get_tag_geom(tag_point):
+    """
+        method used to get the indexable point geometry of a route tag point [x, y] on the wall image.
+    :param tag_point:
+    :return: point or None
+    """
+    if tag_point and len(tag_point) >= 2:
+        return Point(x=tag_point[0], y=tag_point[1], srid=4326)
+    return None
 
 
 class ChangeRequestGymDetails(BaseModel):
@@ -104,6 +158,10 @@ class GymLayout(BaseModel):
     objects = ActiveUserManager()
     all_objects = ActiveObjectsManager()
 
+    def save(self, *args, **kwargs):
+        super(GymLayout, self).save(*args, **kwargs)
+        bump_gym_content_version(gym_ids=self.gym_id)
+
     class Meta:
         verbose_name = 'GymLayout'
         verbose_name_plural = 'GymLayouts'
@@ -120,6 +178,10 @@ class LayoutSection(BaseModel):
     objects = ActiveUserManager()
     all_objects = ActiveObjectsManager()
 
+    def save(self, *args, **kwargs):
+        super(LayoutSection, self).save(*args, **kwargs)
+        bump_gym_content_version(layout_ids=self.gym_layout_id)
+
     class Meta:
         verbose_name = 'LayoutSection'
         verbose_name_plural = 'LayoutSections'
@@ -152,6 +214,9 @@ class SectionWall(BaseModel):
     category = models.IntegerField(choices=ClimbingType.choices, null=True, verbose_name='Climbing Category')
     gym_layout = models.ForeignKey(GymLayout, null=True, on_delete=models.SET_NULL, related_name='gym_layout_wall')
     layout_section = models.ForeignKey(LayoutSection, null=True, on_delete=models.SET_NULL, related_name='section_wall')
+    # denormalized gym of the gym layout, kept in sync on save
+    gym = models.ForeignKey(GymDetails, null=True, blank=True, on_delete=models.SET_NULL,
+                            related_name='gym_section_wall')
     image = models.CharField(max_length=255, blank=True, null=True, verbose_name='Wall Image')
     image_size = ArrayField(models.FloatField(), blank=True, null=True, verbose_name='Image Size')
     name = models.CharField(max_length=50, blank=True, null=True, verbose_name='Wall Name')
@@ -169,6 +234,17 @@ class SectionWall(BaseModel):
     objects = ActiveUserManager()
     all_objects = ActiveObjectsManager()
 
+    def save(self, *args, **kwargs):
+        if self.gym_layout_id:
+            self.gym_id = self.gym_layout.gym_id
+        elif self.layout_section_id and self.layout_section.gym_layout_id:
+            self.gym_id = self.layout_section.gym_layout.gym_id
+        else:
+            self.gym_id = None
+        super(SectionWall, self).save(*args, **kwargs)
+        WallRoute.all_objects.filter(section_wall=self.id).exclude(gym=self.gym_id).update(gym=self.gym_id)
+        bump_gym_content_version(layout_ids=self.gym_layout_id)
+
     class Meta:
         verbose_name = 'SectionWall'
         verbose_name_plural = 'SectionWalls'
@@ -239,6 +315,9 @@ class WallRoute(BaseModel):
 
     section_wall = models.ForeignKey(SectionWall, null=True, on_delete=models.SET_NULL,
                                      related_name='section_wall_route')
+    # denormalized gym of the section wall, kept in sync on save
+    gym = models.ForeignKey(GymDetails, null=True, blank=True, on_delete=models.SET_NULL,
+                            related_name='gym_wall_route')
     name = models.CharField(max_length=100, blank=True, null=True, verbose_name='Route Name')
     # grade = models.IntegerField(choices=GradeType.choices, null=True, verbose_name='Route Grade')
     grade = models.ForeignKey(GradeType, null=True, on_delete=models.SET_NULL, related_name='route_grade')
@@ -251,15 +330,26 @@ class WallRoute(BaseModel):
                                    related_name='created_by_route')
     image_size = ArrayField(models.FloatField(), blank=True, null=True, verbose_name='Image Size')
     tag_point = ArrayField(models.FloatField())
+    # tag_point as image coordinates geometry, kept in sync on save for the GiST nearest/bbox lookups
+    tag_geom = models.PointField(blank=True, null=True, verbose_name='Tag Point Geometry')
     is_active = models.BooleanField('Is Active', default=True)
 
     objects = ActiveUserManager()
     all_objects = ActiveObjectsManager()
 
+    def save(self, *args, **kwargs):
+        self.tag_geom = get_tag_geom(self.tag_point)
+        self.gym_id = self.section_wall.gym_id if self.section_wall_id else None
+        super(WallRoute, self).save(*args, **kwargs)
+        bump_gym_content_version(gym_ids=self.gym_id)
+
     class Meta:
         verbose_name = 'WallRoute'
         verbose_name_plural = 'WallRoutes'
         ordering = ['id']
+        indexes = [
+            GinIndex(name='wall_route_name_trgm_idx', fields=['name'], opclasses=['gin_trgm_ops']),
+        ]
 
 
 class GhostWallRoute(BaseModel):
@@ -273,17 +363,103 @@ class GhostWallRoute(BaseModel):
                                    related_name='ghost_created_by_route')
     image_size = ArrayField(models.FloatField(), blank=True, null=True, verbose_name='Image Size')
     tag_point = ArrayField(models.FloatField())
+    # tag_point as image coordinates geometry, kept in sync on save for the GiST nearest/bbox lookups
+    tag_geom = models.PointField(blank=True, null=True, verbose_name='Tag Point Geometry')
     is_active = models.BooleanField('Is Active', default=True)
 
     objects = ActiveUserManager()
     all_objects = ActiveObjectsManager()
 
+    def save(self, *args, **kwargs):
+        self.tag_geom = get_tag_geom(self.tag_point)
+        super(GhostWallRoute, self).save(*args, **kwargs)
+
     class Meta:
         verbose_name = 'GhostWallRoute'
         verbose_name_plural = 'GhostWallRoutes'
         ordering = ['id']
 
 
+class SectionWallStats(BaseModel):
+    """
+        SectionWallStats model used to keep the materialized climber/visit counts of a wall.
+    """
+    section_wall = models.OneToOneField(SectionWall, on_delete=models.CASCADE, related_name='wall_stats')
+    round_attempted = models.PositiveIntegerField(default=0, verbose_name='Round Attempted')
+    round_completed = models.PositiveIntegerField(default=0, verbose_name='Round Completed')
+    wall_visit = models.PositiveIntegerField(default=0, verbose_name='Wall Visit')
+
+    @property
+    def wall_popularity(self):
+        return self.round_attempted + self.round_completed
+
+    class Meta:
+        verbose_name = 'SectionWallStats'
+        verbose_name_plural = 'SectionWallStats'
+
+
+class WallRouteStats(BaseModel):
+    """
+        WallRouteStats model used to keep the materialized feedback aggregates of a route.
+        Rating is summed over the non projecting feedbacks, *_climbers are distinct climbers and
+        *_grade_count are community grade feedback counts.
+    """
+    route = models.OneToOneField(WallRoute, on_delete=models.CASCADE, related_name='route_stats')
+    rating_sum = models.PositiveIntegerField(default=0, verbose_name='Rating Sum')
+    rating_count = models.PositiveIntegerField(default=0, verbose_name='Rating Count')
+    feedback_climbers = models.PositiveIntegerField(default=0, verbose_name='Feedback Climbers')
+    completed_climbers = models.PositiveIntegerField(default=0, verbose_name='Completed Climbers')
+    projecting_climbers = models.PositiveIntegerField(default=0, verbose_name='Projecting Climbers')
+    red_point_climbers = models.PositiveIntegerField(default=0, verbose_name='Red Point Climbers')
+    flash_climbers = models.PositiveIntegerField(default=0, verbose_name='Flash Climbers')
+    on_sight_climbers = models.PositiveIntegerField(default=0, verbose_name='On Sight Climbers')
+    graded_climbers = models.PositiveIntegerField(default=0, verbose_name='Graded Climbers')
+    negative_climbers = models.PositiveIntegerField(default=0, verbose_name='Negative Grade Climbers')
+    normal_climbers = models.PositiveIntegerField(default=0, verbose_name='Normal Grade Climbers')
+    positive_climbers = models.PositiveIntegerField(default=0, verbose_name='Positive Grade Climbers')
+    negative_grade_count = models.PositiveIntegerField(default=0, verbose_name='Negative Grade Count')
+    normal_grade_count = models.PositiveIntegerField(default=0, verbose_name='Normal Grade Count')
+    positive_grade_count = models.PositiveIntegerField(default=0, verbose_name='Positive Grade Count')
+
+    @property
+    def avg_rating(self):
+        if not self.rating_count:
+            return None
+        # same half up rounding as ROUND() of postgres
+        return float((Decimal(self.rating_sum) / Decimal(self.rating_count)).quantize(Decimal('0.1'), ROUND_HALF_UP))
+
+    class Meta:
+        verbose_name = 'WallRouteStats'
+        verbose_name_plural = 'WallRouteStats'
+
+
+class GymDailyStats(BaseModel):
+    """
+        GymDailyStats model used to keep the per day rollup of the gym dashboard counts.
+    """
+    gym = models.ForeignKey(GymDetails, on_delete=models.CASCADE, related_name='gym_daily_stats')
+    date = models.DateField(verbose_name='Date')
+    feedback_count = models.PositiveIntegerField(default=0, verbose_name='Feedback Count')
+    projecting_count = models.PositiveIntegerField(default=0, verbose_name='Projecting Count')
+    red_point_count = models.PositiveIntegerField(default=0, verbose_name='Red Point Count')
+    flash_count = models.PositiveIntegerField(default=0, verbose_name='Flash Count')
+    on_sight_count = models.PositiveIntegerField(default=0, verbose_name='On Sight Count')
+    wall_visit_count = models.PositiveIntegerField(default=0, verbose_name='Wall Visit Count')
+    new_wall_count = models.PositiveIntegerField(default=0, verbose_name='New Wall Count')
+    new_member_count = models.PositiveIntegerField(default=0, verbose_name='New Member Count')
+
+    @property
+    def attempts_count(self):
+        return self.projecting_count + self.red_point_count + self.flash_count + self.on_sight_count
+
+    class Meta:
+        verbose_name = 'GymDailyStats'
+        verbose_name_plural = 'GymDailyStats'
+        constraints = [
+            models.UniqueConstraint(fields=['gym', 'date'], name='unique_gym_daily_stats'),
+        ]
+
+
 class PreLoadedTemplate(BaseModel):
     uploaded_template = models.CharField(max_length=255, verbose_name='Uploaded Template')
     is_active = models.BooleanField('Is Active', default=True)
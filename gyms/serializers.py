@@ -10,7 +10,6 @@ from django.contrib.gis.geos import Point
 from django.db import transaction, IntegrityError
 from fcm_django.models import FCMDevice
 from rest_framework import serializers, fields
-from rest_framework.authtoken.models import Token
 from accounts.models import (AccountVerification, Role, User, UserPreference, GRADING_CHOICES, UserRouteFeedback,
                              UserDetails, UserBiometricData, UserSubscription)
 from config.local import gym_forgotpassword_url, gym_emailverification_url
@@ -20,7 +19,7 @@ from core.messages import validation_message, variables
 from core import serializers as core_serializers
 from gyms.models import GymDetails, GymLayout, LayoutSection, SectionWall, WallRoute, Event, GradeType, Announcement, \
     PreLoadedTemplate, ChangeRequestGymDetails, GlobalSearch, OpenFeedback, WallType, ColorType, RouteType, \
-    GhostWallRoute
+    GhostWallRoute, get_tag_geom, sync_wall_gym
 from django.contrib.gis.db import models
 from core.serializers import DynamicFieldsModelSerializer
 from django.db.models import Count, Avg, Max
@@ -234,8 +233,7 @@ class GymResetPasswordSerializer(serializers.Serializer):
         user_obj.set_password(validated_data["password"])
         user_obj.save()
         # deleting token to signout user out of other device
-        Token.objects.filter(user=user_obj).delete()
-        Token.objects.get_or_create(user=user_obj)
+        core_utils.reset_user_token(user_obj)
 
         # To mark token as used
         account_verify.is_used = True
@@ -310,6 +308,7 @@ class LayoutSectionSerializer(serializers.ModelSerializer):
     def update(self, instance, validated_data):
         try:
             LayoutSection.objects.filter(id=instance.id).update(**validated_data)
+            core_utils.bump_gym_content_version(layout_ids=instance.gym_layout_id)
         except Exception:
             raise CustomException(status_code=400, message=validation_message.get("SOMETHING_WENT_WRONG"),
                                   location=validation_message.get("LOCATION"))
@@ -418,6 +417,9 @@ class GymWallSerializer(serializers.ModelSerializer):
             if not validated_data.get('ghost_wall_name'):
                 GhostWallRoute.objects.filter(section_wall=instance).update(is_deleted=True)
             SectionWall.objects.filter(id=instance.id).update(**validated_data)
+            if 'gym_layout' in validated_data or 'layout_section' in validated_data:
+                sync_wall_gym(instance.id)
+            core_utils.bump_gym_content_version(layout_ids=instance.gym_layout_id)
         except Exception:
             raise CustomException(status_code=400, message=validation_message.get("SOMETHING_WENT_WRONG"),
                                   location=validation_message.get("LOCATION"))
@@ -446,6 +448,7 @@ class GymGhostWallSerializer(serializers.ModelSerializer):
     def update(self, instance, validated_data):
         try:
             SectionWall.objects.filter(id=instance.id).update(**validated_data)
+            core_utils.bump_gym_content_version(layout_ids=instance.gym_layout_id)
         except Exception:
             raise CustomException(status_code=400, message=validation_message.get("SOMETHING_WENT_WRONG"),
                                   location=validation_message.get("LOCATION"))
@@ -643,7 +646,16 @@ class GymWallRouteSerializer(serializers.ModelSerializer):
 
     def update(self, instance, validated_data):
         try:
-            WallRoute.objects.filter(id=instance.id).update(**validated_data)
+            # queryset update skips auto_now, updated_at is used for the route listing ETag
+            if 'tag_point' in validated_data:
+                validated_data['tag_geom'] = get_tag_geom(validated_data['tag_point'])
+            if 'section_wall' in validated_data:
+                validated_data['gym'] = validated_data['section_wall'].gym if validated_data['section_wall'] else None
+            WallRoute.objects.filter(id=instance.id).update(**validated_data, updated_at=datetime.now(utc))
+            gym_ids = [instance.gym_id]
+            if validated_data.get('gym'):
+                gym_ids.append(validated_data['gym'].id)
+            core_utils.bump_gym_content_version(gym_ids=gym_ids)
         except Exception:
             raise CustomException(status_code=400, message=validation_message.get("SOMETHING_WENT_WRONG"),
                                   location=validation_message.get("LOCATION"))
@@ -698,6 +710,8 @@ class GhostWallRouteSerializer(serializers.ModelSerializer):
         try:
             assigned_to_old = instance.assigned_to
             assigned_to_new = validated_data.get('assigned_to')
+            if 'tag_point' in validated_data:
+                validated_data['tag_geom'] = get_tag_geom(validated_data['tag_point'])
             GhostWallRoute.objects.filter(id=instance.id).update(**validated_data)
         except Exception:
             raise CustomException(status_code=400, message=validation_message.get("SOMETHING_WENT_WRONG"),
@@ -752,8 +766,7 @@ class ChangePasswordSerializer(serializers.Serializer):
         user_obj.save()
 
         # deleting token to signout user out of other device
-        Token.objects.filter(user=user_obj).delete()
-        token, created = Token.objects.get_or_create(user=user_obj)
+        token = core_utils.reset_user_token(user_obj)
         attrs["token"] = token.key
         return attrs
 
@@ -957,6 +970,9 @@ class GymUserRouteFeedbackSerializer(DynamicFieldsModelSerializer):
     is_opened = serializers.SerializerMethodField()
 
     def get_is_opened(self, obj):
+        # annotated once for the page by the view, exists query only for a not annotated feedback
+        if hasattr(obj, 'is_opened_feedback'):
+            return True if obj.is_opened_feedback else "False"
         user = self.context.get('request')
         if OpenFeedback.objects.filter(gym_user=user, feedback=obj).exists():
             return True
@@ -1,3 +1,117 @@
-from django.test import TestCase
+from datetime import timedelta
 
-# Create your tests here.
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APITestCase
+
+from accounts.models import Role, User, UserDetails, UserRouteFeedback
+from core import utils as core_utils
+from gyms.models import GymDailyStats, GymDetails, GymLayout, OpenFeedback, SectionWall, WallRoute
+
+
+class MemberListQueryCountTest(APITestCase):
+    """
+        MemberListQueryCountTest class used to pin the queries of the member list pages, a bigger page must not
+        run more queries.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.owner = User.objects.create(email='owner@crimpit.test', full_name='Gym Owner')
+        Role.objects.create(user=cls.owner, name=Role.RoleType.GYM_OWNER)
+        cls.token = Token.objects.create(user=cls.owner)
+        gym = GymDetails.objects.create(user=cls.owner, gym_name='Test Gym', gym_phone_number='0000000000')
+        wall = SectionWall.objects.create(gym_layout=GymLayout.objects.create(gym=gym), name='Wall')
+        routes = [WallRoute.objects.create(section_wall=wall, name='Route %s' % index, tag_point=[index, index])
+                  for index in range(6)]
+        climbers = [User.objects.create(email='climber%s@crimpit.test' % index, full_name='Climber %s' % index)
+                    for index in range(6)]
+        for climber in climbers:
+            UserDetails.objects.create(user=climber, home_gym=gym, home_gym_added_on=timezone.now())
+        cls.climber = climbers[0]
+        for index, route in enumerate(routes):
+            feedback = UserRouteFeedback.objects.create(user=cls.climber, gym=gym, route=route,
+                                                        route_progress=index % 4)
+            if index % 2:
+                OpenFeedback.objects.create(gym_user=cls.owner, feedback=feedback)
+
+    def setUp(self):
+        self.client.credentials(HTTP_AUTHORIZATION='Token ' + self.token.key)
+
+    def assert_same_queries_per_page(self, url, params):
+        # first request warms up the per process lookups, only the page queries are compared
+        self.client.get(url, dict(params, page_size=1))
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url, dict(params, page_size=2))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data['data']['results']), 2)
+        with self.assertNumQueries(len(queries)):
+            response = self.client.get(url, dict(params, page_size=5))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data['data']['results']), 5)
+        return response
+
+    def test_member_profile_feedback_page_queries(self):
+        response = self.assert_same_queries_per_page('/crimpit/gym/member_profile_detail',
+                                                     {'user_id': self.climber.id})
+        opened = [each['is_opened'] for each in response.data['data']['results']]
+        self.assertIn(True, opened)
+        self.assertIn("False", opened)
+
+    def test_member_list_page_queries(self):
+        self.assert_same_queries_per_page('/crimpit/gym/all_gym_users', {})
+
+    def test_member_list_cursor_page_queries(self):
+        self.assert_same_queries_per_page('/crimpit/gym/all_gym_users', {'cursor': ''})
+
+
+class GymDailyStatsDeleteTest(APITestCase):
+    """
+        GymDailyStatsDeleteTest class used to check that deleting a route or a wall rebuilds the daily rollup,
+        the dashboard totals are summed from it.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.owner = User.objects.create(email='owner@crimpit.test', full_name='Gym Owner')
+        Role.objects.create(user=cls.owner, name=Role.RoleType.GYM_OWNER)
+        cls.token = Token.objects.create(user=cls.owner)
+        cls.gym = GymDetails.objects.create(user=cls.owner, gym_name='Test Gym', gym_phone_number='0000000000')
+        cls.wall = SectionWall.objects.create(gym_layout=GymLayout.objects.create(gym=cls.gym), name='Wall')
+        cls.routes = [WallRoute.objects.create(section_wall=cls.wall, name='Route %s' % index,
+                                               tag_point=[index, index]) for index in range(2)]
+        climber = User.objects.create(email='climber@crimpit.test', full_name='Climber')
+        for route in cls.routes:
+            UserRouteFeedback.objects.create(user=climber, gym=cls.gym, route=route,
+                                             route_progress=UserRouteFeedback.RouteProgressType.FLASH)
+        cls.yesterday = timezone.localdate() - timedelta(days=1)
+        created_at = timezone.now() - timedelta(days=1)
+        UserRouteFeedback.objects.update(created_at=created_at)
+        SectionWall.all_objects.filter(id=cls.wall.id).update(created_at=created_at)
+        core_utils.rebuild_gym_daily_stats(cls.yesterday)
+
+    def setUp(self):
+        self.client.credentials(HTTP_AUTHORIZATION='Token ' + self.token.key)
+
+    def get_yesterday_stats(self):
+        return GymDailyStats.objects.get(gym=self.gym, date=self.yesterday)
+
+    def test_route_delete_rebuilds_rollup(self):
+        self.assertEqual(self.get_yesterday_stats().flash_count, 2)
+        response = self.client.put('/crimpit/gym/deletegymroute', {'route_ids': [self.routes[0].id]},
+                                   format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.get_yesterday_stats().flash_count, 1)
+        stats = core_utils.get_gym_dashboard_stats(self.gym.id, self.yesterday - timedelta(days=14),
+                                                   self.yesterday - timedelta(days=7))
+        self.assertEqual(stats['total']['flash_count'], 1)
+
+    def test_wall_delete_rebuilds_rollup(self):
+        self.assertEqual(self.get_yesterday_stats().new_wall_count, 1)
+        response = self.client.put('/crimpit/gym/deletegymwall', {'wall_ids': [self.wall.id]}, format='json')
+        self.assertEqual(response.status_code, 200)
+        yesterday_stats = self.get_yesterday_stats()
+        self.assertEqual(yesterday_stats.new_wall_count, 0)
+        self.assertEqual(yesterday_stats.feedback_count, 0)
@@ -89,6 +89,7 @@ urlpatterns = [
     # Dashboard
     path("dashboard", gym_views.DashboardViewSet.as_view({"get": "list"}), name="dashboard-view-set"),
     path("dashboard1", gym_views.Dashboard1ViewSet.as_view({"get": "list"}), name="dashboard1-view-set"),
+    path("dashboard_trend", gym_views.DashboardTrendViewSet.as_view({"get": "list"}), name="dashboard-trend-view-set"),
 
 
     path('feedbacklist/<int:route_id>', gym_views.RouteTagListScreen2FeedbackList.as_view({'get': 'list'}),
@@ -12,13 +12,13 @@ from rest_framework import filters
 from rest_framework.authtoken.models import Token
 
 ''' project level import '''
-from accounts.models import User, Role, WallVisit, UserDetails, UserBiometricData, UserPreference, GymVisit
+from accounts.models import User, Role, UserDetails, UserBiometricData, UserPreference, GymVisit
 from accounts.serializers import GradeTypeSerializer
 from gyms.models import GymDetails, GymLayout, LayoutSection, Event, SectionWall, WallRoute, GradeType, Announcement, \
     PreLoadedTemplate, GlobalSearch, OpenFeedback, WallType, ColorType, RouteType, GhostWallRoute
 from core.exception import get_custom_error, CustomException
 from core.messages import success_message, validation_message
-from core.pagination import CustomPagination
+from core.pagination import CustomPagination, KeysetPagination
 from core.permissions import (AppClimberPermission, IsSubscribedAnnouncement, IsSubscribedUserProfile, )
 from core.response import SuccessResponse
 from core import utils as core_utils
@@ -42,7 +42,8 @@ from accounts.models import UserRouteFeedback
 from core.authentication import CustomTokenAuthentication
 from core.permissions import IsGymOwner
 from core.serializers import get_serialized_data
-from django.db.models import Count, Avg, Max, FloatField, F, Q, ExpressionWrapper, IntegerField, Func
+from django.db.models import Count, Avg, Max, FloatField, Q, ExpressionWrapper, IntegerField, Func, Exists, \
+    OuterRef
 from django.db.models.functions import Greatest
 from core.utils import (specific_route_details, route_progress_details, community_grade_route_details,
                         rating_range_output, validation_route_tag_list)
@@ -286,12 +287,9 @@ class GymlayoutView(viewsets.ViewSet, viewsets.GenericViewSet):
         """
         page_size = request.GET.get('page_size', '')
         # Add for gym staff
-        requested_user = request.user
-        if requested_user.user_role.first().name == Role.RoleType.GYM_OWNER:
-            requested_user_gym = requested_user
-        else:
-            requested_user_gym = request.user.user_details.home_gym.user
-        gym_obj = GymDetails.objects.filter(user=requested_user_gym).select_related('user').first()
+        role_context = core_utils.get_request_role_context(request)
+        requested_user_gym = role_context['gym_user']
+        gym_obj = role_context['gym_detail']
         ##
         # token = request.META.get('HTTP_AUTHORIZATION')
         # word, token = token.split(" ")
@@ -328,9 +326,11 @@ class DeleteGymLayout(viewsets.ViewSet):
         layout_ids = request.data.get('layout_ids')
         GymLayout.all_objects.filter(id__in=layout_ids).update(is_deleted=True)
         LayoutSection.all_objects.filter(gym_layout_id__in=layout_ids).update(is_deleted=True)
-        wall_objs = SectionWall.objects.filter(gym_layout_id__in=layout_ids).values_list('id', flat=True)
+        wall_objs = list(SectionWall.objects.filter(gym_layout_id__in=layout_ids).values_list('id', flat=True))
         WallRoute.objects.filter(section_wall_id__in=wall_objs).update(is_deleted=True)
         SectionWall.all_objects.filter(gym_layout_id__in=layout_ids).update(is_deleted=True)
+        core_utils.bump_gym_content_version(layout_ids=layout_ids)
+        core_utils.rebuild_gym_daily_stats_on_delete(wall_ids=wall_objs)
         return SuccessResponse({"message": success_message.get('DELETE_SUCCESS'),
                                 }, status=status_code.HTTP_200_OK)
 
@@ -432,10 +432,13 @@ class DeleteGymSection(viewsets.ViewSet):
 
     def update(self, request):
         section_ids = request.data.get('section_ids')
-        wall_objs = SectionWall.objects.filter(layout_section_id__in=section_ids).values_list('id', flat=True)
+        layout_ids = list(LayoutSection.all_objects.filter(id__in=section_ids).values_list('gym_layout', flat=True))
+        wall_objs = list(SectionWall.objects.filter(layout_section_id__in=section_ids).values_list('id', flat=True))
         WallRoute.objects.filter(section_wall_id__in=wall_objs).update(is_deleted=True)
         SectionWall.all_objects.filter(layout_section_id__in=section_ids).update(is_deleted=True)
         LayoutSection.all_objects.filter(id__in=section_ids).update(is_deleted=True)
+        core_utils.bump_gym_content_version(layout_ids=layout_ids)
+        core_utils.rebuild_gym_daily_stats_on_delete(wall_ids=wall_objs)
         return SuccessResponse({"message": success_message.get('DELETE_SUCCESS'),
                                 }, status=status_code.HTTP_200_OK)
 
@@ -448,13 +451,9 @@ class GetGymOwnerProfile(viewsets.ViewSet):
 
     def retrieve(self, request):
         # Add for gym staff
-        requested_user = request.user
-        role_name = request.user.user_role.first().name
-        if role_name == Role.RoleType.GYM_OWNER:
-            requested_user_gym = requested_user
-        else:
-            requested_user_gym = requested_user.user_details.home_gym.user
-        gym_obj = GymDetails.objects.filter(user=requested_user_gym).select_related('user').first()
+        role_context = core_utils.get_request_role_context(request)
+        role_name = Role.RoleType.GYM_OWNER if role_context['is_gym_owner'] else Role.RoleType.GYM_STAFF
+        gym_obj = role_context['gym_detail']
 
         if gym_obj:
             serializer = self.serializer_class(gym_obj, context={'role_name': role_name})
@@ -564,8 +563,11 @@ class DeleteGymWall(viewsets.ViewSet):
 
     def update(self, request):
         wall_ids = request.data.get('wall_ids')
+        layout_ids = list(SectionWall.all_objects.filter(id__in=wall_ids).values_list('gym_layout', flat=True))
         WallRoute.objects.filter(section_wall_id__in=wall_ids).update(is_deleted=True)
         SectionWall.all_objects.filter(id__in=wall_ids).update(is_deleted=True)
+        core_utils.bump_gym_content_version(layout_ids=layout_ids)
+        core_utils.rebuild_gym_daily_stats_on_delete(wall_ids=wall_ids)
         return SuccessResponse({"message": success_message.get('DELETE_SUCCESS'),
                                 }, status=status_code.HTTP_200_OK)
 
@@ -663,11 +665,8 @@ class ManualWallType(viewsets.ViewSet, viewsets.GenericViewSet):
 
     def create(self, request):
         # Add for gym staff
-        requested_user = request.user
-        if requested_user.user_role.first().name == Role.RoleType.GYM_OWNER:
-            requested_user_gym = requested_user.gym_detail_user
-        else:
-            requested_user_gym = request.user.user_details.home_gym
+        role_context = core_utils.get_request_role_context(request)
+        requested_user_gym = role_context['gym_detail']
         ##
         gym_obj = requested_user_gym
         serializer = self.action_serializers.get(self.action)(data=request.data, context={'gym_obj': gym_obj})
@@ -698,11 +697,8 @@ class ManualWallType(viewsets.ViewSet, viewsets.GenericViewSet):
             :return: response
         """
         # Add for gym staff
-        requested_user = request.user
-        if requested_user.user_role.first().name == Role.RoleType.GYM_OWNER:
-            requested_user_gym = requested_user.gym_detail_user
-        else:
-            requested_user_gym = request.user.user_details.home_gym
+        role_context = core_utils.get_request_role_context(request)
+        requested_user_gym = role_context['gym_detail']
         ##
         gym_obj = requested_user_gym
         wall_type_obj = WallType.objects.filter(gym=gym_obj).order_by('id')
@@ -732,8 +728,7 @@ class GymWallStats(viewsets.ViewSet):
         """
         wall_detail = SectionWall.all_objects.filter(id=wall_id).first()
         if wall_detail:
-            visit_instance = WallVisit.objects.filter(wall=wall_detail).first()
-            count_data = core_utils.get_round_completed_data(wall_detail, visit_instance)
+            count_data = core_utils.get_round_completed_data(wall_detail)
             return SuccessResponse(count_data, status=status_code.HTTP_200_OK)
         count_data = {'round_attempted': 0, 'round_completed': 0, 'wall_popularity': 0, 'wall_visit': 0}
         return SuccessResponse(count_data, status=status_code.HTTP_200_OK)
@@ -1147,7 +1142,10 @@ class DeleteGymRoute(viewsets.ViewSet):
 
     def update(self, request):
         route_ids = request.data.get('route_ids')
+        gym_ids = list(WallRoute.all_objects.filter(id__in=route_ids).values_list('gym', flat=True).distinct())
         WallRoute.all_objects.filter(id__in=route_ids).update(is_deleted=True)
+        core_utils.bump_gym_content_version(gym_ids=gym_ids)
+        core_utils.rebuild_gym_daily_stats_on_delete(route_ids=route_ids)
         return SuccessResponse({"message": success_message.get('DELETE_SUCCESS'),
                                 }, status=status_code.HTTP_200_OK)
 
@@ -1167,11 +1165,8 @@ class GymStaffListing(viewsets.ViewSet):
             :return: response
         """
         # Add for gym staff
-        user = request.user
-        if user.user_role.first().name == Role.RoleType.GYM_OWNER:
-            requested_user = user
-        else:
-            requested_user = user.user_details.home_gym.user
+        role_context = core_utils.get_request_role_context(request)
+        requested_user = role_context['gym_user']
         ##
         users = User.objects.filter(user_role__name=Role.RoleType.GYM_STAFF, user_role__role_status=True,
                                     user_details__home_gym__user=requested_user).order_by('-email').\
@@ -1331,11 +1326,7 @@ class RouteTagList(viewsets.ViewSet, viewsets.GenericViewSet):
         # rating = request.query_params.get('rating')
         # created_by = request.query_params.get('created_by')
         # Add for gym staff
-        requested_user = request.user
-        if requested_user.user_role.first().name == Role.RoleType.GYM_OWNER:
-            requested_user_gym = requested_user
-        else:
-            requested_user_gym = request.user.user_details.home_gym.user
+        role_context = core_utils.get_request_role_context(request)
         ##
         layout_ids = request.data.get('layout_ids')
         section_ids = request.data.get('section_ids')
@@ -1345,7 +1336,7 @@ class RouteTagList(viewsets.ViewSet, viewsets.GenericViewSet):
         grade = request.data.get('grade')
         rating = request.data.get('rating')
         created_by = request.data.get('created_by')
-        gym_owner = GymDetails.objects.filter(user=requested_user_gym).first()
+        gym_owner = role_context['gym_detail']
         layout = GymLayout.objects.filter(gym_id=gym_owner.id).values_list('id', flat=True)
         section = SectionWall.objects.filter(gym_layout_id__in=layout).values_list('id', flat=True)
         queryset = WallRoute.all_objects.filter(section_wall_id__in=section)
@@ -1441,29 +1432,19 @@ class RouteTagListScreen2RouteDetail(viewsets.ViewSet, viewsets.GenericViewSet):
     permission_classes = (IsGymOwner,)
 
     def retrieve(self, request, route_id):
-        route_obj = WallRoute.all_objects.select_related(
-            'section_wall', 'grade', 'color', 'created_by', 'created_by__gym_detail_user').\
-            prefetch_related('route_feedback').filter(id=route_id)
+        route_obj = WallRoute.all_objects.select_related('grade', 'route_stats').filter(id=route_id).first()
         if not route_obj:
             return Response(get_custom_error(message=validation_message.get("ROUTE_ID_NOT_FOUND"),
                                              error_location='wallroute', status=400),
                             status=status_code.HTTP_400_BAD_REQUEST)
-
-        # count_of_objects = UserRouteFeedback.objects.filter(route_id=route_id).count()
-        count_of_objects = UserRouteFeedback.objects.filter(route_id=route_id)
-        # count_of_objects = UserRouteFeedback.objects.filter(route_id=route_id).count()
-        count_of_objects_with_grade = UserRouteFeedback.objects.filter(route_id=route_id, grade__isnull=False)
-        # count_of_objects_with_grade = UserRouteFeedback.objects.filter(route_id=route_id, grade__isnull=False).count()
+        # feedback aggregates are read from the materialized route stats
+        route_stats = core_utils.get_route_stats(route_obj)
         # we will get the specific route details
-        route_details_obj = specific_route_details(route_id, route_obj, )
+        route_details_obj = specific_route_details(route_obj, route_stats)
         # Here we will get the route progress details
-        projecting_level, users_count_rp = route_progress_details(route_id, route_obj,
-                                                                  count_of_objects)
+        projecting_level, users_count_rp = route_progress_details(route_stats)
         # Here we will get the Community grade route details
-        # grade_level, users_count_cgr, grade_value = community_grade_route_details(route_id, route_obj,
-        #                                                                           count_of_objects)
-        grade_level, users_count_cgr, grade_value = community_grade_route_details(route_id, route_obj,
-                                                                                  count_of_objects_with_grade)
+        grade_level, users_count_cgr, grade_value = community_grade_route_details(route_obj, route_stats)
         return SuccessResponse({"route_details": route_details_obj,
                                 "route_progress": {"users_count": users_count_rp,
                                                    "projecting_level": projecting_level,
@@ -1508,11 +1489,7 @@ class ListRouteWallSectionLayout(viewsets.ViewSet):
         # section_ids = request.query_params.get('section_ids')
         # wall_ids = request.query_params.get('wall_ids')
         # Add for gym staff
-        requested_user = request.user
-        if requested_user.user_role.first().name == Role.RoleType.GYM_OWNER:
-            requested_user_gym = requested_user
-        else:
-            requested_user_gym = request.user.user_details.home_gym.user
+        role_context = core_utils.get_request_role_context(request)
         ##
         layout_ids = request.data.get('layout_ids')
         section_ids = request.data.get('section_ids')
@@ -1530,7 +1507,7 @@ class ListRouteWallSectionLayout(viewsets.ViewSet):
             queryset = SectionWall.objects.filter(id__in=wall_ids).all()
             calling_serializer = ListWallSerializer
         if not layout_ids and not section_ids and not wall_ids:
-            gym_owner = GymDetails.objects.filter(user=requested_user_gym).first()
+            gym_owner = role_context['gym_detail']
             queryset = GymLayout.objects.filter(gym_id=gym_owner.id).prefetch_related('gym_layout_section',
                                                                                       'gym_layout_section__section_wall',
                                                                                       ).all()
@@ -1575,14 +1552,10 @@ class ListAllUsers(mixins.ListModelMixin, viewsets.GenericViewSet):
 
     def list(self, request, *args, **kwargs):
         # Add for gym staff
-        requested_user = request.user
-        if requested_user.user_role.first().name == Role.RoleType.GYM_OWNER:
-            requested_user_gym = requested_user
-        else:
-            requested_user_gym = request.user.user_details.home_gym.user
+        role_context = core_utils.get_request_role_context(request)
         ##
         page_size = request.GET.get('page_size', '')
-        gym_detail = GymDetails.objects.filter(user=requested_user_gym).first()
+        gym_detail = role_context['gym_detail']
         layout = GymLayout.objects.filter(gym_id=gym_detail.id).values_list('id', flat=True)
         section = SectionWall.objects.filter(gym_layout_id__in=layout).values_list('id', flat=True)
         route_created_by = WallRoute.all_objects.filter(section_wall_id__in=section).values_list('created_by',
@@ -1614,11 +1587,8 @@ class ManualColorType(viewsets.ViewSet, viewsets.GenericViewSet):
 
     def create(self, request):
         # Add for gym staff
-        requested_user = request.user
-        if requested_user.user_role.first().name == Role.RoleType.GYM_OWNER:
-            requested_user_gym = requested_user.gym_detail_user
-        else:
-            requested_user_gym = request.user.user_details.home_gym
+        role_context = core_utils.get_request_role_context(request)
+        requested_user_gym = role_context['gym_detail']
         ##
         gym_obj = requested_user_gym
         serializer = self.action_serializers.get(self.action)(data=request.data, context={'gym_obj': gym_obj})
@@ -1649,11 +1619,8 @@ class ManualColorType(viewsets.ViewSet, viewsets.GenericViewSet):
             :return: response
         """
         # Add for gym staff
-        requested_user = request.user
-        if requested_user.user_role.first().name == Role.RoleType.GYM_OWNER:
-            requested_user_gym = requested_user.gym_detail_user
-        else:
-            requested_user_gym = request.user.user_details.home_gym
+        role_context = core_utils.get_request_role_context(request)
+        requested_user_gym = role_context['gym_detail']
         ##
         gym_obj = requested_user_gym
         color_type_obj = ColorType.objects.filter(gym=gym_obj).order_by('id')
@@ -1682,11 +1649,8 @@ class ManualRouteType(viewsets.ViewSet, viewsets.GenericViewSet):
 
     def create(self, request):
         # Add for gym staff
-        requested_user = request.user
-        if requested_user.user_role.first().name == Role.RoleType.GYM_OWNER:
-            requested_user_gym = requested_user.gym_detail_user
-        else:
-            requested_user_gym = request.user.user_details.home_gym
+        role_context = core_utils.get_request_role_context(request)
+        requested_user_gym = role_context['gym_detail']
         ##
         gym_obj = requested_user_gym
         serializer = self.action_serializers.get(self.action)(data=request.data, context={'gym_obj': gym_obj})
@@ -1717,11 +1681,8 @@ class ManualRouteType(viewsets.ViewSet, viewsets.GenericViewSet):
             :return: response
         """
         # Add for gym staff
-        requested_user = request.user
-        if requested_user.user_role.first().name == Role.RoleType.GYM_OWNER:
-            requested_user_gym = requested_user.gym_detail_user
-        else:
-            requested_user_gym = request.user.user_details.home_gym
+        role_context = core_utils.get_request_role_context(request)
+        requested_user_gym = role_context['gym_detail']
         ##
         gym_obj = requested_user_gym
         route_type_obj = RouteType.objects.filter(gym=gym_obj).order_by('id')
@@ -1756,11 +1717,8 @@ class RouteGradeViewet(viewsets.ViewSet):
             :return: response
         """
         # Add for gym staff
-        requested_user = request.user
-        if requested_user.user_role.first().name == Role.RoleType.GYM_OWNER:
-            requested_user_gym = requested_user.gym_detail_user
-        else:
-            requested_user_gym = request.user.user_details.home_gym
+        role_context = core_utils.get_request_role_context(request)
+        requested_user_gym = role_context['gym_detail']
         ##
         section_wall = request.GET.get('wall_id')
         # We can use gym_id here as well instead of section wall id.
@@ -1827,13 +1785,9 @@ class TotalMemberCount(viewsets.ViewSet):
             :return: response
         """
         # Add for gym staff
-        requested_user = request.user
-        if request.user.user_role.first().name == Role.RoleType.GYM_OWNER:
-            requested_user_gym = requested_user.gym_detail_user
-            requested_user_date = requested_user.created_at.date()
-        else:
-            requested_user_gym = request.user.user_details.home_gym
-            requested_user_date = requested_user_gym.user.created_at.date()
+        role_context = core_utils.get_request_role_context(request)
+        requested_user_gym = role_context['gym_detail']
+        requested_user_date = role_context['gym_user'].created_at.date()
         ##
         # Calculating increase or decrease count based on comparison between last week and this week
         today = date.today()
@@ -1869,11 +1823,8 @@ class ListGymUser(mixins.ListModelMixin, viewsets.GenericViewSet):
         # ordering = self.request.GET.get('order_by', '-last_updated')
         ordering = self.request.GET.get('order_by', '-user_details__home_gym_added_on')
         # Add for gym staff
-        requested_user = self.request.user
-        if requested_user.user_role.first().name == Role.RoleType.GYM_OWNER:
-            gym_detail_user = requested_user.gym_detail_user
-        else:
-            gym_detail_user = requested_user.user_details.home_gym
+        role_context = core_utils.get_request_role_context(self.request)
+        gym_detail_user = role_context['gym_detail']
         ##
         query = User.objects.prefetch_related('user_details', 'user_biometric', 'user_preference'). \
             prefetch_related('user_route_feedback', 'user_route_feedback__route'). \
@@ -1884,7 +1835,8 @@ class ListGymUser(mixins.ListModelMixin, viewsets.GenericViewSet):
             submitted=Count('user_route_feedback', filter=Q(user_route_feedback__gym=gym_detail_user,
                                                             user_route_feedback__route__is_deleted=False)),
             last_updated=Max('user_route_feedback__updated_at', filter=Q(user_route_feedback__gym=gym_detail_user,
-                                                                         user_route_feedback__route__is_deleted=False))).all().order_by(ordering)
+                                                                         user_route_feedback__route__is_deleted=False))).all(). \
+            order_by(ordering, '-id' if ordering.startswith('-') else 'id')
                      # last_updated=Greatest('updated_at', 'user_details__updated_at', 'user_biometric__updated_at',
                      #                       'user_preference__updated_at')).all().order_by(ordering)
         return self.filter_queryset(query), gym_detail_user
@@ -1895,31 +1847,43 @@ class ListGymUser(mixins.ListModelMixin, viewsets.GenericViewSet):
         gender = request.query_params.get('gender')
         search_submitted_route = request.query_params.get('search_submitted_route')
         queryset, gym_detail_user = self.get_queryset()
-        queryset = core_utils.filter_on_member_list(queryset, climbing_level, age_range, gender,
-                                                    search_submitted_route, gym_detail_user)
-        queryset = core_utils.update_age_calculation(queryset)
-        if age_range:
-            a = int(age_range.split('-')[0])
-            b = int(age_range.split('-')[1])
-            queryset = [each for each in queryset if each['age'] and a <= each['age'] <= b]
+        try:
+            queryset = core_utils.filter_on_member_list(queryset, climbing_level, age_range, gender,
+                                                        search_submitted_route, gym_detail_user)
+        except ValueError:
+            return Response(get_custom_error(message=validation_message.get("INVALID_AGE_RANGE"),
+                                             error_location='member', status=400),
+                            status=status_code.HTTP_400_BAD_REQUEST)
+        if 'cursor' in request.query_params:
+            # keyset pagination, the page is read with a range filter on (order value, id) instead of an offset
+            pagination_class = KeysetPagination()
+            try:
+                queryset, descending = core_utils.get_member_list_keyset(
+                    queryset, request.GET.get('order_by', '-user_details__home_gym_added_on'))
+                page = pagination_class.paginate_queryset(queryset, request, descending)
+            except ValueError:
+                return Response(get_custom_error(message=validation_message.get("INVALID_CURSOR"),
+                                                 error_location='member', status=400),
+                                status=status_code.HTTP_400_BAD_REQUEST)
+            for each in page:
+                each.pop('keyset_value')
+            page = core_utils.update_date_format(core_utils.update_age_calculation(page))
+            return SuccessResponse(pagination_class.get_paginated_response(page))
         pagination_class = self.pagination_class()
         page = pagination_class.paginate_queryset(queryset, request)
         if page is not None:
-            page = core_utils.update_date_format(page)
+            page = core_utils.update_date_format(core_utils.update_age_calculation(page))
             return SuccessResponse(pagination_class.get_paginated_response(page).data)
-        queryset = core_utils.update_date_format(queryset)
+        queryset = core_utils.update_date_format(core_utils.update_age_calculation(list(queryset)))
         return SuccessResponse(queryset)
 
     def destroy(self, request, *args, **kwargs):
         user_id = request.GET.get('user_id')
         # Add for gym staff
-        requested_user = request.user
-        if requested_user.user_role.first().name == Role.RoleType.GYM_OWNER:
-            gym_detail_user = requested_user.gym_detail_user
-        else:
-            gym_detail_user = requested_user.user_details.home_gym
+        role_context = core_utils.get_request_role_context(request)
+        gym_detail_user = role_context['gym_detail']
         ##
-        gym_detail_user.blocked_user.add(user_id)
+        core_utils.block_user_for_gym(gym_detail_user, user_id)
         user_instance = UserDetails.objects.filter(user=user_id)
         user_instance.update(home_gym=None)
         core_utils.delete_staff_role_for_user(user_instance.first().user)
@@ -1960,7 +1924,7 @@ class AddAsStaffMember(viewsets.ViewSet):
             return SuccessResponse({"message": success_message.get('STAFF_MEMBER_ADDED_SUCCESSFULLY')},
                                    status=status_code.HTTP_200_OK)
         elif choice_val == 'REMOVE':
-            if request.user.user_role.first().name != Role.RoleType.GYM_OWNER and user_obj == request.user:
+            if not core_utils.get_request_role_context(request)['is_gym_owner'] and user_obj == request.user:
                 return Response(get_custom_error(message=validation_message.get("CAN_NOT_DELETE_HIMSELF"),
                                                  error_location='member', status=400),
                                 status=status_code.HTTP_400_BAD_REQUEST)
@@ -2010,17 +1974,17 @@ class MemberProfile(viewsets.ViewSet):
 
         # Without subscription restrictions
         # Add for gym staff
-        requested_user = request.user
-        if requested_user.user_role.first().name == Role.RoleType.GYM_OWNER:
-            gym_detail_user = requested_user
-        else:
-            gym_detail_user = requested_user.user_details.home_gym.user
+        role_context = core_utils.get_request_role_context(request)
+        gym_detail_user = role_context['gym_user']
         ##
         user_id = request.GET.get('user_id')
         user_route_feedback = UserRouteFeedback.objects.select_related(
             'route', 'route__section_wall', 'route__grade').filter(
             # user__id=user_id, gym__user=request.user).order_by('-created_at')
-            user__id=user_id, gym__user=gym_detail_user, route__is_deleted=False).order_by('-created_at')
+            user__id=user_id, gym__user=gym_detail_user, route__is_deleted=False). \
+            annotate(is_opened_feedback=Exists(OpenFeedback.objects.filter(gym_user=request.user,
+                                                                           feedback=OuterRef('pk')))). \
+            order_by('-created_at')
         # #
         pagination_class = self.pagination_class()
         page = pagination_class.paginate_queryset(user_route_feedback, request)
@@ -2071,42 +2035,10 @@ class MemberProfile(viewsets.ViewSet):
         return SuccessResponse(queryset, status=status_code.HTTP_200_OK)
         """
         # Add for gym staff
-        requested_user = request.user
-        if requested_user.user_role.first().name == Role.RoleType.GYM_OWNER:
-            gym_detail_user = requested_user.gym_detail_user
-        else:
-            gym_detail_user = requested_user.user_details.home_gym
+        role_context = core_utils.get_request_role_context(request)
+        gym_detail_user = role_context['gym_detail']
         ##
-        queryset = User.objects.prefetch_related('user_details', 'user_biometric', 'user_preference'). \
-            prefetch_related('user_route_feedback', 'user_gym_visit').filter(id=user_id).values(
-            'id', 'full_name', 'email', 'created_at', 'user_details__user_avatar',
-            'user_biometric__gender', 'user_preference__prefer_climbing', 'user_preference__bouldering',
-            'user_preference__top_rope', 'user_preference__lead_climbing', 'user_biometric__shoe_size',
-            'user_biometric__weight', 'user_biometric__hand_size', 'user_biometric__height',
-            'user_biometric__birthday', 'user_biometric__wingspan', 'user_biometric__ape_index'). \
-            annotate(total_count=Count('user_route_feedback', filter=Q(user_route_feedback__gym=gym_detail_user)),
-                     projecting_count=Count('user_route_feedback', filter=Q(user_route_feedback__gym=gym_detail_user,
-                                                                            user_route_feedback__route_progress=0)),
-                     red_point_count=Count('user_route_feedback', filter=Q(user_route_feedback__gym=gym_detail_user,
-                                                                           user_route_feedback__route_progress=1)),
-                     flash_count=Count('user_route_feedback', filter=Q(user_route_feedback__gym=gym_detail_user,
-                                                                       user_route_feedback__route_progress=2)),
-                     on_sight_count=Count('user_route_feedback', filter=Q(user_route_feedback__gym=gym_detail_user,
-                                                                          user_route_feedback__route_progress=3)),
-                     route_attempted=Count('user_route_feedback', filter=Q(user_route_feedback__gym=gym_detail_user,
-                                                                           user_route_feedback__route_progress=0)),
-                     route_completed=F('total_count')-F('route_attempted'),
-                     )
-        if queryset:
-            queryset = core_utils.update_age_calculation_on_single(queryset)
-            is_gym_staff = False
-            if Role.objects.filter(user=user_id, name=Role.RoleType.GYM_STAFF, role_status=True):
-                is_gym_staff = True
-            queryset[0]['is_gym_staff'] = is_gym_staff
-            # Add gym visit this week, gym visit last week, route attempted, route completed
-            gym_visit, gym_visit_last_week = core_utils.get_gym_visit(user_id, gym_detail_user)
-            queryset[0]['gym_visit'] = gym_visit
-            queryset[0]['gym_visit_last_week'] = gym_visit_last_week
+        queryset = core_utils.get_member_profile(user_id, gym_detail_user)
         return SuccessResponse(queryset, status=status_code.HTTP_200_OK)
 
 
@@ -2118,11 +2050,8 @@ class MemberFeedbackOpen(viewsets.ViewSet):
     def retrieve(self, request, feedback_id):
         try:
             # Add for gym staff
-            requested_user = request.user
-            if requested_user.user_role.first().name == Role.RoleType.GYM_OWNER:
-                gym_detail_user = requested_user
-            else:
-                gym_detail_user = requested_user.user_details.home_gym.user
+            role_context = core_utils.get_request_role_context(request)
+            gym_detail_user = role_context['gym_user']
             ##
             # To add subscription restrictions
             count, msg, sub_start = core_utils.is_new_subscription_feedback(gym_detail_user)
@@ -2154,11 +2083,8 @@ class AllRouteFeedbackCount(viewsets.ViewSet):
     def list(self, request):
         # To get all route feedback count
         # Add for gym staff
-        requested_user = request.user
-        if requested_user.user_role.first().name == Role.RoleType.GYM_OWNER:
-            gym_detail_user = requested_user.gym_detail_user
-        else:
-            gym_detail_user = requested_user.user_details.home_gym
+        role_context = core_utils.get_request_role_context(request)
+        gym_detail_user = role_context['gym_detail']
         ##
         feedbacks_count = UserRouteFeedback.objects.filter(gym=gym_detail_user)
         projecting_count = feedbacks_count.filter(route_progress=0).count()
@@ -2216,21 +2142,16 @@ class DashboardViewSet(viewsets.ViewSet):
 
     def list(self, request):
         # Add for gym staff
-        if request.user.user_role.first().name == Role.RoleType.GYM_OWNER:
-            requested_user = request.user
-        else:
-            requested_user = request.user.user_details.home_gym.user
+        role_context = core_utils.get_request_role_context(request)
+        gym_detail = role_context['gym_detail']
         ##
         # gym_detail = request.user.gym_detail_user
         today = date.today()
         last_week_date1 = today - timedelta(days=14)
         last_week_date2 = today - timedelta(days=7)
 
-        wall_count = core_utils.get_wall_count_for_dashboard(requested_user, last_week_date1, last_week_date2)
-        route_attempt_count = core_utils.get_route_attempt_count_for_dashboard(requested_user)
-        total_member_count = core_utils.get_total_member_count_for_dashboard(requested_user,
-                                                                             last_week_date1, last_week_date2)
-        total_wall_visit = core_utils.get_total_wall_visit_for_dashboard(requested_user, last_week_date1, last_week_date2)
+        wall_count, route_attempt_count, total_member_count, total_wall_visit = \
+            core_utils.get_dashboard_count_data(gym_detail.id, last_week_date1, last_week_date2)
 
         # added to count last week data only if gym is created before last week
         if request.user.created_at.date() >= last_week_date2:
@@ -2239,7 +2160,7 @@ class DashboardViewSet(viewsets.ViewSet):
             total_member_count["last_week_member_count"] = 0
             total_wall_visit["last_week_wall_vist"] = 0
 
-        rope_bouldering_graph = core_utils.get_rope_bouldering_graph(requested_user)
+        rope_bouldering_graph = core_utils.get_rope_bouldering_graph(gym_detail)
         return SuccessResponse({"wall_count": wall_count, "route_attempt_count": route_attempt_count,
                                 "total_member_count": total_member_count, "total_wall_visit": total_wall_visit,
                                 "rope_bouldering_graph": rope_bouldering_graph},
@@ -2253,14 +2174,11 @@ class Dashboard1ViewSet(viewsets.ViewSet):
 
     def list(self, request):
         # Add for gym staff
-        if request.user.user_role.first().name == Role.RoleType.GYM_OWNER:
-            requested_user = request.user
-            gym_detail = requested_user.gym_detail_user
-        else:
-            gym_detail = request.user.user_details.home_gym
-            requested_user = gym_detail.user
+        role_context = core_utils.get_request_role_context(request)
+        requested_user = role_context['gym_user']
+        gym_detail = role_context['gym_detail']
         ##
-        user_route_feedback = core_utils.get_dashboard_all_type_feedback_data(requested_user)
+        user_route_feedback = core_utils.get_dashboard_all_type_feedback_data(requested_user, gym_detail)
         route_type_count = core_utils.get_dashboard_all_route_type_data(requested_user)
         range_data = core_utils.get_dashboard_all_type_range_data(requested_user, gym_detail)
 
@@ -2290,6 +2208,36 @@ class Dashboard1ViewSet(viewsets.ViewSet):
         #                         "route_type_count": route_type_count}, status=status_code.HTTP_200_OK)
 
 
+class DashboardTrendViewSet(viewsets.ViewSet):
+    authentication_classes = (CustomTokenAuthentication,)
+    permission_classes = (IsGymOwner,)
+
+    def list(self, request):
+        """
+        list method used for the dashboard counts per day, week or month of the date range.
+            :param request: start_date, end_date (YYYY-MM-DD, included), interval (day, week or month)
+            :return: response
+        """
+        role_context = core_utils.get_request_role_context(request)
+        gym_detail = role_context['gym_detail']
+        interval = request.GET.get('interval', 'day')
+        try:
+            start_date = datetime.strptime(request.GET.get('start_date', ''), '%Y-%m-%d').date()
+            end_date = datetime.strptime(request.GET.get('end_date', ''), '%Y-%m-%d').date()
+        except ValueError:
+            start_date = end_date = None
+        if not start_date or start_date > end_date or interval not in core_utils.DASHBOARD_TREND_INTERVALS:
+            return Response(get_custom_error(message=validation_message.get('PROVIDE_TREND_RANGE'),
+                                             error_location='dashboard trend', status=400),
+                            status=status_code.HTTP_400_BAD_REQUEST)
+        if core_utils.get_trend_bucket_count(start_date, end_date, interval) > core_utils.DASHBOARD_TREND_MAX_BUCKETS:
+            return Response(get_custom_error(message=validation_message.get('TREND_RANGE_TOO_LARGE').format(
+                core_utils.DASHBOARD_TREND_MAX_BUCKETS), error_location='dashboard trend', status=400),
+                status=status_code.HTTP_400_BAD_REQUEST)
+        trend_data = core_utils.get_gym_dashboard_trend(gym_detail.id, start_date, end_date, interval)
+        return SuccessResponse({"interval": interval, "trend_data": trend_data}, status=status_code.HTTP_200_OK)
+
+
 class PlansSubscriptionGymOwner(viewsets.ViewSet):
     authentication_classes = (CustomTokenAuthentication,)
     permission_classes = (IsGymOwner, )
@@ -2384,11 +2332,8 @@ class OptionalClimbing(viewsets.ViewSet):
             :return: response
         """
         # Add for gym staff
-        user = request.user
-        if user.user_role.first().name == Role.RoleType.GYM_OWNER:
-            gym_data = user.gym_detail_user
-        else:
-            gym_data = user.user_details.home_gym
+        role_context = core_utils.get_request_role_context(request)
+        gym_data = role_context['gym_detail']
         ##
         # gym_data = request.user.gym_detail_user
         rope = gym_data.RopeClimbing
@@ -2413,8 +2358,5 @@ class CheckGymOwnerViewset(viewsets.ViewSet):
             :param request:
             :return: response
         """
-        if request.user.user_role.first().name == Role.RoleType.GYM_OWNER:
-            is_gym_owner = True
-        else:
-            is_gym_owner = False
+        is_gym_owner = core_utils.get_request_role_context(request)['is_gym_owner']
         return SuccessResponse({"is_gym_owner": is_gym_owner}, status=status_code.HTTP_200_OK)
@@ -245,6 +245,7 @@ class StaffGhostWallSerializer(serializers.ModelSerializer):
     def update(self, instance, validated_data):
         try:
             SectionWall.objects.filter(id=instance.id).update(**validated_data)
+            core_utils.bump_gym_content_version(layout_ids=instance.gym_layout_id)
         except Exception:
             raise CustomException(status_code=400, message=validation_message.get("SOMETHING_WENT_WRONG"),
                                   location=validation_message.get("LOCATION"))
@@ -28,6 +28,8 @@ urlpatterns = [
         name='staff-route-view-set'),
     path('staff_route/<int:route_id>', staff_views.StaffRouteViewSet.as_view({'get': 'retrieve'}),
          name='staff-route-view-set'),
+    url('^staff_route_tag$', staff_views.StaffRouteTagViewSet.as_view({'get': 'list'}),
+        name='staff-route-tag-view-set'),
     url('staff_listing', staff_views.StaffListingViewset.as_view({'get': 'list'}), name='staff-list'),
     url('^staff_ghost_route$', staff_views.StaffGhostRouteViewSet.as_view(
         {'post': 'create', 'put': 'perform_update'}), name='staff-route-view-set'),
@@ -195,7 +195,22 @@ class StaffHomeViewSet(viewsets.ViewSet):
         floor_id = request.GET.get('floor_id', '')
         category_id = request.GET.get('category_id', '')
         category = int(category_id) if category_id else rb[0]
+        # layout only changes with the gym content version, so the serialized layout is cached per version
+        gym_layout_data = core_utils.get_cached_gym_layout_data(
+            'staff', gym_detail, category, floor_id,
+            lambda: self.get_gym_layout_data(gym_id, category, floor_id))
+        return SuccessResponse({'gym_data': gym_data, 'gym_layout_data': gym_layout_data,
+                                'category': category}, status=status_code.HTTP_200_OK)
 
+    @staticmethod
+    def get_gym_layout_data(gym_id, category, floor_id):
+        """
+            method used to serialize the floor list, section points and section + wall details of the floor.
+        :param gym_id:
+        :param category:
+        :param floor_id:
+        :return:
+        """
         gym_layout = GymLayout.objects.filter(gym=gym_id, category=category).all()
         if gym_layout:
             if floor_id:
@@ -203,7 +218,7 @@ class StaffHomeViewSet(viewsets.ViewSet):
             else:
                 get_floor_id = gym_layout.first().id
             # To show floor list only
-            floor_list = core_utils.get_is_selected_floor(gym_layout.values('id', 'title'), get_floor_id)
+            floor_list = core_utils.get_is_selected_floor(list(gym_layout.values('id', 'title')), get_floor_id)
             gym_layout_data = {'floor_list': floor_list}
             floor_gym_layout = gym_layout.prefetch_related('gym_layout_section', 'gym_layout_section__section_wall'). \
                 filter(id=get_floor_id).first()
@@ -220,13 +235,11 @@ class StaffHomeViewSet(viewsets.ViewSet):
             # To get remaining wall slot
             # wall_slot_left = core_utils.get_wall_slot_left(gym_id)
             # gym_layout_data.update({'wall_slot_left': wall_slot_left})
-            return SuccessResponse({'gym_data': gym_data, 'gym_layout_data': gym_layout_data,
-                                    'category': category}, status=status_code.HTTP_200_OK)
+            return gym_layout_data
         gym_layout_data = {'floor_list': [], "only_layout_section": [], "gym_layout_section": []}
         # gym_layout_data = {'floor_list': [], "only_layout_section": [], "gym_layout_section": [],
         #                    'wall_slot_left': []}
-        return SuccessResponse({'gym_data': gym_data, 'gym_layout_data': gym_layout_data,
-                                'category': category}, status=status_code.HTTP_200_OK)
+        return gym_layout_data
 
 
 class StaffWallViewSet(viewsets.ViewSet):
@@ -386,9 +399,12 @@ class StaffWallViewSet(viewsets.ViewSet):
                                              error_location=validation_message.get('STAFF_WALL'), status=400),
                             status=status_code.HTTP_400_BAD_REQUEST)
         with transaction.atomic():
+            layout_ids = list(SectionWall.objects.filter(id=wall_id).values_list('gym_layout', flat=True))
             SectionWall.objects.filter(id=wall_id).update(is_deleted=True)
+            core_utils.bump_gym_content_version(layout_ids=layout_ids)
             # To delete all routes related to this wall
             WallRoute.objects.filter(section_wall=wall_id).update(is_deleted=True)
+            core_utils.rebuild_gym_daily_stats_on_delete(wall_ids=[wall_id])
         return SuccessResponse({"message": success_message.get("WALL_DELETED_SUCCESSFULLY")},
                                status=status_code.HTTP_200_OK)
 
@@ -650,6 +666,42 @@ class ManualRouteType(viewsets.ViewSet, viewsets.GenericViewSet):
         return SuccessResponse(serializer.data, status=status_code.HTTP_200_OK)
 
 
+class StaffRouteTagViewSet(viewsets.ViewSet):
+    """
+    StaffRouteTagViewSet
+        This class is used to find the route/ghost route tags near a point of the wall image (overlap check
+        while placing a tag) or inside a box of the wall image.
+    """
+    authentication_classes = (CustomTokenAuthentication,)
+    permission_classes = (IsAuthenticated,
+                          AppStaffPermission,)
+
+    def list(self, request):
+        """
+        list method used for the route tags near the point or inside the box.
+            :param request: wall_id, is_ghost (optional), x, y, radius, exclude_id (optional) or
+                            min_x, min_y, max_x, max_y, limit (optional)
+            :return: response
+        """
+        wall_id = request.GET.get('wall_id', '')
+        section_instance = SectionWall.objects.filter(id=wall_id).first() if wall_id.isdigit() else None
+        if not section_instance:
+            return Response(get_custom_error(message=validation_message.get('INVALID_WALL_ID'),
+                                             error_location=validation_message.get('STAFF_ROUTE'), status=400),
+                            status=status_code.HTTP_400_BAD_REQUEST)
+        if request.GET.get('is_ghost', '').lower() == 'true':
+            queryset = GhostWallRoute.objects.filter(section_wall=section_instance)
+        else:
+            queryset = WallRoute.objects.filter(section_wall=section_instance)
+        try:
+            route_tags = core_utils.get_route_tag_list(queryset, request.GET)
+        except ValueError:
+            return Response(get_custom_error(message=validation_message.get('PROVIDE_ROUTE_TAG_POINT'),
+                                             error_location=validation_message.get('STAFF_ROUTE'), status=400),
+                            status=status_code.HTTP_400_BAD_REQUEST)
+        return SuccessResponse(route_tags, status=status_code.HTTP_200_OK)
+
+
 class StaffRouteViewSet(viewsets.ViewSet):
     """
     StaffRouteViewSet
@@ -749,7 +801,10 @@ class StaffRouteViewSet(viewsets.ViewSet):
             return Response(get_custom_error(message=validation_message.get('ROUTE_ID_REQUIRED'),
                                              error_location=validation_message.get('STAFF_ROUTE'), status=400),
                             status=status_code.HTTP_400_BAD_REQUEST)
+        gym_ids = list(WallRoute.objects.filter(id=route_id).values_list('gym', flat=True))
         WallRoute.objects.filter(id=route_id).update(is_deleted=True)
+        core_utils.bump_gym_content_version(gym_ids=gym_ids)
+        core_utils.rebuild_gym_daily_stats_on_delete(route_ids=[route_id])
         return SuccessResponse({"message": success_message.get("ROUTE_DELETED_SUCCESSFULLY")},
                                status=status_code.HTTP_200_OK)
 